@@ -10,9 +10,13 @@ echo "Starting TPM Emulator (swtpm)..."
 mkdir -p /tmp/tpm2-emulated 
 chmod 700 /tmp/tpm2-emulated
 
+# Serve the TPM over Unix domain sockets: connecting is cheaper than a TCP
+# handshake on every tool invocation. The swtpm TCTI expects the control
+# channel next to the data socket as <path>.ctrl.
+SWTPM_SOCKET="${SWTPM_SOCKET:-/var/run/swtpm.sock}"
 swtpm socket --tpmstate dir=/tmp/tpm2-emulated \
-             --ctrl type=tcp,port=2322 \
-             --server type=tcp,port=2321 \
+             --ctrl type=unixio,path=${SWTPM_SOCKET}.ctrl \
+             --server type=unixio,path=${SWTPM_SOCKET} \
              --flags not-need-init \
              --log level=20 \
 	     --log file=/var/log/swtpm.log \
@@ -24,9 +28,9 @@ sleep 2
 
 # Start the TPM Resource Manager
 echo "Starting TPM2-ABRMD..."
-export TSS2_TCTI="swtpm:host=127.0.0.1,port=2321"
-export TPM2TOOLS_TCTI="swtpm:host=127.0.0.1,port=2321"
-tpm2-abrmd --tcti=swtpm: --allow-root &
+export TSS2_TCTI="swtpm:path=${SWTPM_SOCKET}"
+export TPM2TOOLS_TCTI="swtpm:path=${SWTPM_SOCKET}"
+tpm2-abrmd --tcti="swtpm:path=${SWTPM_SOCKET}" --allow-root &
 
 # Keep container running
 if [[ -z "$1" ]]; then
@@ -0,0 +1,43 @@
+"""
+Shared fixtures for the TPM2 API tests
+
+None of the tests need a TPM: TPM-bound steps are replaced on the TPM2API
+instance under test.
+"""
+
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tpm2_api import TPM2API
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """TPM2API instance that never connects, working in an empty directory"""
+    monkeypatch.chdir(tmp_path)
+    return TPM2API("swtpm:host=127.0.0.1,port=2321", verify=False)
+
+
+@pytest.fixture
+def import_without(monkeypatch):
+    """
+    Import a fresh copy of a module as if some optional packages were not installed
+
+    The original modules are restored when the test ends.
+    """
+    def load(module_name, *missing):
+        # Import the original first so that it, not the copy, is restored afterwards
+        importlib.import_module(module_name)
+        for name in missing:
+            # Submodules imported earlier would otherwise still be found
+            for loaded in [loaded for loaded in sys.modules if loaded.startswith(name + ".")]:
+                monkeypatch.setitem(sys.modules, loaded, None)
+            monkeypatch.setitem(sys.modules, name, None)
+        monkeypatch.delitem(sys.modules, module_name)
+        return importlib.import_module(module_name)
+    return load
@@ -0,0 +1,50 @@
+"""
+Tests for the command line interface, run against a TPM2API whose tools are replaced
+"""
+
+import json
+import sys
+
+import pytest
+
+import tpm2_api
+import tpm2_cli
+
+
+@pytest.fixture
+def commands(tmp_path, monkeypatch):
+    """Record the tools the CLI runs; every tool succeeds"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(tpm2_api, "ESAPI", None)
+    commands = []
+
+    def run_command(self, cmd, input_data=None, binary=False):
+        commands.append(cmd)
+        return {"success": True, "output": b""}
+    monkeypatch.setattr(tpm2_api.TPM2API, "_run_command", run_command)
+    return commands
+
+
+def run_cli(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["tpm2_cli.py", *args])
+    with pytest.raises(SystemExit) as exit_info:
+        tpm2_cli.main()
+    return exit_info.value.code
+
+
+def test_provision_persists_a_new_signing_key(commands, monkeypatch, capsys):
+    assert run_cli(monkeypatch, "provision", "--type", "ecc", "--handle", "0x81010002") == 0
+
+    result = json.loads(capsys.readouterr().out)
+    assert result["persistent_handle"] == "0x81010002"
+    # Anything before is the connection check done when the CLI creates its TPM2API
+    commands = commands[-4:]
+    assert [cmd[0] for cmd in commands] == ['tpm2_createprimary', 'tpm2_create', 'tpm2_load', 'tpm2_evictcontrol']
+    assert commands[1][commands[1].index('-G') + 1] == "ecc256"
+    assert commands[-1][-1] == str(0x81010002)
+
+
+def test_provision_rejects_unknown_key_types(commands, monkeypatch, capsys):
+    assert run_cli(monkeypatch, "provision", "--type", "dsa") == 1
+    assert "Unsupported key type" in capsys.readouterr().err
+    assert not [cmd for cmd in commands if cmd[0] != 'tpm2_getrandom']
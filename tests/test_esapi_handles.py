@@ -0,0 +1,74 @@
+"""
+Tests for the ESAPI object references held on behalf of persistent handles
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+import tpm2_api
+
+
+class FakeESAPI:
+    """Stand-in for tpm2_pytss.ESAPI recording the references it hands out and closes"""
+
+    def __init__(self, tcti):
+        self.populated = set()
+        self.evictable = set()
+        self.references = set()
+        self.evicted = []
+
+    def tr_from_tpmpublic(self, handle):
+        if handle not in self.populated:
+            raise RuntimeError("handle is not populated")
+        reference = (handle, object())
+        self.references.add(reference)
+        return reference
+
+    def tr_close(self, reference):
+        self.references.remove(reference)
+
+    def evict_control(self, auth, reference, handle):
+        if handle not in self.evictable:
+            raise RuntimeError("evict failed")
+        self.references.remove(reference)
+        self.evicted.append(handle)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def esapi(api, monkeypatch):
+    """The ESAPI context api uses, kept open so it can be inspected"""
+    monkeypatch.setattr(tpm2_api, "ESAPI", FakeESAPI)
+    monkeypatch.setattr(tpm2_api, "ESYS_TR", SimpleNamespace(OWNER="owner"))
+    monkeypatch.setattr(tpm2_api, "TPM_LOCK_FILE", "tpm.lock")
+    api._esys = FakeESAPI(api.tcti_name)
+    return api._esys
+
+
+def test_hot_key_reference_is_closed(api, esapi):
+    with open("key.ctx", 'wb') as f:
+        f.write(b"context")
+    esapi.populated.add(0x81000100)
+    api._hot_keys["key.ctx"] = (api._file_stamp("key.ctx"), 0x81000100)
+
+    with api._esapi_loaded("key.ctx") as (ectx, handle):
+        assert handle in esapi.references
+    assert not esapi.references
+
+    with pytest.raises(ValueError):
+        with api._esapi_loaded("key.ctx"):
+            raise ValueError("operation failed")
+    assert not esapi.references
+
+
+def test_evict_closes_references_it_could_not_evict(api, esapi):
+    esapi.populated.update({0x81000001, 0x81000002})
+    esapi.evictable.add(0x81000001)
+
+    cleared = api._evict_persistent_handles([0x81000001, 0x81000002, 0x81000003])
+    assert cleared == ["0x81000001"]
+    assert esapi.evicted == [0x81000001]
+    assert not esapi.references
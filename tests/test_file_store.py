@@ -0,0 +1,249 @@
+"""
+Tests for the RSA file store log (data key envelope, append and compaction)
+"""
+
+import os
+import struct
+
+import pytest
+
+aead_module = pytest.importorskip("cryptography.hazmat.primitives.ciphers.aead")
+
+import tpm2_api
+from tpm2_api import TPM2API
+
+STORE = "store.json"
+CONTEXT = "rsa.ctx"
+
+
+@pytest.fixture
+def open_store(api):
+    """Return a function creating TPM2API instances that wrap the store's data key without a TPM"""
+    def make(instance=None):
+        instance = instance or TPM2API("swtpm:host=127.0.0.1,port=2321", verify=False)
+        instance.encrypt_data_bytes = lambda context_file, data, output_file: {
+            "success": True, "encrypted_data": b"wrapped:" + data}
+        instance.decrypt_data_bytes = lambda context_file, data, output_file: {
+            "success": True, "decrypted_data": data[len(b"wrapped:"):]}
+        return instance
+    return make
+
+
+def read_frames(path):
+    """Split a store log into its frames"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    frames = []
+    offset = 0
+    while offset < len(data):
+        (length,) = struct.unpack_from('>I', data, offset)
+        frames.append(data[offset:offset + 4 + length])
+        offset += 4 + length
+    return frames
+
+
+def list_keys(store):
+    result = store.list_file_store_keys(CONTEXT, STORE)
+    assert result['success'], result
+    return sorted(result['keys'])
+
+
+def test_round_trip_appends_changes(api, open_store):
+    store = open_store(api)
+    assert store.create_encrypted_file_store(CONTEXT, STORE)['success']
+    assert store.store_key_value(CONTEXT, STORE, "a", {"x": 1})['success']
+    assert store.store_key_value(CONTEXT, STORE, "b", 2)['success']
+    assert store.delete_key_value(CONTEXT, STORE, "a")['success']
+
+    assert len(read_frames(STORE)) == 4
+    reader = open_store()
+    assert list_keys(reader) == ["b"]
+    assert reader.retrieve_key_value(CONTEXT, STORE, "b")['value'] == 2
+
+
+def test_store_values_are_json_round_tripped(api, open_store):
+    store = open_store(api)
+    store.create_encrypted_file_store(CONTEXT, STORE)
+    value = {"nested": [1, 2.5, None, True, "text"], "big": 2 ** 70}
+    assert store.store_key_value(CONTEXT, STORE, "k", value)['success']
+
+    assert open_store().retrieve_key_value(CONTEXT, STORE, "k")['value'] == value
+
+
+def test_values_changed_in_place_are_stored(api, open_store):
+    store = open_store(api)
+    assert store.create_encrypted_file_store(CONTEXT, STORE)['success']
+    assert store.store_key_value(CONTEXT, STORE, "a", {"x": 1})['success']
+    value = store.retrieve_key_value(CONTEXT, STORE, "a")['value']
+    value["x"] = 2
+    assert store.store_key_value(CONTEXT, STORE, "a", value)['success']
+    assert store.store_key_value(CONTEXT, STORE, "b", 1)['success']
+    assert store.store_key_value(CONTEXT, STORE, "b", True)['success']
+
+    reader = open_store()
+    assert reader.retrieve_key_value(CONTEXT, STORE, "a")['value'] == {"x": 2}
+    assert reader.retrieve_key_value(CONTEXT, STORE, "b")['value'] is True
+
+
+def test_log_is_compacted(api, open_store, monkeypatch):
+    monkeypatch.setattr(tpm2_api, "STORE_COMPACT_MIN_SIZE", 0)
+    store = open_store(api)
+    store.create_encrypted_file_store(CONTEXT, STORE)
+    for i in range(20):
+        assert store.store_key_value(CONTEXT, STORE, f"key{i}", i)['success']
+
+    frames = read_frames(STORE)
+    assert len(frames) < 20
+    assert os.path.getsize(STORE) <= tpm2_api.STORE_COMPACT_RATIO * len(frames[0]) + len(frames[-1])
+    assert list_keys(open_store()) == sorted(f"key{i}" for i in range(20))
+
+
+def test_small_log_is_not_compacted(api, open_store):
+    store = open_store(api)
+    store.create_encrypted_file_store(CONTEXT, STORE)
+    for i in range(20):
+        assert store.store_key_value(CONTEXT, STORE, f"key{i}", i)['success']
+
+    assert len(read_frames(STORE)) == 21
+
+
+def test_torn_trailing_frame_is_discarded(api, open_store):
+    store = open_store(api)
+    assert store.create_encrypted_file_store(CONTEXT, STORE)['success']
+    store.store_key_value(CONTEXT, STORE, "a", 1)
+    with open(STORE + tpm2_api.STORE_DEK_SUFFIX, 'rb') as f:
+        dek = f.read()
+    store.store_key_value(CONTEXT, STORE, "b", 2)
+    # A crash part-way through an append leaves a partial frame and the old head
+    with open(STORE, 'r+b') as f:
+        f.truncate(os.path.getsize(STORE) - 5)
+    with open(STORE + tpm2_api.STORE_DEK_SUFFIX, 'wb') as f:
+        f.write(dek)
+
+    reader = open_store()
+    assert list_keys(reader) == ["a"]
+
+    # The next write replaces the partial log with a snapshot instead of appending after it
+    assert reader.store_key_value(CONTEXT, STORE, "c", 3)['success']
+    assert len(read_frames(STORE)) == 1
+    assert list_keys(open_store()) == ["a", "c"]
+
+
+def test_torn_length_prefix_is_discarded(api, open_store):
+    store = open_store(api)
+    assert store.create_encrypted_file_store(CONTEXT, STORE)['success']
+    store.store_key_value(CONTEXT, STORE, "a", 1)
+    with open(STORE, 'ab') as f:
+        f.write(b'\x00\x00')
+
+    assert list_keys(open_store()) == ["a"]
+
+
+def test_reordered_frames_fail_authentication(api, open_store):
+    store = open_store(api)
+    assert store.create_encrypted_file_store(CONTEXT, STORE)['success']
+    store.store_key_value(CONTEXT, STORE, "a", 1)
+    store.store_key_value(CONTEXT, STORE, "b", 2)
+    store.store_key_value(CONTEXT, STORE, "c", 3)
+    snapshot, first, second, third = read_frames(STORE)
+    with open(STORE, 'wb') as f:
+        f.write(snapshot + second + first + third)
+
+    result = open_store().list_file_store_keys(CONTEXT, STORE)
+    assert not result['success']
+    assert "failed authentication" in result['error']
+
+
+def test_tampered_trailing_frame_fails_authentication(api, open_store):
+    store = open_store(api)
+    assert store.create_encrypted_file_store(CONTEXT, STORE)['success']
+    store.store_key_value(CONTEXT, STORE, "a", 1)
+    with open(STORE, 'r+b') as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last[0] ^ 1]))
+
+    result = open_store().list_file_store_keys(CONTEXT, STORE)
+    assert not result['success']
+    assert "failed authentication" in result['error']
+
+
+def test_dropped_trailing_frames_are_detected(api, open_store):
+    store = open_store(api)
+    assert store.create_encrypted_file_store(CONTEXT, STORE)['success']
+    store.store_key_value(CONTEXT, STORE, "a", 1)
+    store.store_key_value(CONTEXT, STORE, "b", 2)
+    snapshot, first, second = read_frames(STORE)
+    with open(STORE, 'wb') as f:
+        f.write(snapshot + first)
+
+    result = open_store().list_file_store_keys(CONTEXT, STORE)
+    assert not result['success']
+    assert "rolled back" in result['error']
+
+
+def test_log_ahead_of_its_head_is_accepted(api, open_store):
+    store = open_store(api)
+    assert store.create_encrypted_file_store(CONTEXT, STORE)['success']
+    with open(STORE + tpm2_api.STORE_DEK_SUFFIX, 'rb') as f:
+        dek = f.read()
+    store.store_key_value(CONTEXT, STORE, "a", 1)
+    # A crash between appending a frame and recording it leaves the old head
+    with open(STORE + tpm2_api.STORE_DEK_SUFFIX, 'wb') as f:
+        f.write(dek)
+
+    reader = open_store()
+    assert list_keys(reader) == ["a"]
+    assert reader.store_key_value(CONTEXT, STORE, "b", 2)['success']
+    assert list_keys(open_store()) == ["a", "b"]
+
+
+def crash_on_rename(monkeypatch, target):
+    """Make os.replace onto target fail, as if the process died just before it"""
+    replace = os.replace
+
+    def fail(src, dst):
+        if dst == target:
+            raise OSError("crashed")
+        replace(src, dst)
+    monkeypatch.setattr(os, "replace", fail)
+
+
+def test_crash_before_new_key_is_renamed(api, open_store, monkeypatch):
+    store = open_store(api)
+    assert store.create_encrypted_file_store(CONTEXT, STORE)['success']
+    store.store_key_value(CONTEXT, STORE, "a", 1)
+    with monkeypatch.context() as patch:
+        crash_on_rename(patch, STORE + tpm2_api.STORE_DEK_SUFFIX)
+        assert not store.create_encrypted_file_store(CONTEXT, STORE)['success']
+
+    # The store was replaced, so the new key file is the one that opens it
+    reader = open_store()
+    assert list_keys(reader) == []
+    assert not os.path.exists(STORE + tpm2_api.STORE_NEW_DEK_SUFFIX)
+    assert reader.store_key_value(CONTEXT, STORE, "b", 2)['success']
+    assert list_keys(open_store()) == ["b"]
+
+
+def test_crash_before_store_is_replaced(api, open_store, monkeypatch):
+    store = open_store(api)
+    assert store.create_encrypted_file_store(CONTEXT, STORE)['success']
+    store.store_key_value(CONTEXT, STORE, "a", 1)
+    with monkeypatch.context() as patch:
+        crash_on_rename(patch, STORE)
+        assert not store.create_encrypted_file_store(CONTEXT, STORE)['success']
+
+    assert list_keys(open_store()) == ["a"]
+
+
+def test_truncated_snapshot_is_an_error(api, open_store):
+    store = open_store(api)
+    assert store.create_encrypted_file_store(CONTEXT, STORE)['success']
+    store.store_key_value(CONTEXT, STORE, "a", 1)
+    snapshot = read_frames(STORE)[0]
+    with open(STORE, 'wb') as f:
+        f.write(snapshot[:-5])
+
+    result = open_store().list_file_store_keys(CONTEXT, STORE)
+    assert not result['success']
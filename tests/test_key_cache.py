@@ -0,0 +1,110 @@
+"""
+Tests for reusing primary keys and loaded key contexts across calls
+"""
+
+import pytest
+
+import tpm2_api
+
+
+class FakeKeyTools:
+    """Stand-in for _run_command: keys are created and loaded by writing their context files"""
+
+    def __init__(self):
+        self.commands = []
+        self.readpublic_ok = True
+
+    def __call__(self, cmd, input_data=None, binary=False):
+        self.commands.append(cmd[0])
+        if cmd[0] == 'tpm2_readpublic':
+            if self.readpublic_ok:
+                return {"success": True, "output": b""}
+            return {"success": False, "error": "ERROR: Esys_ContextLoad(0x1DF) - tpm:parameter(1):integrity check failed"}
+        if cmd[0] in ('tpm2_createprimary', 'tpm2_load'):
+            with open(cmd[cmd.index('-c') + 1], 'wb') as f:
+                f.write(b"context")
+            return {"success": True, "output": b"name: 000b1234\nqualified name: 000b5678\n"}
+        return {"success": False, "error": f"unexpected command {cmd[0]}"}
+
+
+@pytest.fixture
+def tools(api, monkeypatch):
+    monkeypatch.setattr(tpm2_api, "ESAPI", None)
+    api._run_command = FakeKeyTools()
+    return api._run_command
+
+
+def write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def test_primary_key_is_reused_while_the_tpm_loads_it(api, tools):
+    first = api.create_primary_key()
+    assert first['success'], first
+    assert first['key_info'] == {"name": "000b1234", "qualified_name": "000b5678"}
+
+    second = api.create_primary_key()
+    assert second['key_info'] == first['key_info']
+    assert tools.commands == ['tpm2_createprimary', 'tpm2_readpublic']
+
+    # A TPM clear or restart leaves the saved context unloadable
+    tools.readpublic_ok = False
+    assert api.create_primary_key()['success']
+    assert tools.commands[-2:] == ['tpm2_readpublic', 'tpm2_createprimary']
+
+
+def test_primary_key_is_recreated_when_its_context_changes(api, tools):
+    api.create_primary_key()
+    write("primary.ctx", b"another context")
+
+    api.create_primary_key()
+    assert tools.commands == ['tpm2_createprimary', 'tpm2_createprimary']
+
+
+def test_load_is_reused_until_the_blobs_change(api, tools):
+    write("primary.ctx", b"parent")
+    write("key.pub", b"public")
+    write("key.priv", b"private")
+
+    for _ in range(2):
+        assert api.load_key("primary.ctx", "key.pub", "key.priv", "key.ctx")['success']
+    assert tools.commands == ['tpm2_load']
+
+    write("key.priv", b"other private")
+    assert api.load_key("primary.ctx", "key.pub", "key.priv", "key.ctx")['success']
+    assert tools.commands == ['tpm2_load', 'tpm2_load']
+
+
+def test_evict_cached_key(api, tools):
+    write("primary.ctx", b"parent")
+    write("key.pub", b"public")
+    write("key.priv", b"private")
+    api.load_key("primary.ctx", "key.pub", "key.priv", "key.ctx")
+
+    assert api.evict_cached_key("primary.ctx", "key.pub", "key.priv")['evicted'] == 1
+    assert api.evict_cached_key("primary.ctx", "key.pub", "key.priv")['evicted'] == 0
+    api.load_key("primary.ctx", "key.pub", "key.priv", "key.ctx")
+    assert tools.commands == ['tpm2_load', 'tpm2_load']
+
+
+def test_least_recently_used_load_is_evicted(api, tools, monkeypatch):
+    monkeypatch.setattr(tpm2_api, "LOADED_KEY_CACHE_SIZE", 2)
+    write("primary.ctx", b"parent")
+    for name in "abc":
+        write(f"{name}.pub", name.encode())
+        write(f"{name}.priv", name.encode())
+
+    def load(name):
+        assert api.load_key("primary.ctx", f"{name}.pub", f"{name}.priv", f"{name}.ctx")['success']
+
+    load("a")
+    load("b")
+    load("a")  # a is now the most recently used
+    load("c")  # evicts b
+    assert len(tools.commands) == 3
+
+    load("a")
+    assert len(tools.commands) == 3
+    load("b")
+    assert len(tools.commands) == 4
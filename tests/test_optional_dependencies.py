@@ -0,0 +1,123 @@
+"""
+Tests for the code paths used when optional packages are not installed
+"""
+
+import base64
+
+import pytest
+
+TCTI = "swtpm:host=127.0.0.1,port=2321"
+
+
+class FakeTools:
+    """Stand-in for _run_command: RSA "encryption" is reversible and signatures check out if good"""
+
+    def __init__(self, signature_valid=True):
+        self.signature_valid = signature_valid
+        self.commands = []
+
+    def __call__(self, cmd, input_data=None, binary=False):
+        self.commands.append(cmd[0])
+        if cmd[0] == 'tpm2_rsaencrypt':
+            return {"success": True, "output": b"sealed:" + input_data}
+        if cmd[0] == 'tpm2_rsadecrypt':
+            assert input_data.startswith(b"sealed:")
+            return {"success": True, "output": input_data[len(b"sealed:"):]}
+        if cmd[0] == 'tpm2_verifysignature':
+            if self.signature_valid:
+                return {"success": True, "output": b""}
+            return {"success": False, "error": "ERROR: Esys_VerifySignature(0x2DB) - tpm:parameter(2):the signature is not valid"}
+        return {"success": False, "error": f"unexpected command {cmd[0]}"}
+
+
+@pytest.fixture
+def api_without_cryptography(import_without, tmp_path, monkeypatch):
+    """TPM2API from a copy of tpm2_api imported without cryptography (or tpm2-pytss)"""
+    monkeypatch.chdir(tmp_path)
+    module = import_without("tpm2_api", "cryptography", "tpm2_pytss")
+    assert module.AESGCM is None
+    return module.TPM2API(TCTI, verify=False)
+
+
+def test_encrypt_without_cryptography_uses_tpm(api_without_cryptography):
+    api = api_without_cryptography
+    api._run_command = FakeTools()
+
+    result = api.encrypt_data_bytes("rsa.ctx", b"secret", None)
+    assert result['success'], result
+    assert result['encrypted_data'] == b"sealed:secret"
+    assert api._run_command.commands == ['tpm2_rsaencrypt']
+
+    result = api.decrypt_data_bytes("rsa.ctx", result['encrypted_data'], None)
+    assert result['success'], result
+    assert result['decrypted_data'] == b"secret"
+
+
+@pytest.mark.parametrize("valid", [True, False])
+def test_verify_without_cryptography_uses_tpm(api_without_cryptography, valid):
+    api = api_without_cryptography
+    api._run_command = FakeTools(signature_valid=valid)
+    data = base64.b64encode(b"message").decode()
+    signature = base64.b64encode(b"signature").decode()
+
+    result = api.verify_signature("rsa.ctx", data, signature)
+    assert result['verified'] is valid
+    assert api._run_command.commands == ['tpm2_verifysignature']
+
+
+def test_file_store_without_cryptography_is_rsa_encrypted(api_without_cryptography):
+    api = api_without_cryptography
+    api._run_command = FakeTools()
+
+    assert api.create_encrypted_file_store("rsa.ctx", "store.json")['success']
+    assert api.store_key_value("rsa.ctx", "store.json", "a", 1)['success']
+    with open("store.json", 'rb') as f:
+        assert f.read().startswith(b"sealed:")
+
+    api._store_cache.clear()
+    result = api.retrieve_key_value("rsa.ctx", "store.json", "a")
+    assert result['success'], result
+    assert result['value'] == 1
+
+
+class FakeTPM:
+    """Stand-in for the REST API's TPM2API instance"""
+
+    def get_tpm_info(self):
+        return {"success": True, "counter": 2 ** 70, "manufacturer": "IBM"}
+
+
+def test_file_store_serialization_without_orjson(monkeypatch):
+    import tpm2_api
+    monkeypatch.setattr(tpm2_api, "orjson", None)
+    store = {"big": 2 ** 70, "text": "été", "nested": {"list": [1, None, True]}}
+
+    assert tpm2_api._load_store(tpm2_api._dump_store(store)) == store
+
+
+def test_rest_responses_without_orjson(import_without, monkeypatch):
+    from fastapi import responses
+    from fastapi.testclient import TestClient
+
+    rest = import_without("tpm2_rest_api", "orjson")
+    assert rest.orjson is None
+    assert rest.OrjsonResponse({"a": 1}).body == responses.JSONResponse({"a": 1}).body
+    monkeypatch.setattr(rest, "tpm_api", FakeTPM())
+
+    response = TestClient(rest.app).get("/health")
+    assert response.status_code == 200
+    assert response.json()["tpm_info"]["counter"] == 2 ** 70
+
+
+def test_orjson_response_falls_back_for_big_integers(monkeypatch):
+    pytest.importorskip("orjson")
+    from fastapi.testclient import TestClient
+
+    import tpm2_rest_api
+    assert tpm2_rest_api.app.router.default_response_class is tpm2_rest_api.OrjsonResponse
+    assert tpm2_rest_api.OrjsonResponse({1: "a"}).body == b'{"1":"a"}'
+    monkeypatch.setattr(tpm2_rest_api, "tpm_api", FakeTPM())
+
+    response = TestClient(tpm2_rest_api.app).get("/health")
+    assert response.status_code == 200
+    assert response.json()["tpm_info"]["counter"] == 2 ** 70
@@ -0,0 +1,188 @@
+"""
+Tests for REST endpoints, run against a TPM2API whose TPM-bound steps are replaced
+"""
+
+import base64
+import hashlib
+import os
+
+import pytest
+
+pytest.importorskip("cryptography")
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from fastapi.testclient import TestClient
+
+import tpm2_rest_api
+
+
+@pytest.fixture(scope="module")
+def signing_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.fixture
+def client(api, signing_key, monkeypatch):
+    """Client for the REST app; signatures are RSASSA-PKCS1-v1_5/SHA-256 like tpm2_sign's default"""
+    def sign_data_bytes(context_file, data, signature_file="signature.sig"):
+        return {"success": True, "signature": signing_key.sign(data, padding.PKCS1v15(), hashes.SHA256())}
+
+    api.sign_data_bytes = sign_data_bytes
+    monkeypatch.setattr(tpm2_rest_api, "tpm_api", api)
+    return TestClient(tpm2_rest_api.app)
+
+
+def fold_proof(proof):
+    """Hash a Merkle proof's leaf up its path"""
+    node = bytes.fromhex(proof["leaf"])
+    for step in proof["path"]:
+        sibling = bytes.fromhex(step["hash"])
+        pair = sibling + node if step["position"] == "left" else node + sibling
+        node = hashlib.sha256(b'\x01' + pair).digest()
+    return node
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 5, 8])
+def test_sign_merkle_proofs_verify(client, signing_key, count):
+    payloads = [f"payload {i}".encode() for i in range(count)]
+    response = client.post("/tpm2/sign-merkle", json={
+        "context_file": "rsa.ctx",
+        "data": [base64.b64encode(payload).decode() for payload in payloads]
+    })
+    assert response.status_code == 200
+    result = response.json()
+
+    root = bytes.fromhex(result["root"])
+    signing_key.public_key().verify(base64.b64decode(result["signature"]), root,
+                                    padding.PKCS1v15(), hashes.SHA256())
+
+    assert len(result["proofs"]) == count
+    for payload, proof in zip(payloads, result["proofs"]):
+        assert proof["leaf"] == hashlib.sha256(b'\x00' + payload).hexdigest()
+        assert fold_proof(proof) == root
+
+
+def test_sign_merkle_proof_does_not_cover_other_payloads(client):
+    payloads = [b"a", b"b", b"c"]
+    result = client.post("/tpm2/sign-merkle", json={
+        "context_file": "rsa.ctx",
+        "data": [base64.b64encode(payload).decode() for payload in payloads]
+    }).json()
+
+    proof = dict(result["proofs"][0], leaf=hashlib.sha256(b'\x00' + b"x").hexdigest())
+    assert fold_proof(proof) != bytes.fromhex(result["root"])
+
+    # Swapping the sides of a proof step changes the result as well
+    proof = result["proofs"][0]
+    swapped = dict(proof, path=[dict(proof["path"][0], position="left")] + proof["path"][1:])
+    assert fold_proof(swapped) != bytes.fromhex(result["root"])
+
+
+def test_sign_merkle_without_items(client):
+    response = client.post("/tpm2/sign-merkle", json={"context_file": "rsa.ctx", "data": []})
+    assert response.status_code == 400
+
+
+def test_soft_persistent_contexts_are_dropped_by_soft_reset(client, api):
+    commands = []
+
+    def run_command(cmd, input_data=None, binary=False):
+        commands.append(cmd[0])
+        return {"success": True, "output": b""}
+    api._run_command = run_command
+    with open("key.ctx", 'wb') as f:
+        f.write(b"context")
+
+    response = client.post("/tpm2/make-persistent-soft", json={"context_file": "key.ctx"})
+    assert response.status_code == 200
+    assert response.json()["action"] == "key_persisted_soft"
+    assert commands == ['tpm2_readpublic']
+
+    response = client.post("/tpm2/full-reset", params={"mode": "soft"})
+    assert response.status_code == 200
+    assert response.json()["results"]["removed_contexts"] == ["key.ctx"]
+    assert not os.path.exists("key.ctx")
+    assert 'tpm2_clear' not in commands
+
+
+def test_soft_persisting_a_missing_context_fails(client):
+    response = client.post("/tpm2/make-persistent-soft", json={"context_file": "missing.ctx"})
+    assert response.status_code == 400
+
+
+def test_busy_tpm_refuses_only_tpm_requests(client, api, monkeypatch):
+    api.get_tpm_info = lambda: {"success": True}
+    monkeypatch.setattr(tpm2_rest_api, "_tpm_requests",
+                        tpm2_rest_api.TPM_WORKERS + tpm2_rest_api.TPM_QUEUE_LIMIT)
+
+    response = client.get("/tpm2/info")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+    assert client.get("/tpm2/list-files").status_code == 200
+
+    monkeypatch.setattr(tpm2_rest_api, "_tpm_requests", 0)
+    assert client.get("/tpm2/info").status_code == 200
+    assert tpm2_rest_api._tpm_requests == 0
+
+
+@pytest.fixture
+def raw_client(client, api):
+    """Client whose RSA encryption is reversible without a TPM"""
+    api.encrypt_data_bytes = lambda context_file, data, encrypted_file: {
+        "success": True, "encrypted_data": data[::-1]}
+    api.decrypt_data_bytes = lambda context_file, encrypted_data, decrypted_file: {
+        "success": True, "decrypted_data": encrypted_data[::-1]}
+    return client
+
+
+def test_sign_raw_returns_the_signature(raw_client, signing_key):
+    response = raw_client.post("/tpm2/sign-raw", params={"context_file": "rsa.ctx"}, content=b"\x00payload\xff",
+                               headers={"Content-Type": "application/octet-stream"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/octet-stream"
+    signing_key.public_key().verify(response.content, b"\x00payload\xff", padding.PKCS1v15(), hashes.SHA256())
+
+
+def test_encrypt_and_decrypt_raw_round_trip(raw_client):
+    encrypted = raw_client.post("/tpm2/encrypt-raw", params={"context_file": "rsa.ctx"}, content=b"secret")
+    assert encrypted.status_code == 200
+    assert encrypted.content == b"terces"
+
+    decrypted = raw_client.post("/tpm2/decrypt-raw", params={"context_file": "rsa.ctx"}, content=encrypted.content)
+    assert decrypted.status_code == 200
+    assert decrypted.content == b"secret"
+
+
+@pytest.mark.parametrize("path, param", [
+    ("/tpm2/sign-raw", "signature_file"),
+    ("/tpm2/encrypt-raw", "encrypted_file"),
+    ("/tpm2/decrypt-raw", "decrypted_file"),
+])
+def test_raw_endpoints_write_no_files(raw_client, api, path, param):
+    output_files = []
+    for name in ("sign_data_bytes", "encrypt_data_bytes", "decrypt_data_bytes"):
+        def record(context_file, method=getattr(api, name), **kwargs):
+            output_files.extend(value for key, value in kwargs.items() if key.endswith("_file"))
+            return method(context_file, *kwargs.values())
+        setattr(api, name, record)
+
+    response = raw_client.post(path, params={"context_file": "rsa.ctx", param: "/etc/written.bin"}, content=b"data")
+    assert response.status_code == 200
+    assert output_files == [None]
+
+
+def test_raw_endpoint_errors_are_reported(raw_client, api):
+    api.decrypt_data_bytes = lambda context_file, encrypted_data, decrypted_file: {
+        "success": False, "error": "decryption failed"}
+    response = raw_client.post("/tpm2/decrypt-raw", params={"context_file": "rsa.ctx"}, content=b"data")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "decryption failed"
+
+
+def test_rest_api_uses_the_shared_instance(import_without, api, monkeypatch):
+    import tpm2_api
+    monkeypatch.setattr(tpm2_api, "get_api", lambda tcti_name=None: api)
+
+    rest = import_without("tpm2_rest_api")
+    assert rest.tpm_api is api
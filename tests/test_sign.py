@@ -0,0 +1,46 @@
+"""
+Tests for signing host-computed digests with tpm2_sign
+"""
+
+TICKET_ERROR = "ERROR:esys:src/tss2-esys/api/Esys_Sign.c:314:Esys_Sign_Finish() Received TPM Error\n" \
+               "ERROR: Esys_Sign(0x3CC) - tpm:parameter(3):invalid ticket"
+AUTH_ERROR = "ERROR: Esys_Sign(0x98E) - tpm:session(1):the authorization HMAC check failed"
+
+
+class FakeSign:
+    """Stand-in for _run_command: tpm2_sign fails on digests with the given error"""
+
+    def __init__(self, digest_error):
+        self.digest_error = digest_error
+        self.commands = []
+
+    def __call__(self, cmd, input_data=None, binary=False):
+        digest = '-d' in cmd
+        self.commands.append('digest' if digest else 'message')
+        if digest and self.digest_error:
+            return {"success": False, "error": self.digest_error}
+        with open(cmd[cmd.index('-s') + 1], 'wb') as f:
+            f.write(b"signature")
+        return {"success": True, "output": b""}
+
+
+def test_restricted_key_falls_back_to_message(api):
+    api._run_command = FakeSign(TICKET_ERROR)
+
+    result = api.sign_data_bytes("key.ctx", b"message", None)
+    assert result['success'], result
+    assert result['signature'] == b"signature"
+    assert api._run_command.commands == ['digest', 'message']
+
+    # The key is remembered as restricted
+    assert api.sign_data_bytes("key.ctx", b"message", None)['success']
+    assert api._run_command.commands == ['digest', 'message', 'message']
+
+
+def test_other_digest_errors_are_returned(api):
+    api._run_command = FakeSign(AUTH_ERROR)
+
+    result = api.sign_data_bytes("key.ctx", b"message", None)
+    assert not result['success']
+    assert result['error'] == AUTH_ERROR
+    assert api._run_command.commands == ['digest']
@@ -0,0 +1,102 @@
+"""
+Tests for parsing tpm2-tools output, with PyYAML and with the built-in parser
+"""
+
+import pytest
+
+import tpm2_api
+from tpm2_api import TPM2API
+
+# tpm2_getcap properties-fixed on swtpm (abridged)
+GETCAP_PROPERTIES_FIXED = b'''TPM2_PT_FAMILY_INDICATOR:
+  raw: 0x322E3000
+  value: "2.0"
+TPM2_PT_LEVEL:
+  raw: 0
+TPM2_PT_REVISION:
+  raw: 0xA4
+  value: 1.64
+TPM2_PT_DAY_OF_YEAR:
+  raw: 0x0
+TPM2_PT_YEAR:
+  raw: 0x0
+TPM2_PT_MANUFACTURER:
+  raw: 0x49424D00
+  value: "IBM"
+TPM2_PT_VENDOR_STRING_1:
+  raw: 0x53572020
+  value: "SW"
+TPM2_PT_VENDOR_STRING_2:
+  raw: 0x2054504D
+  value: " TPM"
+TPM2_PT_FIRMWARE_VERSION_1:
+  raw: 0x20191023
+'''
+
+# tpm2_createprimary -C o -G rsa2048 -g sha256 -c primary.ctx (modulus shortened)
+CREATEPRIMARY_OUTPUT = b'''name-alg:
+  value: sha256
+  raw: 0xb
+attributes:
+  value: fixedtpm|fixedparent|sensitivedataorigin|userwithauth|restricted|decrypt
+  raw: 0x30072
+type:
+  value: rsa
+  raw: 0x1
+exponent: 65537
+bits: 2048
+scheme:
+  value: null
+  raw: 0x10
+scheme-halg:
+  value: (null)
+  raw: 0x0
+sym-alg:
+  value: aes
+  raw: 0x6
+sym-mode:
+  value: cfb
+  raw: 0x43
+sym-keybits: 128
+rsa: c4e1a0d3b5f27e9801
+'''
+
+
+@pytest.fixture(params=["pyyaml", "builtin"])
+def parser(request, monkeypatch):
+    """Run a test once with PyYAML (if installed) and once with the built-in parser"""
+    if request.param == "pyyaml":
+        if tpm2_api.yaml is None:
+            pytest.skip("PyYAML is not installed")
+    else:
+        monkeypatch.setattr(tpm2_api, "yaml", None)
+    return TPM2API._parse_tool_output
+
+
+@pytest.mark.parametrize("as_text", [False, True])
+def test_getcap_properties(parser, as_text):
+    output = GETCAP_PROPERTIES_FIXED.decode() if as_text else GETCAP_PROPERTIES_FIXED
+    parsed = parser(output)
+
+    assert parsed["TPM2_PT_FAMILY_INDICATOR"]["value"] == "2.0"
+    assert parsed["TPM2_PT_MANUFACTURER"]["value"] == "IBM"
+    assert parsed["TPM2_PT_VENDOR_STRING_2"]["value"] == " TPM"
+    assert str(parsed["TPM2_PT_LEVEL"]["raw"]) == "0"
+    assert "value" not in parsed["TPM2_PT_FIRMWARE_VERSION_1"]
+
+
+def test_createprimary_output(parser):
+    parsed = parser(CREATEPRIMARY_OUTPUT)
+
+    assert parsed["name-alg"]["value"] == "sha256"
+    assert parsed["type"]["value"] == "rsa"
+    assert parsed["attributes"]["value"].split("|")[-1] == "decrypt"
+    assert parsed["sym-mode"]["value"] == "cfb"
+    assert str(parsed["exponent"]) == "65537"
+    assert str(parsed["bits"]) == "2048"
+    assert parsed["rsa"] == "c4e1a0d3b5f27e9801"
+
+
+@pytest.mark.parametrize("output", [b"", b"not a mapping", b"- a\n- b\n"])
+def test_output_without_mapping(parser, output):
+    assert parser(output) == {}
@@ -0,0 +1,59 @@
+"""
+Tests for verifying signatures with the cached public key instead of the TPM
+"""
+
+import base64
+import hashlib
+import struct
+
+import pytest
+
+pytest.importorskip("cryptography")
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+
+import tpm2_api
+
+DATA = b"message"
+DIGEST = hashlib.sha256(DATA).digest()
+
+
+@pytest.fixture
+def private_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.fixture
+def api_with_key(api, private_key):
+    api._get_public_key = lambda context_file: private_key.public_key()
+    return api
+
+
+def tss(signature):
+    """Wrap a raw RSASSA/SHA-256 signature like tpm2_sign's 'tss' format"""
+    return struct.pack('>HHH', tpm2_api.TPM_ALG_RSASSA, tpm2_api.TPM_ALG_SHA256, len(signature)) + signature
+
+
+def test_rsassa_signatures_are_verified_locally(api_with_key, private_key):
+    signature = private_key.sign(DATA, padding.PKCS1v15(), hashes.SHA256())
+
+    assert api_with_key._verify_locally("rsa.ctx", DIGEST, signature) is True
+    assert api_with_key._verify_locally("rsa.ctx", DIGEST, tss(signature)) is True
+    assert api_with_key._verify_locally("rsa.ctx", hashlib.sha256(b"other").digest(), tss(signature)) is False
+
+
+def test_plain_signature_of_another_scheme_is_left_to_the_tpm(api_with_key, private_key):
+    signature = private_key.sign(DATA, padding.PSS(padding.MGF1(hashes.SHA256()), 32), hashes.SHA256())
+    assert api_with_key._verify_locally("rsa.ctx", DIGEST, signature) is None
+
+    commands = []
+
+    def run_command(cmd, input_data=None, binary=False):
+        commands.append(cmd[0])
+        return {"success": True, "output": b""}
+    api_with_key._run_command = run_command
+
+    result = api_with_key.verify_signature("rsa.ctx", base64.b64encode(DATA).decode(),
+                                           base64.b64encode(signature).decode())
+    assert result['verified'] is True
+    assert commands == ['tpm2_verifysignature']
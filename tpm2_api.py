@@ -4,13 +4,197 @@ TPM2 Python API - A simple interface for TPM2 operations using system calls
 """
 
 import os
+import re
 import json
-import base64
+import logging
+import asyncio
+import copy
+import hashlib
+import functools
+import shutil
+import struct
 import subprocess
 import tempfile
-from typing import Dict, List, Optional, Any
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from typing import Dict, List, Optional, Any, Sequence, Tuple
+
+try:
+    from tpm2_pytss import (
+        ESAPI, ESYS_TR, TPM2_ALG, TPM2_CAP, TPM2_HC, TPM2_MAX, TPM2_RC, TPM2_RH, TPM2_ST, TPM2B_DATA,
+        TPM2B_DIGEST, TPM2B_PRIVATE, TPM2B_PUBLIC, TPM2B_PUBLIC_KEY_RSA, TPM2B_SENSITIVE_CREATE, TPMA_OBJECT,
+        TPMS_CONTEXT, TPMT_RSA_DECRYPT, TPMT_SIG_SCHEME, TPMT_SIGNATURE, TPMT_TK_HASHCHECK, TSS2_Exception
+    )
+except ImportError:  # tpm2-pytss is optional; tpm2-tools are used instead
+    ESAPI = None
+    ESYS_TR = None
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; only in-process locking is used there
+    fcntl = None
+
+try:
+    from cryptography.exceptions import InvalidSignature, InvalidTag
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, padding, rsa
+    from cryptography.hazmat.primitives.asymmetric.utils import Prehashed, encode_dss_signature
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+except ImportError:  # cryptography is optional; public-key operations then go through the TPM
+    serialization = None
+    rsa = padding = ec = None
+    AESGCM = None
+
+try:
+    import pybase64 as base64
+except ImportError:  # pybase64 is optional; its SIMD codec is a drop-in for large payloads
+    import base64
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the json module serializes file stores instead
+    orjson = None
+
+try:
+    import yaml
+    # Base loaders keep every scalar a string, so hex names keep their leading zeros
+    _YAML_LOADER = getattr(yaml, "CBaseLoader", yaml.BaseLoader)
+except ImportError:  # PyYAML is optional; a small built-in parser is used instead
+    yaml = None
+
+logger = logging.getLogger(__name__)
+
+# Seconds that TPM properties and connection checks are reused per TCTI
+TPM_INFO_CACHE_TTL = float(os.environ.get("TPM2_INFO_CACHE_TTL", "300"))
+
+# Most recent load_key results remembered per TPM2API instance
+LOADED_KEY_CACHE_SIZE = 64
+
+# Most recent signature verification outcomes remembered per TPM2API instance
+VERIFY_CACHE_SIZE = 1024
+
+# Upper bound on tpm2-tools processes launched at once by _run_commands
+MAX_CONCURRENT_COMMANDS = 8
+
+# Uses of an unchanged context file after which it is persisted and addressed by
+# handle, saving the TPM2_ContextLoad per operation (0 disables)
+HOT_KEY_PERSIST_AFTER = int(os.environ.get("TPM2_HOT_KEY_PERSIST_AFTER", "0"))
+# Owner persistent handles reserved for hot keys: HOT_KEY_HANDLE_BASE + 0..HOT_KEY_MAX-1
+HOT_KEY_HANDLE_BASE = 0x81018000
+HOT_KEY_MAX = 4
+
+# Key contexts left loaded on a kept ESAPI connection between calls, LRU
+# ordered; 3 matches the transient object slots a TPM is required to have
+ESAPI_LOADED_HANDLES = 3
+
+# Payloads staged per _run_commands wave by sign_many (each holds two descriptors)
+SIGN_BATCH_SIZE = 64
+
+# Keep the ESAPI connection to a single-connection TCTI (swtpm, mssim,
+# /dev/tpm0) open between calls instead of reconnecting per operation. It is
+# closed before this process runs a tpm2-tools command; only enable this when
+# the process is the sole client of the TPM.
+ESAPI_KEEP_OPEN = os.environ.get("TPM2_ESAPI_KEEP_OPEN", "").lower() in ("1", "true", "yes")
+
+# Sidecar holding the TPM-wrapped AES-256-GCM data key of an RSA file store,
+# followed by the head of the store log (frame count and last tag) sealed
+# under that key. Stores without one are encrypted with the RSA key directly.
+STORE_DEK_SUFFIX = ".dek"
+# A new data key is written here first and renamed over the key file once the
+# store encrypted with it is in place
+STORE_NEW_DEK_SUFFIX = ".dek.new"
+STORE_NONCE_SIZE = 12
+# Such stores are a log of length-prefixed AES-GCM frames, each a snapshot or
+# a change authenticated together with the tag of the frame before it; the log
+# is rewritten as one snapshot once it grows past this multiple of its first
+# (snapshot) frame, or past STORE_COMPACT_MIN_SIZE bytes for small stores.
+STORE_COMPACT_RATIO = 2
+STORE_COMPACT_MIN_SIZE = 64 * 1024
+_STORE_FRAME_LENGTH = struct.Struct('>I')
+_STORE_TAG_SIZE = 16
+_STORE_DEK_LENGTH = struct.Struct('>H')
+_STORE_HEAD_COUNT = struct.Struct('>Q')
+_STORE_HEAD_AAD = b"store head"
+
+# Lock file serializing single-connection TPMs across worker processes (skipped if not writable)
+TPM_LOCK_FILE = os.environ.get("TPM2_LOCK_FILE", "/var/run/tpm2-fastapi.lock")
+
+# Per-TCTI locks serializing single-connection TPMs across threads
+_tpm_locks: Dict[str, threading.Lock] = {}
+_tpm_locks_guard = threading.Lock()
+_tpm_lock_fd: Optional[int] = None
+
+# Static argv prefixes for the hot-path tools; callers append the per-call arguments
+_CMD_SIGN_DIGEST = ('tpm2_sign', '-g', 'sha256', '-d')  # Input is a digest
+_CMD_SIGN_MESSAGE = ('tpm2_sign', '-g', 'sha256')
+_CMD_VERIFY_DIGEST = ('tpm2_verifysignature', '-g', 'sha256')
+_CMD_RSA_ENCRYPT = ('tpm2_rsaencrypt',)
+_CMD_RSA_DECRYPT = ('tpm2_rsadecrypt',)
+# CFB mode explicitly (default for AES in TPM2); --pad enables PKCS7 padding on encrypt
+_CMD_AES_ENCRYPT = ('tpm2_encryptdecrypt', '--mode', 'cfb', '--pad')
+_CMD_AES_DECRYPT = ('tpm2_encryptdecrypt', '-d', '--mode', 'cfb')
+_CMD_CREATE_PRIMARY = ('tpm2_createprimary', '-G', 'rsa2048', '-g', 'sha256')
+_CMD_LOAD = ('tpm2_load',)
+_CMD_CREATE = ('tpm2_create',)
+_CMD_EVICT_OWNER = ('tpm2_evictcontrol', '-C', 'o', '-c')
+_CMD_READPUBLIC = ('tpm2_readpublic', '-c')
+# Tools that never leave objects or sessions loaded in the TPM
+_STATELESS_TOOLS = frozenset(('tpm2_flushcontext', 'tpm2_getcap', 'tpm2_getrandom'))
+
+_CMD_FLUSH = {
+    "transient": ('tpm2_flushcontext', '-t'),
+    "loaded": ('tpm2_flushcontext', '-l'),
+    "saved": ('tpm2_flushcontext', '-s'),
+    "all": ('tpm2_flushcontext', '-t', '-l', '-s'),
+}
+
+# One 'key: value' line of tpm2-tools YAML output: (indent, key, value)
+_TOOL_OUTPUT_LINE = re.compile(r'^([ \t]*)([^:\n]+):[ \t]*(.*?)[ \t\r]*$', re.M)
+
+# TPM algorithm identifiers found in TPMT_SIGNATURE headers
+TPM_ALG_RSASSA = 0x0014
+TPM_ALG_ECDSA = 0x0018
+TPM_ALG_SHA256 = 0x000B
+
+# Response code in tpm2-tools errors such as "Esys_Sign(0x3CC) - tpm:parameter(3):..."
+_TOOL_ERROR_RC = re.compile(r'\(0x([0-9A-Fa-f]+)\)')
+# TPM_RC_TICKET with the parameter number masked out: what a restricted key
+# answers to a digest signed without a hashcheck ticket
+_TPM_RC_TICKET = 0x08C
+
+# RAM-backed directory for short-lived tool inputs, when the host has one
+STAGING_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+# Anonymous memory files are handed to tools as /proc/self/fd/N paths where supported
+FD_PATH_PREFIX = "/proc/self/fd/"
+MEMFD_AVAILABLE = hasattr(os, "memfd_create") and os.path.isdir(FD_PATH_PREFIX)
+
+
+@functools.lru_cache(maxsize=None)
+def _tool_path(name: str) -> str:
+    """Resolve a tpm2-tools binary to an absolute path once per process (name if not on PATH)"""
+    return shutil.which(name) or name
+
+
+def _dump_store(store_data: Dict[str, Any]) -> bytes:
+    """Serialize file store contents to compact JSON bytes (nobody reads the plaintext on disk)"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(store_data)
+        except TypeError:  # e.g. integers beyond 64 bits, which json handles
+            pass
+    return json.dumps(store_data, separators=(',', ':')).encode()
+
+
+def _load_store(payload: bytes) -> Dict[str, Any]:
+    """Parse decrypted file store contents"""
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
 
-TEMP_DECRYPTED_AES_FILE = "temp_decrypted_aes.json"
 
 class TPM2API:
     """
@@ -21,8 +205,27 @@ class TPM2API:
     - Constructor parameter: tcti_name
     - Environment variable: TPM2_TCTI (takes precedence)
     - Auto-detection: If no TCTI is specified, will try hardware TPM first, then SWTPM
+    
+    If tpm2-pytss is installed, key loading, signing, RSA encryption and
+    decryption, key provisioning and batched maintenance operations (e.g.
+    evicting persistent handles in full_reset) run over an in-process ESAPI
+    connection instead of one tpm2-tools process per call.
     """
     
+    # TCTIs behind a resource manager can serve several clients at once.
+    # Direct swtpm/mssim sockets and /dev/tpm0 accept a single connection.
+    _MULTIPLEXED_TCTI_PREFIXES = ("tabrmd", "device:/dev/tpmrm")
+    
+    # Owner handles full_reset probes when the populated ones cannot be listed
+    _COMMON_PERSISTENT_HANDLES = tuple(range(0x81010001, 0x81010015))
+    
+    # Parsed `tpm2_getcap properties-fixed` output per TCTI as (expiry, properties).
+    # Fixed properties do not change while the TPM is running; the TTL only
+    # covers a different TPM being brought up behind the same TCTI.
+    _props_cache: Dict[str, tuple] = {}
+    # Expiry of the last successful _test_connection per TCTI
+    _live_tctis: Dict[str, float] = {}
+    
     @staticmethod
     def _detect_hardware_tpm() -> Optional[str]:
         """
@@ -58,7 +261,7 @@ class TPM2API:
         """Get TCTI configuration from environment variable"""
         return os.environ.get("TPM2_TCTI") or os.environ.get("TSS2_TCTI") or os.environ.get("TPM2TOOLS_TCTI")
     
-    def __init__(self, tcti_name: Optional[str] = None):
+    def __init__(self, tcti_name: Optional[str] = None, verify: bool = True):
         """
         Initialize TPM2 API
         
@@ -67,6 +270,8 @@ class TPM2API:
                       1. Check TPM2_TCTI environment variable
                       2. Try to auto-detect hardware TPM
                       3. Fall back to SWTPM default (swtpm:host=127.0.0.1,port=2321)
+            verify: Check that the TPM answers before returning. With False,
+                    connection problems surface as errors from the first operation.
         
         Examples:
             # Use hardware TPM (auto-detected)
@@ -81,6 +286,8 @@ class TPM2API:
             # Use SWTPM
             tpm = TPM2API("swtpm:host=127.0.0.1,port=2321")
         """
+        self._esys = None
+        
         # Priority: explicit parameter > environment variable > auto-detect > default
         if tcti_name is not None:
             self.tcti_name = tcti_name
@@ -88,109 +295,618 @@ class TPM2API:
             env_tcti = self._get_tcti_from_env()
             if env_tcti:
                 self.tcti_name = env_tcti
-                print(f"Using TCTI from environment: {self.tcti_name}")
+                logger.info("Using TCTI from environment: %s", self.tcti_name)
             else:
                 # Try to auto-detect hardware TPM
                 hw_tpm = self._detect_hardware_tpm()
                 if hw_tpm:
                     self.tcti_name = hw_tpm
-                    print(f"Auto-detected hardware TPM: {self.tcti_name}")
+                    logger.info("Auto-detected hardware TPM: %s", self.tcti_name)
                 else:
                     self.tcti_name = "swtpm:host=127.0.0.1,port=2321"
-                    print(f"No hardware TPM detected, using SWTPM default: {self.tcti_name}")
+                    logger.info("No hardware TPM detected, using SWTPM default: %s", self.tcti_name)
         
+        self._esys_lock = threading.Lock()
+        # Guards _load_cache and _verify_cache, which worker threads reorder
+        # concurrently; _esapi_handles is only touched under _esys_lock
+        self._cache_lock = threading.Lock()
+        # Context files whose key refuses externally computed digests (restricted keys)
+        self._restricted_sign_contexts = set()
+        # Saved context files standing in for persistent handles (see make_persistent_soft)
+        self._soft_persistent_contexts = set()
+        # context file -> ((mtime_ns, size), RSA public key or None)
+        self._pubkey_cache = {}
+        # (parent stamp, public/private digests, context) -> stamp of the context file written, LRU ordered
+        self._load_cache = OrderedDict()
+        # (context file, stamp, SHA-256 of data, SHA-256 of signature) -> verified, LRU ordered
+        self._verify_cache = OrderedDict()
+        # path -> (stamp, BLAKE2b digest) so key blobs are only hashed after they change
+        self._digest_cache = {}
+        # (hierarchy, context file) -> (stamp of the context file written, key_info)
+        self._primary_cache = {}
+        # context file -> (stamp, persistent handle) for hot keys, and use counts per (file, stamp)
+        self._hot_keys = {}
+        self._key_uses = {}
+        # context file -> (ESAPI context, stamp, transient handle) loaded on a kept connection, LRU ordered
+        self._esapi_handles = OrderedDict()
+        # store name -> (context file, stamp of the encrypted file, parsed contents)
+        self._store_cache = {}
+        # store name -> (stamp, frame count, tag of the last frame) for store logs that end on a whole frame
+        self._store_tails = {}
+        # store name -> (context file, wrapped data key, AESGCM cipher for the data key)
+        self._dek_cache = {}
+        # AES context file -> stamp it last passed the tpm2_readpublic check at
+        self._checked_aes_contexts = {}
+        # Persistent handle -> (context file, stamp) persisted there by this instance
+        self._persistent_handles = {}
+        # Bumped whenever a tool may have left something loaded; flush_context
+        # records the generation (and type) it last flushed at
+        self._tpm_generation = 0
+        self._flushed_at = None
+        if verify:
+            self._test_connection()
+    
+    @property
+    def tcti_name(self) -> str:
+        """TCTI configuration used for every TPM call"""
+        return self._tcti_name
+    
+    @tcti_name.setter
+    def tcti_name(self, value: str):
+        # Rebuild the cached subprocess environment once per change rather
+        # than per command (tools take the TCTI from it, so argv never carries
+        # --tcti), and drop an ESAPI context bound to the previous TCTI
+        self._tcti_name = value
         self._set_environment()
-        self._test_connection()
+        if getattr(self, '_esys', None) is not None:
+            with self._esys_lock:
+                self._close_esys()
+        self._esys_failed = False
     
     def _set_environment(self):
         """Set environment variables for TPM2 tools"""
         os.environ['TSS2_TCTI'] = self.tcti_name
         os.environ['TPM2TOOLS_TCTI'] = self.tcti_name
-        print(f"Set TPM2 environment: TSS2_TCTI={self.tcti_name}")
+        # Built once and reused by every subprocess instead of copying os.environ per call.
+        # tpm2-tools read TPM2TOOLS_TCTI, so no --tcti argument is needed per command.
+        self._env = {**os.environ, 'TSS2_TCTI': self.tcti_name, 'TPM2TOOLS_TCTI': self.tcti_name}
+        logger.debug("Set TPM2 environment: TSS2_TCTI=%s", self.tcti_name)
     
     def _test_connection(self):
-        """Test TPM2 connection"""
+        """Test TPM2 connection (skipped if this TCTI already answered in this process)"""
+        if TPM2API._live_tctis.get(self.tcti_name, 0) > time.monotonic() or self._cached_properties() is not None:
+            return
+        
         try:
-            result = self._run_command(['tpm2_getcap', 'properties-fixed'])
+            # A one-byte random draw is the cheapest round trip to the TPM;
+            # the fixed properties are only fetched when get_tpm_info() is called
+            result = self._run_command(['tpm2_getrandom', '--hex', '1'], binary=True)
             if result['success']:
-                print("TPM2 connection successful")
+                TPM2API._live_tctis[self.tcti_name] = time.monotonic() + TPM_INFO_CACHE_TTL
+                logger.info("TPM2 connection successful")
             else:
                 raise Exception(f"TPM2 connection failed: {result['error']}")
         except Exception as e:
             raise Exception(f"Failed to connect to TPM: {e}")
 
-    def _cleanup_temp_decrypted_file(self) -> None:
-        """Remove the temporary decrypted AES file if it exists."""
-        if os.path.exists(TEMP_DECRYPTED_AES_FILE):
+    def _tcti_is_multiplexed(self) -> bool:
+        """Check if the TCTI can be shared between this process and tpm2-tools"""
+        return self.tcti_name.startswith(self._MULTIPLEXED_TCTI_PREFIXES)
+
+    @contextmanager
+    def _tpm_serialized(self):
+        """
+        Serialize access to a TPM that accepts only one connection at a time
+        
+        Holds a per-TCTI lock across threads and, when TPM_LOCK_FILE can be
+        opened, an flock across worker processes. Multiplexed TCTIs schedule
+        clients themselves and are not locked. Not re-entrant.
+        """
+        global _tpm_lock_fd
+        
+        if self._tcti_is_multiplexed():
+            yield
+            return
+        
+        with _tpm_locks_guard:
+            lock = _tpm_locks.setdefault(self.tcti_name, threading.Lock())
+            if _tpm_lock_fd is None and fcntl is not None:
+                try:
+                    _tpm_lock_fd = os.open(TPM_LOCK_FILE, os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o600)
+                except OSError:
+                    _tpm_lock_fd = -1
+            lock_fd = _tpm_lock_fd if _tpm_lock_fd is not None and _tpm_lock_fd >= 0 else None
+        
+        with lock:
+            if lock_fd is None:
+                yield
+                return
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_fd, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _esapi_session(self):
+        """
+        Yield an in-process ESAPI context, or None if tpm2-pytss is unavailable
+        
+        The context is kept for the lifetime of the object when the TCTI is
+        behind a resource manager, or with ESAPI_KEEP_OPEN until the next
+        tpm2-tools command. Otherwise a fresh context is opened for
+        single-connection TCTIs and closed on exit so tpm2-tools calls are not
+        locked out.
+        """
+        if ESAPI is None or self._esys_failed:
+            yield None
+            return
+        
+        with self._esys_lock:
+            ectx = self._esys
+            owned = False
+            if ectx is None:
+                try:
+                    ectx = ESAPI(self.tcti_name)
+                except Exception as e:
+                    logger.warning("ESAPI unavailable, falling back to tpm2-tools: %s", e)
+                    self._esys_failed = True
+                    yield None
+                    return
+                if self._tcti_is_multiplexed() or ESAPI_KEEP_OPEN:
+                    self._esys = ectx
+                else:
+                    owned = True
+            
+            # ESAPI contexts are not thread-safe, so the shared one is used under the lock
+            try:
+                yield ectx
+            finally:
+                if owned:
+                    ectx.close()
+
+    def _release_esapi(self):
+        """Close a kept ESAPI connection that would lock tpm2-tools out of the TPM"""
+        if self._esys is None or self._tcti_is_multiplexed():
+            return
+        with self._esys_lock:
+            self._close_esys()
+
+    def _close_esys(self):
+        """
+        Flush the objects cached on the kept ESAPI connection and close it
+        
+        Closing a direct swtpm or /dev/tpm0 connection does not free its
+        transient objects, so they are flushed first. Callers hold _esys_lock.
+        """
+        self._flush_esapi_handles()
+        if self._esys is not None:
+            self._esys.close()
+            self._esys = None
+
+    def _flush_esapi_handles(self):
+        """Flush and forget every transient object cached on the kept ESAPI connection"""
+        while self._esapi_handles:
+            _, (owner, _, handle) = self._esapi_handles.popitem(last=False)
+            if owner is self._esys:
+                self._flush_esapi_handle(owner, handle)
+
+    @contextmanager
+    def _esapi_loaded(self, context_file: str):
+        """
+        Yield (ESAPI context, handle) for a tpm2-tools context file, or None
+        
+        The object is loaded from the saved context and flushed again on exit,
+        so nothing is left behind for the tools. On a kept connection the
+        ESAPI_LOADED_HANDLES most recently used objects stay loaded instead,
+        until their context file changes or the connection is closed. Errors
+        loading the context propagate; callers fall back to tpm2-tools.
+        
+        Args:
+            context_file: Key context file saved by tpm2-tools
+        """
+        if ESAPI is None:
+            yield None
+            return
+        
+        with self._tpm_serialized(), self._esapi_session() as ectx:
+            if ectx is None:
+                yield None
+                return
+            
+            hot = self._hot_keys.get(context_file)
+            if hot is not None and hot[0] == self._file_stamp(context_file):
+                # Persistent objects are only referenced, never flushed; the
+                # reference is closed again so ESAPI does not accumulate them
+                handle = ectx.tr_from_tpmpublic(hot[1])
+                try:
+                    yield ectx, handle
+                finally:
+                    try:
+                        ectx.tr_close(handle)
+                    except Exception:
+                        pass
+                return
+            
+            if ectx is not self._esys:
+                handle = ectx.context_load(TPMS_CONTEXT.from_tools(self._read_file(context_file)))
+                try:
+                    yield ectx, handle
+                finally:
+                    try:
+                        ectx.flush_context(handle)
+                    except Exception:
+                        pass
+                return
+            
+            stamp = self._file_stamp(context_file)
+            cached = self._esapi_handles.pop(context_file, None)
+            if cached is not None and cached[0] is ectx and cached[1] == stamp:
+                handle = cached[2]
+            else:
+                # Entries are flushed before their connection closes; a stale one is flushed here
+                if cached is not None and cached[0] is ectx:
+                    self._flush_esapi_handle(ectx, cached[2])
+                handle = ectx.context_load(TPMS_CONTEXT.from_tools(self._read_file(context_file)))
+            self._esapi_handles[context_file] = (ectx, stamp, handle)
+            while len(self._esapi_handles) > ESAPI_LOADED_HANDLES:
+                _, (owner, _, evicted) = self._esapi_handles.popitem(last=False)
+                if owner is ectx:
+                    self._flush_esapi_handle(ectx, evicted)
+            try:
+                yield ectx, handle
+            except Exception:
+                # Do not reuse a handle an operation failed on
+                if self._esapi_handles.pop(context_file, None) is not None:
+                    self._flush_esapi_handle(ectx, handle)
+                raise
+
+    @staticmethod
+    def _flush_esapi_handle(ectx, handle):
+        """Flush a transient object from an ESAPI context, ignoring errors"""
+        try:
+            ectx.flush_context(handle)
+        except Exception:
+            pass
+
+    @staticmethod
+    def _file_stamp(path: str) -> Optional[tuple]:
+        """Return (mtime_ns, size) identifying the current contents of a file, or None if missing"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    def _file_digest(self, path: str) -> Optional[bytes]:
+        """
+        Return a BLAKE2b digest of a file's contents, or None if it is missing
+        
+        Digests are memoized by (mtime_ns, size), so a file is only re-hashed
+        after it changes; a rewrite with identical content keeps its digest.
+        """
+        stamp = self._file_stamp(path)
+        if stamp is None:
+            return None
+        
+        cached = self._digest_cache.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        
+        digest = hashlib.blake2b(self._read_file(path), digest_size=16).digest()
+        self._digest_cache[path] = (stamp, digest)
+        if len(self._digest_cache) > 2 * LOADED_KEY_CACHE_SIZE:
+            self._digest_cache.pop(next(iter(self._digest_cache)))
+        return digest
+    
+    @staticmethod
+    def _read_file(path: str) -> bytes:
+        """Read a small tool output file with raw os calls instead of a buffered file object"""
+        fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+        try:
+            size = os.fstat(fd).st_size
+            data = os.read(fd, size)
+            # A single read returns the whole file in practice; loop only for short reads
+            while len(data) < size:
+                chunk = os.read(fd, size - len(data))
+                if not chunk:
+                    break
+                data += chunk
+            return data
+        finally:
+            os.close(fd)
+    
+    @staticmethod
+    def _replace_file(path: str, data: bytes) -> None:
+        """
+        Write a file atomically through a temporary file and os.replace
+        
+        Readers and a crash mid-write see either the old or the new contents,
+        never a partial file.
+        """
+        temp_path = f"{path}.{os.urandom(4).hex()}.tmp"
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_CLOEXEC, 0o666)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+            os.close(fd)
+            fd = None
+            os.replace(temp_path, path)
+        except BaseException:
+            if fd is not None:
+                os.close(fd)
+            os.unlink(temp_path)
+            raise
+    
+    @staticmethod
+    def _append_file(path: str, data: bytes) -> None:
+        """Append data to an existing file and fsync it before returning"""
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CLOEXEC)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    
+    def _encrypt_file_atomic(self, encrypt, context_file: str, data: bytes, path: str) -> Dict[str, Any]:
+        """
+        Encrypt data in memory and atomically replace path with the ciphertext
+        
+        Args:
+            encrypt: encrypt_data_bytes or encrypt_data_aes_bytes
+            context_file: Key context file passed to encrypt
+            data: Plaintext
+            path: File to replace
+            
+        Returns:
+            encrypt's result dictionary, with 'encrypted_file' set to path
+        """
+        result = encrypt(context_file, data, None)
+        if result['success']:
+            self._replace_file(path, result['encrypted_data'])
+            result['encrypted_file'] = path
+        return result
+    
+    @contextmanager
+    def _staged_input(self, data: bytes):
+        """
+        Write data to a short-lived file for tools that only accept a path
+        
+        Uses an anonymous memfd when available, otherwise a file in tmpfs;
+        either way it is gone on exit. The memfd is written straight from a
+        memoryview of data, without a buffered file object in between.
+        """
+        if MEMFD_AVAILABLE:
+            fd = os.memfd_create("tpm2-input", os.MFD_CLOEXEC)
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+                yield f"{FD_PATH_PREFIX}{fd}"
+            finally:
+                os.close(fd)
+        else:
+            with tempfile.NamedTemporaryFile(dir=STAGING_DIR, delete=False, mode='wb') as temp_file:
+                temp_file.write(data)
+                path = temp_file.name
+            try:
+                yield path
+            finally:
+                os.unlink(path)
+    
+    @contextmanager
+    def _staged_output(self, path: Optional[str] = None):
+        """
+        Provide a path for tool output that the caller reads back
+        
+        An explicit path is passed through unchanged. Otherwise the output
+        gets the same short-lived backing as _staged_input and never reaches
+        the disk.
+        """
+        if path is not None:
+            yield path
+        else:
+            with self._staged_input(b'') as staged_path:
+                yield staged_path
+    
+    @staticmethod
+    def _passed_fds(cmd: List[str]) -> tuple:
+        """Return the descriptors a command refers to via /proc/self/fd paths"""
+        return tuple(int(arg[len(FD_PATH_PREFIX):]) for arg in cmd
+                     if arg.startswith(FD_PATH_PREFIX))
+    
+    @staticmethod
+    def _parse_tool_output(output: Any) -> Dict[str, Any]:
+        """
+        Parse the YAML printed by tpm2-tools into a dictionary
+        
+        Uses PyYAML (with the libyaml loader when available) and otherwise a
+        two-level parser that covers the 'key:' / '  field: value' layout.
+        Raw bytes are handed to PyYAML as is; the reader decodes them itself.
+        
+        Args:
+            output: Tool stdout (str, or bytes from a binary=True run)
+            
+        Returns:
+            Parsed mapping (empty if the output is not a mapping)
+        """
+        if yaml is not None:
             try:
-                os.unlink(TEMP_DECRYPTED_AES_FILE)
-            except OSError:
+                data = yaml.load(output, Loader=_YAML_LOADER)
+                return data if isinstance(data, dict) else {}
+            except yaml.YAMLError:
                 pass
+        
+        if isinstance(output, bytes):
+            output = output.decode(errors='replace')
+        data = {}
+        section = None
+        for indent, key, value in _TOOL_OUTPUT_LINE.findall(output):
+            key, value = key.strip(), value.strip('"')
+            if indent and section is not None:
+                section[key] = value
+            elif value:
+                data[key] = value
+                section = None
+            else:
+                section = data[key] = {}
+        return data
+    
+    @staticmethod
+    def _command_result(returncode: int, stdout: bytes, stderr: bytes, binary: bool = False) -> Dict[str, Any]:
+        """Build the result dictionary shared by the sync and async command runners"""
+        stderr = stderr.decode(errors='replace').strip()
+        
+        if returncode == 0:
+            return {
+                "success": True,
+                "output": stdout if binary else stdout.decode(errors='replace').strip(),
+                "stderr": stderr
+            }
+        else:
+            return {
+                "success": False,
+                "error": stderr or stdout.decode(errors='replace').strip(),
+                "returncode": returncode
+            }
     
-    def _run_command(self, cmd: List[str], input_data: Optional[str] = None) -> Dict[str, Any]:
+    def _run_command(self, cmd: List[str], input_data: Optional[Any] = None,
+                     binary: bool = False) -> Dict[str, Any]:
         """
         Run a TPM2 command and return the result
         
         Args:
             cmd: Command list to execute
-            input_data: Optional input data for the command
+            input_data: Optional data (str or bytes) written to the command's stdin
+            binary: Return stdout as raw bytes instead of stripped text. Callers
+                that ignore or parse the output pass True to skip decoding it.
             
         Returns:
             Dictionary with success status and output/error
         """
         try:
-            # Add TCTI to command if not already present
-            if '--tcti' not in ' '.join(cmd):
-                cmd.extend(['--tcti', self.tcti_name])
-            
-            print(f"Running command: {' '.join(cmd)}")
-            
-            # Set environment variables for the subprocess
-            env = os.environ.copy()
-            env['TSS2_TCTI'] = self.tcti_name
-            env['TPM2TOOLS_TCTI'] = self.tcti_name
-            
-            # Run the command
-            if input_data:
-                result = subprocess.run(
-                    cmd,
-                    input=input_data.encode(),
-                    capture_output=True,
-                    text=True,
-                    timeout=30,
-                    env=env
-                )
-            else:
+            if cmd[0] not in _STATELESS_TOOLS:
+                self._tpm_generation += 1
+            # Callers pass the tool arguments only; the TCTI comes from self._env
+            cmd = [_tool_path(cmd[0]), *cmd[1:]]
+            
+            logger.debug("Running command: %s", cmd)
+            
+            if isinstance(input_data, str):
+                input_data = input_data.encode()
+            
+            # Run the command. Python opens descriptors non-inheritable, so
+            # close_fds is only needed with pass_fds; without it CPython can
+            # use posix_spawn instead of fork + closing every open descriptor.
+            pass_fds = self._passed_fds(cmd)
+            with self._tpm_serialized():
+                self._release_esapi()
                 result = subprocess.run(
                     cmd,
+                    input=input_data,
                     capture_output=True,
-                    text=True,
                     timeout=30,
-                    env=env
+                    env=self._env,
+                    close_fds=bool(pass_fds),
+                    pass_fds=pass_fds
                 )
-            
-            if result.returncode == 0:
-                return {
-                    "success": True,
-                    "output": result.stdout.strip(),
-                    "stderr": result.stderr.strip()
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": result.stderr.strip() or result.stdout.strip(),
-                    "returncode": result.returncode
-                }
+            return self._command_result(result.returncode, result.stdout, result.stderr, binary)
                 
         except subprocess.TimeoutExpired:
             return {"success": False, "error": "Command timed out"}
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    async def _run_command_async(self, cmd: List[str], input_data: Optional[Any] = None,
+                                 binary: bool = False) -> Dict[str, Any]:
+        """
+        Run a TPM2 command without blocking the event loop
+        
+        Args:
+            cmd: Command list to execute
+            input_data: Optional data (str or bytes) written to the command's stdin
+            binary: Return stdout as raw bytes instead of stripped text
+            
+        Returns:
+            Dictionary with success status and output/error (same shape as _run_command)
+        """
+        proc = None
+        try:
+            if cmd[0] not in _STATELESS_TOOLS:
+                self._tpm_generation += 1
+            cmd = [_tool_path(cmd[0]), *cmd[1:]]
+            
+            logger.debug("Running command: %s", cmd)
+            
+            if isinstance(input_data, str):
+                input_data = input_data.encode()
+            
+            pass_fds = self._passed_fds(cmd)
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.PIPE if input_data is not None else None,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                env=self._env,
+                close_fds=bool(pass_fds),
+                pass_fds=pass_fds
+            )
+            stdout, stderr = await asyncio.wait_for(proc.communicate(input_data), timeout=30)
+            return self._command_result(proc.returncode, stdout, stderr, binary)
+                
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            return {"success": False, "error": "Command timed out"}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+    
+    def _run_commands(self, cmds: List[List[str]]) -> List[Dict[str, Any]]:
+        """
+        Run independent TPM2 commands concurrently
+        
+        Process start-up and TCTI connection set-up overlap; the TPM itself
+        still executes the commands one at a time. Single-connection TCTIs
+        run the wave one command at a time under _tpm_serialized().
+        
+        Args:
+            cmds: Command lists to execute
+            
+        Returns:
+            List of results in the same order as cmds
+        """
+        async def run_all():
+            limit = asyncio.Semaphore(MAX_CONCURRENT_COMMANDS if self._tcti_is_multiplexed() else 1)
+            
+            async def run_one(cmd):
+                async with limit:
+                    return await self._run_command_async(cmd)
+            
+            return await asyncio.gather(*(run_one(cmd) for cmd in cmds))
+        
+        with self._tpm_serialized():
+            self._release_esapi()
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                return asyncio.run(run_all())
+            
+            # Called from inside a running event loop (e.g. a FastAPI handler)
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                return executor.submit(asyncio.run, run_all()).result()
+    
     def create_primary_key(self, hierarchy: str = "o", context_file: str = "primary.ctx") -> Dict[str, Any]:
         """
         Create a primary key in the specified hierarchy
         
+        Repeated calls reuse the unchanged context file instead of re-deriving
+        the key, as long as the TPM still loads it (a clear or restart of the
+        TPM invalidates saved contexts); the cache is dropped by
+        flush_context() and full_reset().
+        
         Args:
             hierarchy: TPM hierarchy ('o' for owner, 'e' for endorsement, 'p' for platform)
             context_file: File to save the primary key context
@@ -199,26 +915,34 @@ class TPM2API:
             Dictionary with key information
         """
         try:
-            cmd = [
-                'tpm2_createprimary',
-                '-C', hierarchy,
-                '-c', context_file,
-                '-G', 'rsa2048',
-                '-g', 'sha256'
-            ]
+            # The primary key is derived from the hierarchy seed, so an unchanged
+            # context file from an earlier call already holds the same key
+            cached = self._primary_cache.get((hierarchy, context_file))
+            if cached is not None and cached[0] == self._file_stamp(context_file) \
+                    and self._run_command([*_CMD_READPUBLIC, context_file], binary=True)['success']:
+                return {
+                    "success": True,
+                    "context_file": context_file,
+                    "hierarchy": hierarchy,
+                    "key_info": dict(cached[1]),
+                    "action": "primary_key_created"
+                }
             
-            result = self._run_command(cmd)
+            cmd = [*_CMD_CREATE_PRIMARY, '-C', hierarchy, '-c', context_file]
+            
+            result = self._run_command(cmd, binary=True)
             
             if result['success']:
                 # Parse the output to get key information
-                output_lines = result['output'].split('\n')
+                parsed = self._parse_tool_output(result['output'])
                 key_info = {}
                 
-                for line in output_lines:
-                    if 'name:' in line:
-                        key_info['name'] = line.split('name:')[1].strip()
-                    elif 'qualified name:' in line:
-                        key_info['qualified_name'] = line.split('qualified name:')[1].strip()
+                if 'name' in parsed:
+                    key_info['name'] = parsed['name']
+                if 'qualified name' in parsed:
+                    key_info['qualified_name'] = parsed['qualified name']
+                
+                self._primary_cache[(hierarchy, context_file)] = (self._file_stamp(context_file), key_info)
                 
                 return {
                     "success": True,
@@ -294,7 +1018,8 @@ class TPM2API:
             else:
                 return {"success": False, "error": f"Unsupported key type: {key_type}"}
             
-            result = self._run_command(cmd)
+            # tpm2_create echoes the whole public area; only the status is used
+            result = self._run_command(cmd, binary=True)
             
             if result['success']:
                 if key_type.lower().startswith("aes"):
@@ -310,13 +1035,13 @@ class TPM2API:
                         recovery_material = {}
                         try:
                             with open(aes_pub_file, 'rb') as f:
-                                recovery_material['public_blob_b64'] = base64.b64encode(f.read()).decode()
+                                recovery_material['public_blob_b64'] = base64.b64encode(f.read()).decode('ascii')
                         except Exception as e:
                             recovery_material['public_blob_error'] = str(e)
                         
                         try:
                             with open(aes_priv_file, 'rb') as f:
-                                recovery_material['private_blob_b64'] = base64.b64encode(f.read()).decode()
+                                recovery_material['private_blob_b64'] = base64.b64encode(f.read()).decode('ascii')
                         except Exception as e:
                             recovery_material['private_blob_error'] = str(e)
                         
@@ -368,6 +1093,10 @@ class TPM2API:
         """
         Load a key into TPM context
         
+        Repeated loads of blobs with unchanged content reuse the saved context
+        file; the cache is dropped by flush_context() and full_reset(). With
+        tpm2-pytss installed the blobs are loaded over ESAPI in-process.
+        
         Args:
             parent_context: Parent key context file
             public_file: Public key file
@@ -378,17 +1107,41 @@ class TPM2API:
             Dictionary with result
         """
         try:
-            cmd = [
-                'tpm2_load',
-                '-C', parent_context,
-                '-u', public_file,
-                '-r', private_file,
-                '-c', context_file
-            ]
+            # Skip tpm2_load when blobs with the same content were already loaded
+            # into an unchanged context file
+            cache_key = (
+                parent_context, self._file_stamp(parent_context),
+                public_file, self._file_digest(public_file),
+                private_file, self._file_digest(private_file),
+                context_file
+            )
+            context_stamp = self._file_stamp(context_file)
+            with self._cache_lock:
+                loaded = context_stamp is not None and self._load_cache.get(cache_key) == context_stamp
+                if loaded:
+                    self._load_cache.move_to_end(cache_key)
+            if loaded:
+                return {
+                    "success": True,
+                    "context_file": context_file,
+                    "parent_context": parent_context,
+                    "action": "key_loaded"
+                }
             
-            result = self._run_command(cmd)
+            if self._load_key_esapi(parent_context, public_file, private_file, context_file):
+                result = {"success": True}
+            else:
+                cmd = [*_CMD_LOAD, '-C', parent_context, '-u', public_file,
+                       '-r', private_file, '-c', context_file]
+                
+                result = self._run_command(cmd)
             
             if result['success']:
+                context_stamp = self._file_stamp(context_file)
+                with self._cache_lock:
+                    self._load_cache[cache_key] = context_stamp
+                    if len(self._load_cache) > LOADED_KEY_CACHE_SIZE:
+                        self._load_cache.popitem(last=False)
                 return {
                     "success": True,
                     "context_file": context_file,
@@ -401,10 +1154,77 @@ class TPM2API:
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    def _load_key_esapi(self, parent_context: str, public_file: str, private_file: str,
+                        context_file: str) -> bool:
+        """
+        Load key blobs in-process with ESAPI instead of spawning tpm2_load
+        
+        The loaded object is saved to context_file in the tpm2-tools format
+        and flushed, like tpm2_load leaves it.
+        
+        Args:
+            parent_context: Parent key context file
+            public_file: Public key file (TPM2B_PUBLIC as written by tpm2_create)
+            private_file: Private key file (TPM2B_PRIVATE as written by tpm2_create)
+            context_file: File to save the loaded key context
+            
+        Returns:
+            True if the key was loaded, False if tpm2-tools have to handle the request
+        """
+        try:
+            with self._esapi_loaded(parent_context) as loaded:
+                if loaded is None:
+                    return False
+                ectx, parent = loaded
+                
+                public, _ = TPM2B_PUBLIC.unmarshal(self._read_file(public_file))
+                private, _ = TPM2B_PRIVATE.unmarshal(self._read_file(private_file))
+                handle = ectx.load(parent, private, public)
+                try:
+                    saved = ectx.context_save(handle)
+                finally:
+                    ectx.flush_context(handle)
+            
+            with open(context_file, 'wb') as f:
+                f.write(saved.to_tools())
+            return True
+        except Exception as e:
+            logger.debug("ESAPI load failed, falling back to tpm2_load: %s", e)
+            return False
+    
+    def evict_cached_key(self, parent_context: str, public_file: str, private_file: str) -> Dict[str, Any]:
+        """
+        Forget cached load_key results for a key so the next load runs tpm2_load again
+        
+        Args:
+            parent_context: Parent key context file
+            public_file: Public key file
+            private_file: Private key file
+            
+        Returns:
+            Dictionary with the number of evicted cache entries
+        """
+        with self._cache_lock:
+            stale = [key for key in self._load_cache
+                     if (key[0], key[2], key[4]) == (parent_context, public_file, private_file)]
+            for key in stale:
+                del self._load_cache[key]
+        
+        return {
+            "success": True,
+            "evicted": len(stale),
+            "action": "key_cache_evicted"
+        }
+    
     def make_persistent(self, context_file: str, persistent_handle: int = 0x81010001) -> Dict[str, Any]:
         """
         Make a key persistent in TPM
         
+        Handles persisted by this instance are remembered, so persisting the
+        same unchanged context file to the same handle again skips
+        tpm2_evictcontrol. The record is dropped by flush_context('all') and
+        full_reset().
+        
         Args:
             context_file: Key context file
             persistent_handle: Persistent handle to use
@@ -413,6 +1233,16 @@ class TPM2API:
             Dictionary with result
         """
         try:
+            # Re-persisting the same unchanged context file to the same handle is a no-op
+            if self._persistent_handles.get(persistent_handle) == (context_file, self._file_stamp(context_file)):
+                return {
+                    "success": True,
+                    "persistent_handle": hex(persistent_handle),
+                    "context_file": context_file,
+                    "action": "key_persisted",
+                    "cached": True
+                }
+            
             cmd = [
                 'tpm2_evictcontrol',
                 '-C', 'o',
@@ -423,6 +1253,7 @@ class TPM2API:
             result = self._run_command(cmd)
             
             if result['success']:
+                self._persistent_handles[persistent_handle] = (context_file, self._file_stamp(context_file))
                 return {
                     "success": True,
                     "persistent_handle": hex(persistent_handle),
@@ -435,30 +1266,229 @@ class TPM2API:
         except Exception as e:
             return {"success": False, "error": str(e)}
     
-    def flush_context(self, context_type: str = "transient") -> Dict[str, Any]:
+    def complete_workflow(self, primary_context: str = "primary.ctx", key_type: str = "rsa",
+                          public_file: str = "rsa.pub", private_file: str = "rsa.priv",
+                          context_file: str = "rsa.ctx", persistent_handle: int = 0x81010001) -> Dict[str, Any]:
         """
-        Flush TPM contexts
+        Create a primary key, create and load a key under it and make it persistent
+        
+        Runs the four steps back to back in the calling thread and keeps their
+        files, unlike provision_signing_key. Each step reuses the caches of the
+        corresponding method, so an unchanged primary, load or persistent
+        handle is not redone.
         
         Args:
-            context_type: Type of contexts to flush ('transient', 'loaded', 'saved', 'all')
+            primary_context: Primary key context file
+            key_type: Type of key to create under the primary
+            public_file: Public key output file
+            private_file: Private key output file
+            context_file: Loaded key context file
+            persistent_handle: Persistent handle for the key
+            
+        Returns:
+            Dictionary with the result of every step that ran
+        """
+        steps = (
+            ("create_primary", "Primary key creation",
+             lambda: self.create_primary_key(context_file=primary_context)),
+            ("create_key", "Key creation",
+             lambda: self.create_key(primary_context, key_type, public_file, private_file)),
+            ("load_key", "Key loading",
+             lambda: self.load_key(primary_context, public_file, private_file, context_file)),
+            ("make_persistent", "Making persistent",
+             lambda: self.make_persistent(context_file, persistent_handle)),
+        )
+        
+        results = {}
+        for name, label, step in steps:
+            logger.info("Workflow step: %s", name)
+            result = step()
+            results[name] = result
+            if not result["success"]:
+                return {"success": False, "error": f"{label} failed: {result['error']}", "results": results}
+        
+        return {
+            "success": True,
+            "message": "Complete workflow executed successfully",
+            "results": results
+        }
+    
+    def provision_signing_key(self, hierarchy: str = "o", persistent_handle: int = 0x81010001,
+                              key_type: str = "rsa") -> Dict[str, Any]:
+        """
+        Create a primary key, a child key under it and persist the child in one call
+        
+        Equivalent to create_primary_key + create_key + load_key +
+        make_persistent, but no context files are returned. With tpm2-pytss the
+        whole chain runs on one ESAPI connection and the intermediate handles
+        never leave the process; otherwise the four tools run back to back on
+        scratch files that are removed afterwards.
+        
+        Args:
+            hierarchy: TPM hierarchy for the primary key ('o', 'e' or 'p')
+            persistent_handle: Persistent handle for the child key
+            key_type: Type of child key ('rsa' or 'ecc')
+            
+        Returns:
+            Dictionary with the persistent handle
+        """
+        algs = {"rsa": "rsa2048", "ecc": "ecc256"}
+        key_alg = algs.get(key_type.lower())
+        if key_alg is None:
+            return {"success": False, "error": f"Unsupported key type: {key_type}"}
+        if hierarchy not in ("o", "e", "p"):
+            return {"success": False, "error": f"Unsupported hierarchy: {hierarchy}"}
+        
+        try:
+            handle = self._provision_esapi(hierarchy, persistent_handle, key_alg)
+            if handle is None:
+                with tempfile.TemporaryDirectory(dir=STAGING_DIR) as scratch:
+                    primary = os.path.join(scratch, "primary.ctx")
+                    public = os.path.join(scratch, "key.pub")
+                    private = os.path.join(scratch, "key.priv")
+                    key = os.path.join(scratch, "key.ctx")
+                    
+                    for cmd in (
+                        [*_CMD_CREATE_PRIMARY, '-C', hierarchy, '-c', primary],
+                        [*_CMD_CREATE, '-C', primary, '-G', key_alg, '-u', public, '-r', private],
+                        [*_CMD_LOAD, '-C', primary, '-u', public, '-r', private, '-c', key],
+                        [*_CMD_EVICT_OWNER, key, str(persistent_handle)],
+                    ):
+                        result = self._run_command(cmd)
+                        if not result['success']:
+                            return result
+            
+            return {
+                "success": True,
+                "persistent_handle": hex(persistent_handle),
+                "hierarchy": hierarchy,
+                "key_type": key_type,
+                "action": "signing_key_provisioned"
+            }
+                
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+    
+    def _provision_esapi(self, hierarchy: str, persistent_handle: int, key_alg: str) -> Optional[int]:
+        """
+        Run createprimary, create, load and evictcontrol on one ESAPI context
+        
+        Args:
+            hierarchy: TPM hierarchy for the primary key ('o', 'e' or 'p')
+            persistent_handle: Persistent handle for the child key
+            key_alg: tpm2-tools style algorithm of the child key
+            
+        Returns:
+            The persistent handle, or None if tpm2-tools have to handle the request
+        """
+        if ESAPI is None:
+            return None
+        
+        hierarchies = {"o": ESYS_TR.OWNER, "e": ESYS_TR.ENDORSEMENT, "p": ESYS_TR.PLATFORM}
+        
+        with self._tpm_serialized(), self._esapi_session() as ectx:
+            if ectx is None:
+                return None
+            
+            self._tpm_generation += 1
+            primary = key = None
+            try:
+                # Same templates tpm2_createprimary -G rsa2048 and tpm2_create use by default
+                primary, _, _, _, _ = ectx.create_primary(
+                    TPM2B_SENSITIVE_CREATE(),
+                    TPM2B_PUBLIC.parse("rsa2048:aes128cfb",
+                                       objectAttributes=TPMA_OBJECT.DEFAULT_TPM2_TOOLS_CREATEPRIMARY_ATTRS),
+                    hierarchies[hierarchy]
+                )
+                private, public, _, _, _ = ectx.create(
+                    primary,
+                    TPM2B_SENSITIVE_CREATE(),
+                    TPM2B_PUBLIC.parse(key_alg, objectAttributes=TPMA_OBJECT.DEFAULT_TPM2_TOOLS_CREATE_ATTRS)
+                )
+                key = ectx.load(primary, private, public)
+                ectx.evict_control(ESYS_TR.OWNER, key, persistent_handle)
+                return persistent_handle
+            finally:
+                for handle in (key, primary):
+                    if handle is not None:
+                        try:
+                            ectx.flush_context(handle)
+                        except Exception:
+                            pass
+    
+    def make_persistent_soft(self, context_file: str) -> Dict[str, Any]:
+        """
+        Keep a key available through its saved context file instead of a persistent handle
+        
+        tpm2-tools reload a saved context on demand whenever it is passed as
+        '-c <file>.ctx', so this skips the NV write done by make_persistent.
+        Saved contexts do not survive a TPM restart; reload the key from its
+        public/private blobs with load_key in that case.
+        
+        Args:
+            context_file: Key context file
             
         Returns:
             Dictionary with result
         """
         try:
-            if context_type == "transient":
-                cmd = ['tpm2_flushcontext', '-t']
-            elif context_type == "loaded":
-                cmd = ['tpm2_flushcontext', '-l']
-            elif context_type == "saved":
-                cmd = ['tpm2_flushcontext', '-s']
-            elif context_type == "all":
-                cmd = ['tpm2_flushcontext', '-t', '-l', '-s']
+            if not os.path.exists(context_file):
+                return {"success": False, "error": f"Context file '{context_file}' does not exist"}
+            
+            # Make sure the TPM still accepts the saved context before relying on it
+            # (the public area it prints is not needed, so it is left undecoded)
+            result = self._run_command([*_CMD_READPUBLIC, context_file], binary=True)
+            
+            if result['success']:
+                self._soft_persistent_contexts.add(context_file)
+                return {
+                    "success": True,
+                    "context_file": context_file,
+                    "action": "key_persisted_soft"
+                }
             else:
+                return result
+                
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+    
+    def flush_context(self, context_type: str = "transient", skip_if_clean: bool = False) -> Dict[str, Any]:
+        """
+        Flush TPM contexts
+        
+        Args:
+            context_type: Type of contexts to flush ('transient', 'loaded', 'saved', 'all')
+            skip_if_clean: Skip the flush when this instance has run nothing that
+                could have loaded an object or session since it last flushed the
+                same type (or 'all'). Objects loaded by other processes are not
+                seen, so only use this when the process is the TPM's sole client.
+            
+        Returns:
+            Dictionary with result
+        """
+        try:
+            if context_type not in _CMD_FLUSH:
                 return {"success": False, "error": f"Invalid context type: {context_type}"}
-            result = self._run_command(cmd)
+            
+            if skip_if_clean and self._flushed_at is not None \
+                    and self._flushed_at[0] == self._tpm_generation \
+                    and self._flushed_at[1] in ("all", context_type):
+                return {
+                    "success": True,
+                    "flushed_type": context_type,
+                    "action": "contexts_flushed",
+                    "skipped": True
+                }
+            
+            result = self._run_command(list(_CMD_FLUSH[context_type]))
             
             if result['success']:
+                self._flushed_at = (self._tpm_generation, context_type)
+                self._load_cache.clear()
+                self._primary_cache.clear()
+                if context_type == "all":
+                    self._persistent_handles.clear()
+                    self._verify_cache.clear()
                 return {
                     "success": True,
                     "flushed_type": context_type,
@@ -474,86 +1504,658 @@ class TPM2API:
         """
         Get TPM information
         
+        The fixed properties are cached per TCTI for TPM_INFO_CACHE_TTL
+        seconds; see invalidate_cache().
+        
         Returns:
             Dictionary with TPM information
         """
         try:
-            # Get TPM properties
-            result = self._run_command(['tpm2_getcap', 'properties-fixed'])
+            properties = self._cached_properties()
             
-            if result['success']:
-                # Parse properties
-                properties = {}
-                for line in result['output'].split('\n'):
-                    if ':' in line:
-                        key, value = line.split(':', 1)
-                        properties[key.strip()] = value.strip()
+            if properties is None:
+                # Get TPM properties
+                result = self._run_command(['tpm2_getcap', 'properties-fixed'], binary=True)
                 
-                return {
-                    "success": True,
-                    "tcti": self.tcti_name,
-                    "properties": properties,
-                    "action": "tpm_info_retrieved"
-                }
-            else:
-                return result
+                if not result['success']:
+                    return result
+                
+                properties = self._parse_tool_output(result['output'])
+                
+                TPM2API._props_cache[self.tcti_name] = (time.monotonic() + TPM_INFO_CACHE_TTL, properties)
+            
+            return {
+                "success": True,
+                "tcti": self.tcti_name,
+                "properties": dict(properties),
+                "action": "tpm_info_retrieved"
+            }
                 
         except Exception as e:
             return {"success": False, "error": str(e)}
     
-    def sign_data(self, context_file: str, data: str, signature_file: str = "signature.sig") -> Dict[str, Any]:
+    def invalidate_cache(self) -> None:
+        """Drop cached TPM information for this TCTI so the next call queries the TPM"""
+        TPM2API._props_cache.pop(self.tcti_name, None)
+        TPM2API._live_tctis.pop(self.tcti_name, None)
+    
+    def _cached_properties(self) -> Optional[Dict[str, Any]]:
+        """Return the cached fixed properties for this TCTI unless they have expired"""
+        entry = TPM2API._props_cache.get(self.tcti_name)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+    
+    def _key_ref(self, context_file: str) -> str:
+        """
+        Return the -c argument for a key: its context file, or its persistent handle once hot
+        
+        With HOT_KEY_PERSIST_AFTER set, a context file used that many times
+        unchanged is persisted to one of the reserved HOT_KEY_HANDLE_BASE
+        handles. A rewritten context file releases its old handle.
+        
+        Args:
+            context_file: Key context file
+            
+        Returns:
+            Context file path or hex persistent handle
+        """
+        if HOT_KEY_PERSIST_AFTER <= 0:
+            return context_file
+        
+        stamp = self._file_stamp(context_file)
+        hot = self._hot_keys.get(context_file)
+        if hot is not None:
+            if hot[0] == stamp:
+                return hex(hot[1])
+            self._release_hot_key(context_file)
+        
+        uses = self._key_uses.get((context_file, stamp), 0) + 1
+        self._key_uses[(context_file, stamp)] = uses
+        if stamp is None or uses < HOT_KEY_PERSIST_AFTER:
+            return context_file
+        
+        taken = {handle for _, handle in self._hot_keys.values()}
+        free = [HOT_KEY_HANDLE_BASE + i for i in range(HOT_KEY_MAX) if HOT_KEY_HANDLE_BASE + i not in taken]
+        if not free:
+            return context_file
+        
+        del self._key_uses[(context_file, stamp)]
+        if not self.make_persistent(context_file, free[0])['success']:
+            return context_file
+        self._hot_keys[context_file] = (stamp, free[0])
+        return hex(free[0])
+    
+    def _release_hot_key(self, context_file: str) -> None:
+        """Evict the persistent handle a hot context file was promoted to"""
+        _, handle = self._hot_keys.pop(context_file)
+        self._persistent_handles.pop(handle, None)
+        self._run_command([*_CMD_EVICT_OWNER, hex(handle)])
+    
+    def release_hot_keys(self) -> Dict[str, Any]:
+        """
+        Evict all persistent handles taken by hot keys (see HOT_KEY_PERSIST_AFTER)
+        
+        Returns:
+            Dictionary with the released handles
+        """
+        released = [hex(handle) for _, handle in self._hot_keys.values()]
+        for context_file in list(self._hot_keys):
+            self._release_hot_key(context_file)
+        return {"success": True, "released": released, "action": "hot_keys_released"}
+    
+    def close(self) -> None:
+        """
+        Release the TPM resources this instance holds across calls
+        
+        Evicts hot-key persistent handles and closes a kept ESAPI connection.
+        The instance stays usable; both are set up again on demand.
+        """
+        if self._hot_keys:
+            self.release_hot_keys()
+        with self._esys_lock:
+            self._close_esys()
+    
+    def warm_up(self, context_files: Sequence[str]) -> Dict[str, Any]:
+        """
+        Fill the per-key caches ahead of the first request
+        
+        Queries the TPM properties and, for each context file that exists,
+        exports its public key for host-side operations and, on a kept ESAPI
+        connection, leaves the key loaded. Missing files are skipped.
+        
+        Args:
+            context_files: Key context files to prepare
+            
+        Returns:
+            Dictionary with the context files that were prepared
+        """
+        info = self.get_tpm_info()
+        if not info["success"]:
+            return info
+        
+        warmed = []
+        for context_file in context_files:
+            if self._file_stamp(context_file) is None:
+                continue
+            self._get_public_key(context_file)
+            try:
+                with self._esapi_loaded(context_file):
+                    pass
+            except Exception as e:
+                logger.debug("Could not preload %s over ESAPI: %s", context_file, e)
+            warmed.append(context_file)
+        
+        return {"success": True, "warmed": warmed, "action": "keys_warmed"}
+    
+    def _get_public_key(self, context_file: str):
+        """
+        Get the RSA or EC public key of a loaded key for host-side operations
+        
+        The key is exported once with tpm2_readpublic and cached until the
+        context file changes.
+        
+        Args:
+            context_file: Key context file
+            
+        Returns:
+            RSA or EC public key, or None if cryptography is missing or the key type is unsupported
+        """
+        if serialization is None:
+            return None
+        
+        stamp = self._file_stamp(context_file)
+        if stamp is None:
+            return None
+        
+        cached = self._pubkey_cache.get(context_file)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        
+        with self._staged_output() as pem_file:
+            result = self._run_command([*_CMD_READPUBLIC, context_file, '-f', 'pem', '-o', pem_file],
+                                       binary=True)
+            if not result['success']:
+                return None
+            pem = self._read_file(pem_file)
+        
+        try:
+            public_key = serialization.load_pem_public_key(pem)
+        except ValueError:
+            public_key = None
+        
+        if not isinstance(public_key, (rsa.RSAPublicKey, ec.EllipticCurvePublicKey)):
+            public_key = None
+        self._pubkey_cache[context_file] = (stamp, public_key)
+        return public_key
+    
+    def _verify_locally(self, context_file: str, digest: bytes, signature: bytes) -> Optional[bool]:
+        """
+        Verify an RSASSA or ECDSA SHA-256 signature with the cached public key
+        
+        A 'plain' RSA signature does not name its scheme, so one that does not
+        verify as RSASSA/SHA-256 (e.g. RSAPSS or another hash) is left to the
+        TPM rather than reported as invalid.
+        
+        Args:
+            context_file: Key context file
+            digest: SHA-256 digest of the signed data
+            signature: Signature in tpm2_sign 'tss' or 'plain' format
+            
+        Returns:
+            Verification outcome, or None if the TPM has to verify it instead
+        """
+        if serialization is None:
+            return None
+        
+        public_key = self._get_public_key(context_file)
+        if public_key is None:
+            return None
+        
+        if isinstance(public_key, ec.EllipticCurvePublicKey):
+            return self._verify_ecdsa_locally(public_key, digest, signature)
+        
+        plain = len(signature) == public_key.key_size // 8
+        if plain:
+            raw_signature = signature
+        elif len(signature) > 6:
+            sig_alg, hash_alg, size = struct.unpack('>HHH', signature[:6])
+            if sig_alg != TPM_ALG_RSASSA or hash_alg != TPM_ALG_SHA256 or size != len(signature) - 6:
+                return None
+            raw_signature = signature[6:]
+        else:
+            return None
+        
+        try:
+            public_key.verify(raw_signature, digest, padding.PKCS1v15(), Prehashed(hashes.SHA256()))
+            return True
+        except InvalidSignature:
+            return None if plain else False
+    
+    @staticmethod
+    def _verify_ecdsa_locally(public_key, digest: bytes, signature: bytes) -> Optional[bool]:
+        """
+        Verify a 'tss' format ECDSA/SHA-256 signature (marshaled TPMT_SIGNATURE)
+        
+        Args:
+            public_key: EC public key of the signing key
+            digest: SHA-256 digest of the signed data
+            signature: Signature as written by tpm2_sign
+            
+        Returns:
+            Verification outcome, or None if the TPM has to verify it instead
+        """
+        try:
+            sig_alg, hash_alg, r_size = struct.unpack_from('>HHH', signature)
+            r = signature[6:6 + r_size]
+            (s_size,) = struct.unpack_from('>H', signature, 6 + r_size)
+            s = signature[8 + r_size:]
+        except struct.error:
+            return None
+        if sig_alg != TPM_ALG_ECDSA or hash_alg != TPM_ALG_SHA256 or len(s) != s_size:
+            return None
+        
+        try:
+            public_key.verify(encode_dss_signature(int.from_bytes(r, 'big'), int.from_bytes(s, 'big')),
+                              digest, ec.ECDSA(Prehashed(hashes.SHA256())))
+            return True
+        except InvalidSignature:
+            return False
+    
+    def _sign_digest_esapi(self, context_file: str, digest: bytes) -> Optional[bytes]:
+        """
+        Sign a SHA-256 digest in-process with ESAPI instead of spawning tpm2_sign
+        
+        Uses RSASSA or ECDSA like tpm2_sign does by default and returns the
+        marshaled TPMT_SIGNATURE, i.e. the same bytes tpm2_sign writes.
+        
+        Args:
+            context_file: Key context file saved by tpm2-tools
+            digest: SHA-256 digest to sign
+            
+        Returns:
+            Signature bytes, or None if tpm2-tools have to handle the request
+        """
+        try:
+            with self._esapi_loaded(context_file) as loaded:
+                if loaded is None:
+                    return None
+                ectx, handle = loaded
+                
+                public, _, _ = ectx.read_public(handle)
+                if public.publicArea.type == TPM2_ALG.RSA:
+                    scheme = TPMT_SIG_SCHEME(scheme=TPM2_ALG.RSASSA)
+                    scheme.details.rsassa.hashAlg = TPM2_ALG.SHA256
+                elif public.publicArea.type == TPM2_ALG.ECC:
+                    scheme = TPMT_SIG_SCHEME(scheme=TPM2_ALG.ECDSA)
+                    scheme.details.ecdsa.hashAlg = TPM2_ALG.SHA256
+                else:
+                    return None
+                
+                validation = TPMT_TK_HASHCHECK(tag=TPM2_ST.HASHCHECK, hierarchy=TPM2_RH.NULL)
+                signature = ectx.sign(handle, TPM2B_DIGEST(digest), scheme, validation)
+                return signature.marshal()
+        except Exception as e:
+            # Restricted keys, unreadable contexts, ...: let tpm2_sign decide
+            logger.debug("ESAPI signing failed, falling back to tpm2_sign: %s", e)
+            return None
+    
+    def _verify_signature_esapi(self, context_file: str, digest: bytes, signature: bytes) -> Optional[bool]:
+        """
+        Verify a signature over a SHA-256 digest in-process with ESAPI instead
+        of spawning tpm2_verifysignature
+        
+        Args:
+            context_file: Key context file saved by tpm2-tools
+            digest: SHA-256 digest of the signed data
+            signature: Marshaled TPMT_SIGNATURE as written by tpm2_sign
+            
+        Returns:
+            True or False, or None if tpm2-tools have to handle the request
+        """
+        try:
+            with self._esapi_loaded(context_file) as loaded:
+                if loaded is None:
+                    return None
+                ectx, handle = loaded
+                
+                tpmt_signature, _ = TPMT_SIGNATURE.unmarshal(signature)
+                try:
+                    ectx.verify_signature(handle, TPM2B_DIGEST(digest), tpmt_signature)
+                except TSS2_Exception as e:
+                    if e.error == TPM2_RC.SIGNATURE:
+                        return False
+                    raise
+                return True
+        except Exception as e:
+            logger.debug("ESAPI verification failed, falling back to tpm2_verifysignature: %s", e)
+            return None
+    
+    def _rsa_encrypt_esapi(self, context_file: str, plaintext: bytes) -> Optional[bytes]:
+        """
+        Encrypt with an RSA key in-process with ESAPI instead of spawning tpm2_rsaencrypt
+        
+        Args:
+            context_file: Key context file saved by tpm2-tools
+            plaintext: Data to encrypt
+            
+        Returns:
+            Ciphertext bytes, or None if tpm2-tools have to handle the request
+        """
+        try:
+            with self._esapi_loaded(context_file) as loaded:
+                if loaded is None:
+                    return None
+                ectx, handle = loaded
+                
+                ciphertext = ectx.rsa_encrypt(handle, TPM2B_PUBLIC_KEY_RSA(plaintext),
+                                              TPMT_RSA_DECRYPT(scheme=TPM2_ALG.RSAES), TPM2B_DATA())
+                return bytes(ciphertext)
+        except Exception as e:
+            logger.debug("ESAPI encryption failed, falling back to tpm2_rsaencrypt: %s", e)
+            return None
+    
+    def _rsa_decrypt_esapi(self, context_file: str, ciphertext: bytes) -> Optional[bytes]:
+        """
+        Decrypt RSA ciphertext in-process with ESAPI instead of spawning tpm2_rsadecrypt
+        
+        Uses the RSAES (PKCS#1 v1.5) scheme tpm2_rsadecrypt defaults to.
+        
+        Args:
+            context_file: Key context file saved by tpm2-tools
+            ciphertext: Data to decrypt
+            
+        Returns:
+            Plaintext bytes, or None if tpm2-tools have to handle the request
+        """
+        try:
+            with self._esapi_loaded(context_file) as loaded:
+                if loaded is None:
+                    return None
+                ectx, handle = loaded
+                
+                plaintext = ectx.rsa_decrypt(handle, TPM2B_PUBLIC_KEY_RSA(ciphertext),
+                                             TPMT_RSA_DECRYPT(scheme=TPM2_ALG.RSAES), TPM2B_DATA())
+                return bytes(plaintext)
+        except Exception as e:
+            logger.debug("ESAPI decryption failed, falling back to tpm2_rsadecrypt: %s", e)
+            return None
+    
+    def sign_data(self, context_file: str, data: str, signature_file: Optional[str] = "signature.sig") -> Dict[str, Any]:
         """
         Sign data using a loaded key
         
         Args:
             context_file: Key context file
             data: Data to sign (base64 encoded)
-            signature_file: File to save the signature
+            signature_file: File to save the signature (None keeps it in memory only)
             
         Returns:
-            Dictionary with result
+            Dictionary with result (base64 encoded signature)
         """
         try:
             # Decode base64 data
             decoded_data = base64.b64decode(data)
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        
+        result = self.sign_data_bytes(context_file, decoded_data, signature_file)
+        if result['success']:
+            result['signature'] = base64.b64encode(result['signature']).decode('ascii')
+        return result
+    
+    def sign_data_bytes(self, context_file: str, data: bytes,
+                        signature_file: Optional[str] = "signature.sig") -> Dict[str, Any]:
+        """
+        Sign raw bytes using a loaded key
+        
+        The SHA-256 digest is computed on the host and only the digest is sent
+        to the TPM, in-process through ESAPI when tpm2-pytss is installed.
+        Restricted signing keys do not accept external digests; for those the
+        full message is sent instead (remembered per context file).
+        
+        Args:
+            context_file: Key context file
+            data: Data to sign
+            signature_file: File to save the signature (None keeps it in memory only)
             
-            # Create temporary file for data
-            with tempfile.NamedTemporaryFile(delete=False, mode='wb') as temp_file:
-                temp_file.write(decoded_data)
-                temp_data_file = temp_file.name
-            
-            try:
-                cmd = [
-                    'tpm2_sign',
-                    '-c', context_file,
-                    '-g', 'sha256',
-                    '-m', temp_data_file,
-                    '-s', signature_file
-                ]
-                
-                result = self._run_command(cmd)
-                
-                if result['success']:
-                    # Read signature file
-                    with open(signature_file, 'rb') as f:
-                        signature_data = f.read()
-                    
+        Returns:
+            Dictionary with result (raw signature bytes)
+        """
+        try:
+            digest = hashlib.sha256(data).digest()
+            key = self._key_ref(context_file)
+            
+            if context_file not in self._restricted_sign_contexts:
+                signature_data = self._sign_digest_esapi(context_file, digest)
+                if signature_data is not None:
+                    if signature_file is not None:
+                        with open(signature_file, 'wb') as f:
+                            f.write(signature_data)
                     return {
                         "success": True,
-                        "signature": base64.b64encode(signature_data).decode(),
+                        "signature": signature_data,
                         "signature_file": signature_file,
                         "action": "data_signed"
                     }
-                else:
+            
+            with self._staged_output(signature_file) as signature_path:
+                result = None
+                if context_file not in self._restricted_sign_contexts:
+                    with self._staged_input(digest) as temp_digest_file:
+                        cmd = [*_CMD_SIGN_DIGEST, '-c', key,
+                               '-m', temp_digest_file, '-s', signature_path]
+                        
+                        result = self._run_command(cmd)
+                
+                if result is not None and not result['success'] and not self._is_ticket_error(result['error']):
                     return result
+                
+                if result is None or not result['success']:
+                    with self._staged_input(data) as temp_data_file:
+                        cmd = [*_CMD_SIGN_MESSAGE, '-c', key,
+                               '-m', temp_data_file, '-s', signature_path]
+                        
+                        message_result = self._run_command(cmd)
                     
-            finally:
-                # Clean up temporary file
-                os.unlink(temp_data_file)
+                    if result is not None and message_result['success']:
+                        self._restricted_sign_contexts.add(context_file)
+                    result = message_result
+                
+                if not result['success']:
+                    return result
+                
+                # Read signature file
+                signature_data = self._read_file(signature_path)
+            
+            return {
+                "success": True,
+                "signature": signature_data,
+                "signature_file": signature_file,
+                "action": "data_signed"
+            }
                 
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    @staticmethod
+    def _is_ticket_error(error: str) -> bool:
+        """Check if a tpm2_sign error is a restricted key refusing an external digest"""
+        match = _TOOL_ERROR_RC.search(error or "")
+        return match is not None and int(match.group(1), 16) & 0x0BF == _TPM_RC_TICKET
+    
+    def sign_many(self, context_file: str, blobs: List[bytes]) -> List[Dict[str, Any]]:
+        """
+        Sign several payloads with the same key
+        
+        Uses ESAPI when tpm2-pytss is installed. Otherwise the tpm2_sign calls
+        are issued as concurrent waves through _run_commands, so process
+        start-up overlaps behind a resource manager. Payloads a wave could not
+        sign (e.g. restricted keys) go through sign_data_bytes one by one.
+        
+        Args:
+            context_file: Key context file
+            blobs: Raw payloads to sign
+            
+        Returns:
+            List of sign_data_bytes-style results (raw signature bytes, nothing
+            written to disk), in the same order as blobs
+        """
+        digests = [hashlib.sha256(blob).digest() for blob in blobs]
+        key = self._key_ref(context_file)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(blobs)
+        
+        def signed(signature_data):
+            return {
+                "success": True,
+                "signature": signature_data,
+                "signature_file": None,
+                "action": "data_signed"
+            }
+        
+        if context_file not in self._restricted_sign_contexts:
+            for i, digest in enumerate(digests):
+                signature_data = self._sign_digest_esapi(context_file, digest)
+                if signature_data is None:
+                    break
+                results[i] = signed(signature_data)
+            
+            pending = [i for i, result in enumerate(results) if result is None]
+            for start in range(0, len(pending), SIGN_BATCH_SIZE):
+                batch = pending[start:start + SIGN_BATCH_SIZE]
+                with ExitStack() as stack:
+                    cmds, outputs = [], []
+                    for i in batch:
+                        digest_path = stack.enter_context(self._staged_input(digests[i]))
+                        signature_path = stack.enter_context(self._staged_output())
+                        cmds.append([*_CMD_SIGN_DIGEST, '-c', key,
+                                     '-m', digest_path, '-s', signature_path])
+                        outputs.append(signature_path)
+                    
+                    for i, signature_path, result in zip(batch, outputs, self._run_commands(cmds)):
+                        if result['success']:
+                            results[i] = signed(self._read_file(signature_path))
+        
+        for i, result in enumerate(results):
+            if result is None:
+                results[i] = self.sign_data_bytes(context_file, blobs[i], None)
+        return results
+    
+    def sign_data_batch(self, items: List[Dict[str, str]]) -> Dict[str, Any]:
+        """
+        Sign several payloads, each key's share in one sign_many call
+        
+        Args:
+            items: Dictionaries with 'context_file' and 'data' (base64 encoded)
+            
+        Returns:
+            Dictionary with sign_data-style results (base64 signatures, nothing
+            written to disk) under 'results', in the same order as items
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        by_key = {}
+        for i, item in enumerate(items):
+            try:
+                by_key.setdefault(item['context_file'], []).append((i, base64.b64decode(item['data'])))
+            except Exception as e:
+                results[i] = {"success": False, "error": str(e)}
+        
+        for context_file, members in by_key.items():
+            signed = self.sign_many(context_file, [blob for _, blob in members])
+            for (i, _), result in zip(members, signed):
+                if result['success']:
+                    result['signature'] = base64.b64encode(result['signature']).decode('ascii')
+                results[i] = result
+        
+        return {
+            "success": True,
+            "results": results,
+            "failed": sum(not result['success'] for result in results),
+            "action": "data_signed_batch"
+        }
+    
+    def sign_data_merkle(self, context_file: str, items: List[str]) -> Dict[str, Any]:
+        """
+        Sign several payloads with one TPM signature over their Merkle root
+        
+        Leaves are SHA-256(0x00 || payload) and inner nodes
+        SHA-256(0x01 || left || right); an unpaired node moves up a level
+        unchanged. The 32-byte root is signed as sign_data would sign it, so
+        /tpm2/verify checks the signature with the root as data. An item is
+        covered if folding its leaf with its proof path yields the root.
+        
+        Args:
+            context_file: Key context file
+            items: Payloads to sign (base64 encoded)
+            
+        Returns:
+            Dictionary with the root, its signature (base64 encoded) and one
+            proof per item, in the same order as items
+        """
+        try:
+            if not items:
+                return {"success": False, "error": "No items to sign"}
+            leaves = [hashlib.sha256(b'\x00' + base64.b64decode(item)).digest() for item in items]
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        
+        levels = [leaves]
+        while len(levels[-1]) > 1:
+            level = levels[-1]
+            parents = [hashlib.sha256(b'\x01' + level[i] + level[i + 1]).digest()
+                       for i in range(0, len(level) - 1, 2)]
+            if len(level) % 2:
+                parents.append(level[-1])
+            levels.append(parents)
+        root = levels[-1][0]
+        
+        result = self.sign_data_bytes(context_file, root, None)
+        if not result['success']:
+            return result
+        
+        proofs = []
+        for index, leaf in enumerate(leaves):
+            path = []
+            for level in levels[:-1]:
+                sibling = index ^ 1
+                if sibling < len(level):
+                    path.append({"hash": level[sibling].hex(),
+                                 "position": "left" if sibling < index else "right"})
+                index //= 2
+            proofs.append({"leaf": leaf.hex(), "path": path})
+        
+        return {
+            "success": True,
+            "root": root.hex(),
+            "signature": base64.b64encode(result['signature']).decode('ascii'),
+            "proofs": proofs,
+            "action": "data_signed_merkle"
+        }
+    
+    def verify_signature_batch(self, items: List[Dict[str, str]]) -> Dict[str, Any]:
+        """
+        Verify several signatures
+        
+        With cryptography installed each check runs on the host against the
+        key's cached public key, so only the first item per key reaches the TPM.
+        
+        Args:
+            items: Dictionaries with 'context_file', 'data' and 'signature'
+                (both base64 encoded)
+            
+        Returns:
+            Dictionary with verify_signature results under 'results', in the
+            same order as items
+        """
+        results = [self.verify_signature(item['context_file'], item['data'], item['signature'])
+                   for item in items]
+        return {
+            "success": True,
+            "results": results,
+            "failed": sum(not result['success'] for result in results),
+            "action": "signatures_verified_batch"
+        }
+    
     def verify_signature(self, context_file: str, data: str, signature: str) -> Dict[str, Any]:
         """
         Verify a signature
@@ -570,296 +2172,389 @@ class TPM2API:
             # Decode base64 data
             decoded_data = base64.b64decode(data)
             decoded_signature = base64.b64decode(signature)
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        
+        return self.verify_signature_bytes(context_file, decoded_data, decoded_signature)
+    
+    def verify_signature_bytes(self, context_file: str, data: bytes, signature: bytes) -> Dict[str, Any]:
+        """
+        Verify a signature over raw bytes
+        
+        The SHA-256 digest is computed on the host. Signatures are checked
+        against the cached public key when cryptography is installed; otherwise
+        only the digest is sent to the TPM, over ESAPI when tpm2-pytss is
+        installed. Outcomes are remembered per
+        (unchanged) context file, data and signature, so re-verifying the same
+        token skips the check; flush_context('all') and full_reset() drop them.
+        
+        Args:
+            context_file: Key context file
+            data: Original data
+            signature: Signature to verify
             
-            # Create temporary files
-            with tempfile.NamedTemporaryFile(delete=False, mode='wb') as temp_data_file:
-                temp_data_file.write(decoded_data)
-                temp_data_path = temp_data_file.name
-            
-            with tempfile.NamedTemporaryFile(delete=False, mode='wb') as temp_sig_file:
-                temp_sig_file.write(decoded_signature)
-                temp_sig_path = temp_sig_file.name
-            
-            try:
-                cmd = [
-                    'tpm2_verifysignature',
-                    '-c', context_file,
-                    '-g', 'sha256',
-                    '-m', temp_data_path,
-                    '-s', temp_sig_path
-                ]
-                
-                result = self._run_command(cmd)
-                
-                if result['success']:
+        Returns:
+            Dictionary with verification result
+        """
+        try:
+            digest = hashlib.sha256(data).digest()
+            
+            cache_key = (context_file, self._file_stamp(context_file), digest,
+                         hashlib.sha256(signature).digest())
+            with self._cache_lock:
+                verified = self._verify_cache.get(cache_key)
+                if verified is not None:
+                    self._verify_cache.move_to_end(cache_key)
+            if verified is None:
+                verified = self._verify_locally(context_file, digest, signature)
+                if verified is None:
+                    verified = self._verify_signature_esapi(context_file, digest, signature)
+                if verified is not None:
+                    self._remember_verification(cache_key, verified)
+            
+            if verified is not None:
+                if verified:
                     return {
                         "success": True,
                         "verified": True,
                         "action": "signature_verified"
                     }
-                else:
-                    return {
-                        "success": False,
-                        "verified": False,
-                        "error": result['error']
-                    }
-                    
-            finally:
-                # Clean up temporary files
-                os.unlink(temp_data_path)
-                os.unlink(temp_sig_path)
+                return {
+                    "success": False,
+                    "verified": False,
+                    "error": "Signature verification failed"
+                }
+            
+            with self._staged_input(digest) as temp_digest_path, \
+                    self._staged_input(signature) as temp_sig_path:
+                cmd = [*_CMD_VERIFY_DIGEST, '-c', self._key_ref(context_file),
+                       '-d', temp_digest_path, '-s', temp_sig_path]
+                
+                result = self._run_command(cmd)
+            
+            if result['success']:
+                # Failures are not remembered: the TPM may simply have been unreachable
+                self._remember_verification(cache_key, True)
+                return {
+                    "success": True,
+                    "verified": True,
+                    "action": "signature_verified"
+                }
+            else:
+                return {
+                    "success": False,
+                    "verified": False,
+                    "error": result['error']
+                }
+                
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+    
+    def _remember_verification(self, cache_key: tuple, verified: bool) -> None:
+        """Record a verification outcome, evicting the least recently used one"""
+        if cache_key[1] is None:
+            return
+        with self._cache_lock:
+            self._verify_cache[cache_key] = verified
+            if len(self._verify_cache) > VERIFY_CACHE_SIZE:
+                self._verify_cache.popitem(last=False)
+
+    def encrypt_data(self, context_file: str, data: str, encrypted_file: Optional[str] = "encrypted.bin") -> Dict[str, Any]:
+        """
+        Encrypt data using a loaded RSA key
+        
+        Args:
+            context_file: Key context file (RSA key)
+            data: Data to encrypt (base64 encoded)
+            encrypted_file: File to save the encrypted data (None keeps it in memory only)
+            
+        Returns:
+            Dictionary with encryption result (base64 encoded ciphertext)
+        """
+        try:
+            # Decode base64 data
+            decoded_data = base64.b64decode(data)
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        
+        result = self.encrypt_data_bytes(context_file, decoded_data, encrypted_file)
+        if result['success']:
+            result['encrypted_data'] = base64.b64encode(result['encrypted_data']).decode('ascii')
+        return result
+    
+    def encrypt_data_bytes(self, context_file: str, data: bytes,
+                           encrypted_file: Optional[str] = "encrypted.bin") -> Dict[str, Any]:
+        """
+        Encrypt raw bytes using a loaded RSA key
+        
+        With cryptography installed the public key is used on the host and
+        the TPM is only asked for it once per context file. Otherwise the key
+        is used over ESAPI when tpm2-pytss is installed, then tpm2_rsaencrypt.
+        
+        Args:
+            context_file: Key context file (RSA key)
+            data: Data to encrypt
+            encrypted_file: File to save the encrypted data (None keeps it in memory only)
+            
+        Returns:
+            Dictionary with encryption result (raw ciphertext bytes)
+        """
+        try:
+            # Encryption only needs the public key, so do it on the host when possible.
+            # PKCS#1 v1.5 matches the rsaes default of tpm2_rsaencrypt/tpm2_rsadecrypt.
+            public_key = self._get_public_key(context_file)
+            if rsa is not None and isinstance(public_key, rsa.RSAPublicKey):
+                encrypted_data = public_key.encrypt(data, padding.PKCS1v15())
+            else:
+                key = self._key_ref(context_file)
+                encrypted_data = self._rsa_encrypt_esapi(context_file, data)
+            
+            if encrypted_data is None:
+                # The plaintext is streamed to the tool on stdin and, without -o,
+                # the ciphertext comes back on stdout
+                result = self._run_command([*_CMD_RSA_ENCRYPT, '-c', key],
+                                           input_data=data, binary=True)
+                
+                if not result['success']:
+                    return result
+                
+                encrypted_data = result['output']
+            
+            if encrypted_file is not None:
+                with open(encrypted_file, 'wb') as f:
+                    f.write(encrypted_data)
+            
+            return {
+                "success": True,
+                "encrypted_data": encrypted_data,
+                "encrypted_file": encrypted_file,
+                "action": "data_encrypted"
+            }
                 
         except Exception as e:
             return {"success": False, "error": str(e)}
 
-    def encrypt_data(self, context_file: str, data: str, encrypted_file: str = "encrypted.bin") -> Dict[str, Any]:
+    def decrypt_data(self, context_file: str, encrypted_data: str, decrypted_file: Optional[str] = "decrypted.bin") -> Dict[str, Any]:
         """
-        Encrypt data using a loaded RSA key
+        Decrypt data using a loaded RSA key
         
         Args:
             context_file: Key context file (RSA key)
-            data: Data to encrypt (base64 encoded)
-            encrypted_file: File to save the encrypted data
+            encrypted_data: Encrypted data to decrypt (base64 encoded)
+            decrypted_file: File to save the decrypted data (None keeps it in memory only)
             
         Returns:
-            Dictionary with encryption result
+            Dictionary with decryption result (base64 encoded plaintext)
         """
         try:
-            # Decode base64 data
-            decoded_data = base64.b64decode(data)
-            
-            # Create temporary file for data
-            with tempfile.NamedTemporaryFile(delete=False, mode='wb') as temp_file:
-                temp_file.write(decoded_data)
-                temp_data_file = temp_file.name
-            
-            try:
-                cmd = [
-                    'tpm2_rsaencrypt',
-                    '-c', context_file,
-                    '-o', encrypted_file,
-                    temp_data_file
-                ]
-                
-                result = self._run_command(cmd)
-                
-                if result['success']:
-                    # Read encrypted file
-                    with open(encrypted_file, 'rb') as f:
-                        encrypted_data = f.read()
-                    
-                    return {
-                        "success": True,
-                        "encrypted_data": base64.b64encode(encrypted_data).decode(),
-                        "encrypted_file": encrypted_file,
-                        "action": "data_encrypted"
-                    }
-                else:
-                    return result
-                    
-            finally:
-                # Clean up temporary file
-                os.unlink(temp_data_file)
-                
+            # Decode base64 encrypted data
+            decoded_encrypted = base64.b64decode(encrypted_data)
         except Exception as e:
             return {"success": False, "error": str(e)}
-
-    def decrypt_data(self, context_file: str, encrypted_data: str, decrypted_file: str = "decrypted.bin") -> Dict[str, Any]:
+        
+        result = self.decrypt_data_bytes(context_file, decoded_encrypted, decrypted_file)
+        if result['success']:
+            result['decrypted_data'] = base64.b64encode(result['decrypted_data']).decode('ascii')
+        return result
+    
+    def decrypt_data_bytes(self, context_file: str, encrypted_data: bytes,
+                           decrypted_file: Optional[str] = "decrypted.bin") -> Dict[str, Any]:
         """
-        Decrypt data using a loaded RSA key
+        Decrypt raw bytes using a loaded RSA key
+        
+        With tpm2-pytss installed the key is used over ESAPI in-process;
+        otherwise tpm2_rsadecrypt is run.
         
         Args:
             context_file: Key context file (RSA key)
-            encrypted_data: Encrypted data to decrypt (base64 encoded)
-            decrypted_file: File to save the decrypted data
+            encrypted_data: Encrypted data to decrypt
+            decrypted_file: File to save the decrypted data (None keeps it in memory only)
             
         Returns:
-            Dictionary with decryption result
+            Dictionary with decryption result (raw plaintext bytes)
         """
         try:
-            # Decode base64 encrypted data
-            decoded_encrypted = base64.b64decode(encrypted_data)
-            
-            # Create temporary file for encrypted data
-            with tempfile.NamedTemporaryFile(delete=False, mode='wb') as temp_file:
-                temp_file.write(decoded_encrypted)
-                temp_encrypted_file = temp_file.name
-            
-            try:
-                cmd = [
-                    'tpm2_rsadecrypt',
-                    '-c', context_file,
-                    '-o', decrypted_file,
-                    temp_encrypted_file
-                ]
+            key = self._key_ref(context_file)
+            decrypted_data = self._rsa_decrypt_esapi(context_file, encrypted_data)
+            if decrypted_data is None:
+                # The ciphertext is streamed to the tool on stdin and, without -o,
+                # the plaintext comes back on stdout
+                result = self._run_command([*_CMD_RSA_DECRYPT, '-c', key],
+                                           input_data=encrypted_data, binary=True)
                 
-                result = self._run_command(cmd)
-                
-                if result['success']:
-                    # Read decrypted file
-                    with open(decrypted_file, 'rb') as f:
-                        decrypted_data = f.read()
-                    
-                    return {
-                        "success": True,
-                        "decrypted_data": base64.b64encode(decrypted_data).decode(),
-                        "decrypted_file": decrypted_file,
-                        "action": "data_decrypted"
-                    }
-                else:
+                if not result['success']:
                     return result
-                    
-            finally:
-                # Clean up temporary file
-                os.unlink(temp_encrypted_file)
+                
+                decrypted_data = result['output']
+            
+            if decrypted_file is not None:
+                with open(decrypted_file, 'wb') as f:
+                    f.write(decrypted_data)
+            
+            return {
+                "success": True,
+                "decrypted_data": decrypted_data,
+                "decrypted_file": decrypted_file,
+                "action": "data_decrypted"
+            }
                 
         except Exception as e:
             return {"success": False, "error": str(e)}
 
-    def encrypt_data_aes(self, context_file: str, data: str, encrypted_file: str = "encrypted_aes.bin") -> Dict[str, Any]:
+    @staticmethod
+    def _b64decode_lenient(data: str) -> bytes:
+        """Decode base64 data, restoring missing '=' padding"""
+        try:
+            return base64.b64decode(data, validate=True)
+        except Exception:
+            # If decoding fails due to padding, add padding and retry
+            # Base64 strings must be multiples of 4 characters
+            padding_needed = 4 - (len(data) % 4)
+            if padding_needed != 4:
+                return base64.b64decode(data + '=' * padding_needed, validate=True)
+            raise ValueError(f"Invalid base64-encoded string: number of data characters ({len(data)}) cannot be processed")
+
+    def encrypt_data_aes(self, context_file: str, data: str, encrypted_file: Optional[str] = "encrypted_aes.bin") -> Dict[str, Any]:
         """
         Encrypt data using a loaded AES key
         
         Args:
             context_file: Key context file (AES key)
             data: Data to encrypt (base64 encoded)
-            encrypted_file: File to save the encrypted data
+            encrypted_file: File to save the encrypted data (None keeps it in memory only)
             
         Returns:
-            Dictionary with encryption result
+            Dictionary with encryption result (base64 encoded ciphertext)
         """
         try:
             # Decode base64 data with proper padding handling
-            try:
-                decoded_data = base64.b64decode(data, validate=True)
-            except Exception:
-                # If decoding fails due to padding, add padding and retry
-                padding_needed = 4 - (len(data) % 4)
-                if padding_needed != 4:
-                    decoded_data = base64.b64decode(data + '=' * padding_needed, validate=True)
-                else:
-                    raise ValueError(f"Invalid base64-encoded string: number of data characters ({len(data)}) cannot be processed")
+            decoded_data = self._b64decode_lenient(data)
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        
+        result = self.encrypt_data_aes_bytes(context_file, decoded_data, encrypted_file)
+        if result['success']:
+            result['encrypted_data'] = base64.b64encode(result['encrypted_data']).decode('ascii')
+        return result
+
+    def encrypt_data_aes_bytes(self, context_file: str, data: bytes,
+                               encrypted_file: Optional[str] = "encrypted_aes.bin") -> Dict[str, Any]:
+        """
+        Encrypt raw bytes using a loaded AES key
+        
+        Args:
+            context_file: Key context file (AES key)
+            data: Data to encrypt
+            encrypted_file: File to save the encrypted data (None keeps it in memory only)
             
-            # Create temporary file for data
-            with tempfile.NamedTemporaryFile(delete=False, mode='wb') as temp_file:
-                temp_file.write(decoded_data)
-                temp_data_file = temp_file.name
+        Returns:
+            Dictionary with encryption result (raw ciphertext bytes)
+        """
+        try:
+            # Encryption is the default, so no flag needed for that
+            # The plaintext is streamed to the tool on stdin; without -o the
+            # ciphertext comes back on stdout and is written out from here
+            cmd = [*_CMD_AES_ENCRYPT, '-c', self._key_ref(context_file)]
             
-            try:
-                # Use --pad for PKCS7 padding to ensure proper block alignment
-                # Encryption is the default, so no flag needed for that
-                # Specify CFB mode explicitly (default for AES in TPM2)
-                cmd = [
-                    'tpm2_encryptdecrypt',
-                    '-c', context_file,
-                    '--mode', 'cfb',  # Explicitly specify CFB mode for AES
-                    '--pad',  # Enable PKCS7 padding for AES block ciphers
-                    '-o', encrypted_file,
-                    temp_data_file,
-                ]
-                
-                result = self._run_command(cmd)
+            result = self._run_command(cmd, input_data=data, binary=True)
+            
+            if result['success']:
+                encrypted_data = result['output']
+                if encrypted_file is not None:
+                    with open(encrypted_file, 'wb') as f:
+                        f.write(encrypted_data)
                 
-                if result['success']:
-                    # Read encrypted file
-                    with open(encrypted_file, 'rb') as f:
-                        encrypted_data = f.read()
-                    
-                    return {
-                        "success": True,
-                        "encrypted_data": base64.b64encode(encrypted_data).decode(),
-                        "encrypted_file": encrypted_file,
-                        "action": "data_encrypted_aes"
-                    }
-                else:
-                    return result
-                    
-            finally:
-                # Clean up temporary file
-                os.unlink(temp_data_file)
+                return {
+                    "success": True,
+                    "encrypted_data": encrypted_data,
+                    "encrypted_file": encrypted_file,
+                    "action": "data_encrypted_aes"
+                }
+            else:
+                return result
                 
         except Exception as e:
             return {"success": False, "error": str(e)}
 
-    def decrypt_data_aes(self, context_file: str, encrypted_data: str, decrypted_file: str = "decrypted_aes.bin") -> Dict[str, Any]:
+    def decrypt_data_aes(self, context_file: str, encrypted_data: str, decrypted_file: Optional[str] = "decrypted_aes.bin") -> Dict[str, Any]:
         """
         Decrypt data using a loaded AES key
         
         Args:
             context_file: Key context file (AES key)
             encrypted_data: Encrypted data to decrypt (base64 encoded)
-            decrypted_file: File to save the decrypted data
+            decrypted_file: File to save the decrypted data (None keeps it in memory only)
             
         Returns:
-            Dictionary with decryption result
+            Dictionary with decryption result (base64 encoded plaintext)
         """
-        if not os.path.exists(context_file):
+        try:
+            # Decode base64 encrypted data with proper padding handling
+            decoded_encrypted = self._b64decode_lenient(encrypted_data)
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        
+        result = self.decrypt_data_aes_bytes(context_file, decoded_encrypted, decrypted_file)
+        if result['success']:
+            result['decrypted_data'] = base64.b64encode(result['decrypted_data']).decode('ascii')
+        return result
+
+    def decrypt_data_aes_bytes(self, context_file: str, encrypted_data: bytes,
+                               decrypted_file: Optional[str] = "decrypted_aes.bin") -> Dict[str, Any]:
+        """
+        Decrypt raw bytes using a loaded AES key
+        
+        Args:
+            context_file: Key context file (AES key)
+            encrypted_data: Encrypted data to decrypt
+            decrypted_file: File to save the decrypted data (None keeps it in memory only)
+            
+        Returns:
+            Dictionary with decryption result (raw plaintext bytes)
+        """
+        stamp = self._file_stamp(context_file)
+        if stamp is None:
             return {
                 "success": False,
                 "error": f"AES context file '{context_file}' does not exist; AES key is not loaded"
             }
 
-        # Confirm TPM can read the context before attempting decryption
-        ctx_check = self._run_command(['tpm2_readpublic', '-c', context_file])
-        if not ctx_check.get("success"):
-            return {
-                "success": False,
-                "error": (
-                    f"AES context '{context_file}' is not valid (failed to read context: "
-                    f"{ctx_check.get('error', 'Unknown error')})"
-                )
-            }
+        # Confirm TPM can read the context before attempting decryption, once
+        # per version of the context file rather than on every call
+        if self._checked_aes_contexts.get(context_file) != stamp:
+            ctx_check = self._run_command([*_CMD_READPUBLIC, context_file], binary=True)
+            if not ctx_check.get("success"):
+                return {
+                    "success": False,
+                    "error": (
+                        f"AES context '{context_file}' is not valid (failed to read context: "
+                        f"{ctx_check.get('error', 'Unknown error')})"
+                    )
+                }
+            self._checked_aes_contexts[context_file] = stamp
 
         try:
-            # Decode base64 encrypted data with proper padding handling
-            # Base64 strings must be multiples of 4 characters
-            try:
-                decoded_encrypted = base64.b64decode(encrypted_data, validate=True)
-            except Exception:
-                # If decoding fails due to padding, add padding and retry
-                padding_needed = 4 - (len(encrypted_data) % 4)
-                if padding_needed != 4:
-                    decoded_encrypted = base64.b64decode(encrypted_data + '=' * padding_needed, validate=True)
-                else:
-                    raise ValueError(f"Invalid base64-encoded string: number of data characters ({len(encrypted_data)}) cannot be processed")
-
-            # Create temporary file for encrypted data
-            with tempfile.NamedTemporaryFile(delete=False, mode='wb') as temp_file:
-                temp_file.write(decoded_encrypted)
-                temp_encrypted_file = temp_file.name
-
-            try:
-                # Use -d or --decrypt for decryption
-                # Input file should be the last argument
-                # Specify CFB mode explicitly to match encryption
-                cmd = [
-                    'tpm2_encryptdecrypt',
-                    '-c', context_file,
-                    '-d',  # Decrypt mode
-                    '--mode', 'cfb',  # Explicitly specify CFB mode for AES
-                    '-o', decrypted_file,
-                    temp_encrypted_file  # Input file as last argument
-                ]
-
-                result = self._run_command(cmd)
+            # Use -d for decryption, with the same CFB mode as encryption
+            # The ciphertext is streamed to the tool on stdin; without -o the
+            # plaintext comes back on stdout and is written out from here
+            cmd = [*_CMD_AES_DECRYPT, '-c', self._key_ref(context_file)]
 
-                if result['success']:
-                    # Read decrypted file
-                    with open(decrypted_file, 'rb') as f:
-                        decrypted_data = f.read()
+            result = self._run_command(cmd, input_data=encrypted_data, binary=True)
 
-                    return {
-                        "success": True,
-                        "decrypted_data": base64.b64encode(decrypted_data).decode(),
-                        "decrypted_file": decrypted_file,
-                        "action": "data_decrypted_aes"
-                    }
-                else:
-                    return result
+            if result['success']:
+                decrypted_data = result['output']
+                if decrypted_file is not None:
+                    with open(decrypted_file, 'wb') as f:
+                        f.write(decrypted_data)
 
-            finally:
-                # Clean up temporary file
-                os.unlink(temp_encrypted_file)
+                return {
+                    "success": True,
+                    "decrypted_data": decrypted_data,
+                    "decrypted_file": decrypted_file,
+                    "action": "data_decrypted_aes"
+                }
+            else:
+                return result
 
         except Exception as e:
             return {"success": False, "error": str(e)}
@@ -876,12 +2571,8 @@ class TPM2API:
             Dictionary with creation result
         """
         try:
-            # Create empty JSON structure
-            empty_store = {}
-            json_data = json.dumps(empty_store, indent=2)
-            
-            # Encrypt the empty JSON
-            result = self.encrypt_data(context_file, base64.b64encode(json_data.encode()).decode(), store_name)
+            # Encrypt an empty JSON structure under a fresh data key
+            result = self._write_store(context_file, store_name, {}, new_key=True)
             
             if result['success']:
                 return {
@@ -896,6 +2587,361 @@ class TPM2API:
         except Exception as e:
             return {"success": False, "error": str(e)}
 
+    def _store_key(self, context_file: str, store_name: str, new_key: bool = False,
+                   dek_file: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get the AES-256-GCM cipher for the data key of a file store
+        
+        The data key is kept wrapped by the RSA key in store_name + '.dek', so
+        the TPM only decrypts 256 bytes once per data key and the store itself
+        is bulk-encrypted on the host (AES-NI via OpenSSL). The cipher object
+        is cached with it, so its key schedule is set up once. Without
+        cryptography, or for stores written without a data key, the store is
+        encrypted with the RSA key directly and 'key' is None.
+        
+        Args:
+            context_file: Key context file (RSA key) wrapping the data key
+            store_name: Name of the encrypted file store
+            new_key: Generate and wrap a new data key (the key file is
+                written by _write_store)
+            dek_file: Key file to read instead of store_name + '.dek'
+            
+        Returns:
+            Dictionary with success status, the AESGCM cipher under 'key', the
+            wrapped data key under 'wrapped' and the sealed log head recorded
+            next to it under 'head' (None for a new key)
+        """
+        if AESGCM is None:
+            return {"success": True, "key": None}
+        
+        if new_key:
+            data_key = AESGCM.generate_key(bit_length=256)
+            wrap_result = self.encrypt_data_bytes(context_file, data_key, None)
+            if not wrap_result['success']:
+                return wrap_result
+            aead = AESGCM(data_key)
+            wrapped = wrap_result['encrypted_data']
+            self._dek_cache[store_name] = (context_file, wrapped, aead)
+            return {"success": True, "key": aead, "wrapped": wrapped, "head": None}
+        
+        try:
+            dek = self._read_file(dek_file or store_name + STORE_DEK_SUFFIX)
+        except FileNotFoundError:
+            return {"success": True, "key": None}
+        (length,) = _STORE_DEK_LENGTH.unpack_from(dek)
+        wrapped = dek[_STORE_DEK_LENGTH.size:_STORE_DEK_LENGTH.size + length]
+        head = dek[_STORE_DEK_LENGTH.size + length:]
+        
+        cached = self._dek_cache.get(store_name)
+        if cached is not None and cached[:2] == (context_file, wrapped):
+            return {"success": True, "key": cached[2], "wrapped": wrapped, "head": head}
+        
+        unwrap_result = self.decrypt_data_bytes(context_file, wrapped, None)
+        if not unwrap_result['success']:
+            return unwrap_result
+        
+        aead = AESGCM(unwrap_result['decrypted_data'])
+        self._dek_cache[store_name] = (context_file, wrapped, aead)
+        return {"success": True, "key": aead, "wrapped": wrapped, "head": head}
+    
+    def _write_store_key(self, dek_file: str, wrapped: bytes, aead, count: int, tag: bytes) -> None:
+        """Atomically write a store's key file: the wrapped data key and the sealed log head"""
+        nonce = os.urandom(STORE_NONCE_SIZE)
+        head = nonce + aead.encrypt(nonce, _STORE_HEAD_COUNT.pack(count) + tag, _STORE_HEAD_AAD)
+        self._replace_file(dek_file, _STORE_DEK_LENGTH.pack(len(wrapped)) + wrapped + head)
+    
+    @staticmethod
+    def _open_store_head(aead, head: bytes) -> Tuple[int, bytes]:
+        """
+        Decrypt a sealed store log head into (frame count, tag of the last frame)
+        
+        Raises:
+            InvalidTag: The head failed authentication
+        """
+        if len(head) < STORE_NONCE_SIZE:
+            raise InvalidTag()
+        plaintext = aead.decrypt(head[:STORE_NONCE_SIZE], head[STORE_NONCE_SIZE:], _STORE_HEAD_AAD)
+        return _STORE_HEAD_COUNT.unpack_from(plaintext)[0], plaintext[_STORE_HEAD_COUNT.size:]
+
+    def _read_store(self, context_file: str, store_name: str) -> Dict[str, Any]:
+        """
+        Decrypt and parse an encrypted file store
+        
+        The parsed store is remembered together with the stamp of the
+        encrypted file, so lookups on an unchanged store skip the TPM
+        decryption. A missing store reads as empty.
+        
+        Args:
+            context_file: Key context file (RSA key) for decryption
+            store_name: Name of the encrypted file store
+            
+        Returns:
+            Dictionary with success status and the store contents under 'data'
+            (shared with the cache; copy it before modifying)
+        """
+        stamp = self._file_stamp(store_name)
+        if stamp is None:
+            return {"success": True, "data": {}}
+        
+        cached = self._store_cache.get(store_name)
+        if cached is not None and cached[:2] == (context_file, stamp):
+            return {"success": True, "data": cached[2]}
+        
+        key_result = self._store_key(context_file, store_name)
+        if not key_result['success']:
+            return key_result
+        
+        encrypted_data = self._read_file(store_name)
+        tail = None
+        if key_result['key'] is not None:
+            new_dek_file = store_name + STORE_NEW_DEK_SUFFIX
+            try:
+                try:
+                    store_data, count, tail_tag = self._replay_store_log(
+                        key_result['key'], encrypted_data,
+                        self._open_store_head(key_result['key'], key_result['head']))
+                except InvalidTag:
+                    # A crash while re-keying, after the store was replaced but
+                    # before its new key file was renamed into place
+                    if not os.path.exists(new_dek_file):
+                        raise
+                    key_result = self._store_key(context_file, store_name, dek_file=new_dek_file)
+                    if not key_result['success'] or key_result['key'] is None:
+                        raise
+                    store_data, count, tail_tag = self._replay_store_log(
+                        key_result['key'], encrypted_data,
+                        self._open_store_head(key_result['key'], key_result['head']))
+                    os.replace(new_dek_file, store_name + STORE_DEK_SUFFIX)
+            except InvalidTag:
+                return {"success": False, "error": f"File store '{store_name}' failed authentication"}
+            except (struct.error, ValueError):
+                return {"success": False, "error": f"File store '{store_name}' is truncated or was rolled back"}
+            if tail_tag is not None:
+                tail = (stamp, count, tail_tag)
+        else:
+            decrypt_result = self.decrypt_data_bytes(context_file, encrypted_data, None)
+            if not decrypt_result['success']:
+                return decrypt_result
+            store_data = _load_store(decrypt_result['decrypted_data'])
+        
+        self._store_cache[store_name] = (context_file, stamp, store_data)
+        if tail is not None:
+            self._store_tails[store_name] = tail
+        else:
+            self._store_tails.pop(store_name, None)
+        return {"success": True, "data": store_data}
+    
+    @staticmethod
+    def _seal_store_frame(aead, change: Dict[str, Any], previous_tag: bytes = b"") -> bytes:
+        """
+        Encrypt one store log frame: length || nonce || AES-GCM ciphertext and tag
+        
+        The tag of the preceding frame (empty for the snapshot) is the
+        associated data, so frames cannot be reordered, dropped from the
+        middle of the log or spliced in from another log.
+        """
+        nonce = os.urandom(STORE_NONCE_SIZE)
+        sealed = nonce + aead.encrypt(nonce, _dump_store(change), previous_tag)
+        return _STORE_FRAME_LENGTH.pack(len(sealed)) + sealed
+    
+    @staticmethod
+    def _replay_store_log(aead, encrypted_data: bytes,
+                          head: Tuple[int, bytes]) -> Tuple[Dict[str, Any], int, Optional[bytes]]:
+        """
+        Decrypt a store log and apply its frames in order
+        
+        Each frame holds {"put": {key: value, ...}, "del": [key, ...]}; the
+        first frame is a snapshot of the whole store. The log must contain
+        the frame recorded as its head in the key file, or be a snapshot that
+        replaced the log ending there (a crash before the head was updated).
+        Frames after the head are appends whose head update was lost; a frame
+        cut short there is what an interrupted append leaves behind, so it is
+        discarded.
+        
+        Args:
+            aead: AESGCM cipher for the store's data key
+            encrypted_data: Store log
+            head: (frame count, tag of the last frame) from the key file
+        
+        Returns:
+            (store contents, frame count, tag of the last frame) - the tag is
+            None if a partial trailing frame was discarded
+            
+        Raises:
+            InvalidTag: A whole frame failed authentication
+            ValueError: The log ends before its head
+        """
+        view = memoryview(encrypted_data)
+        store_data = {}
+        previous_tag = b""
+        count = 0
+        base = None
+        offset = 0
+        while offset < len(view):
+            header_end = offset + _STORE_FRAME_LENGTH.size
+            if header_end > len(view):
+                break
+            (length,) = _STORE_FRAME_LENGTH.unpack_from(view, offset)
+            frame = view[header_end:header_end + length]
+            if len(frame) != length:
+                break
+            plaintext = aead.decrypt(frame[:STORE_NONCE_SIZE], frame[STORE_NONCE_SIZE:], previous_tag)
+            offset = header_end + length
+            previous_tag = bytes(frame[-_STORE_TAG_SIZE:])
+            count += 1
+            if count == head[0] and previous_tag != head[1]:
+                raise ValueError("store log does not contain its head")
+            change = _load_store(plaintext)
+            if count == 1:
+                base = change.get("base")
+            store_data.update(change.get("put", {}))
+            for key in change.get("del", ()):
+                store_data.pop(key, None)
+        if count < head[0] and base != [head[0], head[1].hex()]:
+            raise ValueError("store log ends before its head")
+        if offset < len(view):
+            logger.warning("Discarding a partial frame at the end of a file store log")
+            return store_data, count, None
+        return store_data, count, previous_tag
+    
+    @staticmethod
+    def _store_log_appendable(store_name: str) -> bool:
+        """Check if a store log is still under STORE_COMPACT_RATIO times its snapshot frame (or the minimum size)"""
+        try:
+            fd = os.open(store_name, os.O_RDONLY | os.O_CLOEXEC)
+        except OSError:
+            return False
+        try:
+            head = os.pread(fd, _STORE_FRAME_LENGTH.size, 0)
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        if len(head) != _STORE_FRAME_LENGTH.size:
+            return False
+        snapshot_size = _STORE_FRAME_LENGTH.size + _STORE_FRAME_LENGTH.unpack(head)[0]
+        return size <= max(STORE_COMPACT_RATIO * snapshot_size, STORE_COMPACT_MIN_SIZE)
+    
+    def _write_store(self, context_file: str, store_name: str, store_data: Dict[str, Any],
+                     new_key: bool = False, previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Encrypt and write an encrypted file store, keeping the parsed copy cached
+        
+        A store that does not exist yet gets a new data key (see _store_key);
+        an existing store keeps the format it was written in. With a data key
+        and the contents the file currently holds (previous), only the change
+        is appended to the store log until it is due for compaction.
+        
+        Args:
+            context_file: Key context file (RSA key) for encryption
+            store_name: Name of the encrypted file store
+            store_data: Store contents
+            new_key: Generate a new data key even if the store exists
+            previous: Contents of the store file as last read
+            
+        Returns:
+            Dictionary with encryption result
+        """
+        key_result = self._store_key(context_file, store_name,
+                                     new_key=new_key or self._file_stamp(store_name) is None)
+        if not key_result['success']:
+            return key_result
+        
+        if key_result['key'] is not None:
+            aead = key_result['key']
+            # Only append to a log that is known to end on a whole frame; a
+            # partial one left by a crash is dropped by rewriting the snapshot
+            tail = self._store_tails.get(store_name)
+            if (key_result['head'] is not None and previous is not None and tail is not None
+                    and tail[0] == self._file_stamp(store_name) and self._store_log_appendable(store_name)):
+                # Unchanged values are the objects read before; others are compared
+                # as stored, since == does not tell apart e.g. 1, 1.0 and True
+                change = {
+                    "put": {key: value for key, value in store_data.items()
+                            if key not in previous or (previous[key] is not value
+                                                       and _dump_store(previous[key]) != _dump_store(value))},
+                    "del": [key for key in previous if key not in store_data]
+                }
+                frame = self._seal_store_frame(aead, change, tail[2])
+                self._append_file(store_name, frame)
+                count = tail[1] + 1
+            else:
+                snapshot = {"put": store_data}
+                if key_result['head'] is not None:
+                    # Lets readers accept the snapshot if the head below is never written
+                    base_count, base_tag = self._open_store_head(aead, key_result['head'])
+                    snapshot["base"] = [base_count, base_tag.hex()]
+                frame = self._seal_store_frame(aead, snapshot)
+                count = 1
+                if key_result['head'] is None:
+                    # The old key file keeps matching the old store until both are replaced
+                    new_dek_file = store_name + STORE_NEW_DEK_SUFFIX
+                    self._write_store_key(new_dek_file, key_result['wrapped'], aead, count, frame[-_STORE_TAG_SIZE:])
+                    self._replace_file(store_name, frame)
+                    os.replace(new_dek_file, store_name + STORE_DEK_SUFFIX)
+                else:
+                    self._replace_file(store_name, frame)
+            # The head is recorded after the log, so a crash leaves the log ahead of it
+            if key_result['head'] is not None:
+                self._write_store_key(store_name + STORE_DEK_SUFFIX, key_result['wrapped'], aead,
+                                      count, frame[-_STORE_TAG_SIZE:])
+            self._store_tails[store_name] = (self._file_stamp(store_name), count, frame[-_STORE_TAG_SIZE:])
+            encrypt_result = {"success": True, "encrypted_file": store_name, "action": "data_encrypted"}
+        else:
+            encrypt_result = self._encrypt_file_atomic(self.encrypt_data_bytes, context_file,
+                                                       _dump_store(store_data), store_name)
+        
+        if encrypt_result['success']:
+            self._store_cache[store_name] = (context_file, self._file_stamp(store_name), store_data)
+        else:
+            self._store_cache.pop(store_name, None)
+        return encrypt_result
+
+    def _store_op(self, context_file: str, store_name: str, operation,
+                  aes: bool = False, create: bool = False) -> Dict[str, Any]:
+        """
+        Run one read-modify-write operation against an encrypted file store
+        
+        The store is read through the store cache, handed to operation, and
+        re-encrypted only if operation reports a change.
+        
+        Args:
+            context_file: Key context file for encryption/decryption
+            store_name: Name of the encrypted file store
+            operation: Callable taking the store contents and returning
+                (result dictionary, whether the contents changed)
+            aes: The store is encrypted with an AES key instead of an RSA key
+            create: A missing store starts empty instead of being an error
+            
+        Returns:
+            The operation's result, or the read/encryption error
+        """
+        try:
+            if not create and not os.path.exists(store_name):
+                label = "AES file store" if aes else "File store"
+                return {"success": False, "error": f"{label} '{store_name}' does not exist"}
+            
+            read_store = self._read_store_aes if aes else self._read_store
+            read_result = read_store(context_file, store_name)
+            if not read_result['success']:
+                return read_result
+            previous = read_result['data']
+            store_data = dict(previous)
+            
+            result, changed = operation(store_data)
+            
+            if changed:
+                if aes:
+                    encrypt_result = self._write_store_aes(context_file, store_name, store_data)
+                else:
+                    encrypt_result = self._write_store(context_file, store_name, store_data, previous=previous)
+                if not encrypt_result['success']:
+                    return encrypt_result
+            
+            return result
+                
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
     def store_key_value(self, context_file: str, store_name: str, key: str, value: Any) -> Dict[str, Any]:
         """
         Store a key-value pair in the encrypted file store
@@ -909,62 +2955,47 @@ class TPM2API:
         Returns:
             Dictionary with storage result
         """
-        try:
-            # Step 1: Decrypt the existing file store
-            if os.path.exists(store_name):
-                # Read encrypted file
-                with open(store_name, 'rb') as f:
-                    encrypted_data = f.read()
-                
-                # Decrypt the data
-                decrypt_result = self.decrypt_data(
-                    context_file, 
-                    base64.b64encode(encrypted_data).decode(), 
-                    "temp_decrypted.json"
-                )
-                
-                if not decrypt_result['success']:
-                    return decrypt_result
-                
-                # Parse the decrypted JSON
-                with open("temp_decrypted.json", 'r') as f:
-                    store_data = json.load(f)
-            else:
-                # Create new empty store
-                store_data = {}
-            
-            # Step 2: Add/modify the key-value pair
-            store_data[key] = value
-            
-            # Step 3: Re-encrypt the updated data
-            json_data = json.dumps(store_data, indent=2)
-            encrypt_result = self.encrypt_data(
-                context_file, 
-                base64.b64encode(json_data.encode()).decode(), 
-                store_name
-            )
-            
-            # Clean up temporary file
-            if os.path.exists("temp_decrypted.json"):
-                os.unlink("temp_decrypted.json")
+        def put(store_data):
+            # The cached store must not share objects with the caller, or a
+            # later in-place change to them would look unchanged when stored
+            store_data[key] = copy.deepcopy(value)
+            return {
+                "success": True,
+                "key": key,
+                "value": value,
+                "store_name": store_name,
+                "message": f"Key '{key}' stored successfully",
+                "action": "key_value_stored"
+            }, True
+        
+        return self._store_op(context_file, store_name, put, create=True)
+
+    def store_key_values(self, context_file: str, store_name: str, items: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Store several key-value pairs in the encrypted file store at once
+        
+        The store is decrypted and re-encrypted once for the whole batch
+        instead of once per key; either all pairs are stored or none.
+        
+        Args:
+            context_file: Key context file (RSA key) for encryption/decryption
+            store_name: Name of the encrypted file store
+            items: Keys and values to store (values will be JSON serialized)
             
-            if encrypt_result['success']:
-                return {
-                    "success": True,
-                    "key": key,
-                    "value": value,
-                    "store_name": store_name,
-                    "message": f"Key '{key}' stored successfully",
-                    "action": "key_value_stored"
-                }
-            else:
-                return encrypt_result
-                
-        except Exception as e:
-            # Clean up temporary file on error
-            if os.path.exists("temp_decrypted.json"):
-                os.unlink("temp_decrypted.json")
-            return {"success": False, "error": str(e)}
+        Returns:
+            Dictionary with storage result
+        """
+        def put_all(store_data):
+            store_data.update(copy.deepcopy(items))
+            return {
+                "success": True,
+                "stored": list(items),
+                "store_name": store_name,
+                "message": f"{len(items)} keys stored successfully",
+                "action": "key_values_stored"
+            }, True
+        
+        return self._store_op(context_file, store_name, put_all, create=True)
 
     def retrieve_key_value(self, context_file: str, store_name: str, key: str) -> Dict[str, Any]:
         """
@@ -978,51 +3009,18 @@ class TPM2API:
         Returns:
             Dictionary with retrieval result
         """
-        try:
-            if not os.path.exists(store_name):
-                return {"success": False, "error": f"File store '{store_name}' does not exist"}
-            
-            # Step 1: Read and decrypt the file store
-            with open(store_name, 'rb') as f:
-                encrypted_data = f.read()
-            
-            # Decrypt the data
-            decrypt_result = self.decrypt_data(
-                context_file, 
-                base64.b64encode(encrypted_data).decode(), 
-                "temp_decrypted.json"
-            )
-            
-            if not decrypt_result['success']:
-                return decrypt_result
-            
-            # Step 2: Parse the decrypted JSON and retrieve the key
-            with open("temp_decrypted.json", 'r') as f:
-                store_data = json.load(f)
-            
-            # Clean up temporary file
-            os.unlink("temp_decrypted.json")
-            
-            if key in store_data:
-                return {
-                    "success": True,
-                    "key": key,
-                    "value": store_data[key],
-                    "store_name": store_name,
-                    "action": "key_value_retrieved"
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": f"Key '{key}' not found in file store",
-                    "available_keys": list(store_data.keys())
-                }
-                
-        except Exception as e:
-            # Clean up temporary file on error
-            if os.path.exists("temp_decrypted.json"):
-                os.unlink("temp_decrypted.json")
-            return {"success": False, "error": str(e)}
+        def get(store_data):
+            if key not in store_data:
+                return self._missing_store_key(store_data, key, "file store"), False
+            return {
+                "success": True,
+                "key": key,
+                "value": copy.deepcopy(store_data[key]),
+                "store_name": store_name,
+                "action": "key_value_retrieved"
+            }, False
+        
+        return self._store_op(context_file, store_name, get)
 
     def list_file_store_keys(self, context_file: str, store_name: str) -> Dict[str, Any]:
         """
@@ -1035,44 +3033,16 @@ class TPM2API:
         Returns:
             Dictionary with list of keys
         """
-        try:
-            if not os.path.exists(store_name):
-                return {"success": False, "error": f"File store '{store_name}' does not exist"}
-            
-            # Step 1: Read and decrypt the file store
-            with open(store_name, 'rb') as f:
-                encrypted_data = f.read()
-            
-            # Decrypt the data
-            decrypt_result = self.decrypt_data(
-                context_file, 
-                base64.b64encode(encrypted_data).decode(), 
-                "temp_decrypted.json"
-            )
-            
-            if not decrypt_result['success']:
-                return decrypt_result
-            
-            # Step 2: Parse the decrypted JSON and get all keys
-            with open("temp_decrypted.json", 'r') as f:
-                store_data = json.load(f)
-            
-            # Clean up temporary file
-            os.unlink("temp_decrypted.json")
-            
+        def list_keys(store_data):
             return {
                 "success": True,
                 "keys": list(store_data.keys()),
                 "total_keys": len(store_data),
                 "store_name": store_name,
                 "action": "keys_listed"
-            }
-                
-        except Exception as e:
-            # Clean up temporary file on error
-            if os.path.exists("temp_decrypted.json"):
-                os.unlink("temp_decrypted.json")
-            return {"success": False, "error": str(e)}
+            }, False
+        
+        return self._store_op(context_file, store_name, list_keys)
 
     def delete_key_value(self, context_file: str, store_name: str, key: str) -> Dict[str, Any]:
         """
@@ -1086,69 +3056,28 @@ class TPM2API:
         Returns:
             Dictionary with deletion result
         """
-        try:
-            if not os.path.exists(store_name):
-                return {"success": False, "error": f"File store '{store_name}' does not exist"}
-            
-            # Step 1: Read and decrypt the file store
-            with open(store_name, 'rb') as f:
-                encrypted_data = f.read()
-            
-            # Decrypt the data
-            decrypt_result = self.decrypt_data(
-                context_file, 
-                base64.b64encode(encrypted_data).decode(), 
-                "temp_decrypted.json"
-            )
-            
-            if not decrypt_result['success']:
-                return decrypt_result
-            
-            # Step 2: Parse the decrypted JSON and delete the key
-            with open("temp_decrypted.json", 'r') as f:
-                store_data = json.load(f)
-            
+        def delete(store_data):
             if key not in store_data:
-                # Clean up temporary file
-                os.unlink("temp_decrypted.json")
-                return {
-                    "success": False,
-                    "error": f"Key '{key}' not found in file store",
-                    "available_keys": list(store_data.keys())
-                }
-            
-            # Store the value before deletion for response
-            deleted_value = store_data[key]
-            del store_data[key]
-            
-            # Step 3: Re-encrypt the updated data
-            json_data = json.dumps(store_data, indent=2)
-            encrypt_result = self.encrypt_data(
-                context_file, 
-                base64.b64encode(json_data.encode()).decode(), 
-                store_name
-            )
-            
-            # Clean up temporary file
-            os.unlink("temp_decrypted.json")
-            
-            if encrypt_result['success']:
-                return {
-                    "success": True,
-                    "key": key,
-                    "deleted_value": deleted_value,
-                    "store_name": store_name,
-                    "message": f"Key '{key}' deleted successfully",
-                    "action": "key_value_deleted"
-                }
-            else:
-                return encrypt_result
-                
-        except Exception as e:
-            # Clean up temporary file on error
-            if os.path.exists("temp_decrypted.json"):
-                os.unlink("temp_decrypted.json")
-            return {"success": False, "error": str(e)}
+                return self._missing_store_key(store_data, key, "file store"), False
+            return {
+                "success": True,
+                "key": key,
+                "deleted_value": store_data.pop(key),
+                "store_name": store_name,
+                "message": f"Key '{key}' deleted successfully",
+                "action": "key_value_deleted"
+            }, True
+        
+        return self._store_op(context_file, store_name, delete)
+
+    @staticmethod
+    def _missing_store_key(store_data: Dict[str, Any], key: str, label: str) -> Dict[str, Any]:
+        """Error result for a key that is not in a file store"""
+        return {
+            "success": False,
+            "error": f"Key '{key}' not found in {label}",
+            "available_keys": list(store_data.keys())
+        }
 
     def create_encrypted_file_store_aes(self, context_file: str, store_name: str = "file_store_aes.json") -> Dict[str, Any]:
         """
@@ -1162,12 +3091,8 @@ class TPM2API:
             Dictionary with creation result
         """
         try:
-            # Create empty JSON structure
-            empty_store = {}
-            json_data = json.dumps(empty_store, indent=2)
-            
-            # Encrypt the empty JSON using AES
-            result = self.encrypt_data_aes(context_file, base64.b64encode(json_data.encode()).decode(), store_name)
+            # Encrypt an empty JSON structure using AES
+            result = self._write_store_aes(context_file, store_name, {})
             
             if result['success']:
                 return {
@@ -1182,6 +3107,55 @@ class TPM2API:
         except Exception as e:
             return {"success": False, "error": str(e)}
 
+    def _read_store_aes(self, context_file: str, store_name: str) -> Dict[str, Any]:
+        """
+        Decrypt and parse an AES encrypted file store (cached like _read_store)
+        
+        Args:
+            context_file: Key context file (AES key) for decryption
+            store_name: Name of the encrypted file store
+            
+        Returns:
+            Dictionary with success status and the store contents under 'data'
+            (shared with the cache; copy it before modifying)
+        """
+        stamp = self._file_stamp(store_name)
+        if stamp is None:
+            return {"success": True, "data": {}}
+        
+        cached = self._store_cache.get(store_name)
+        if cached is not None and cached[:2] == (context_file, stamp):
+            return {"success": True, "data": cached[2]}
+        
+        decrypt_result = self.decrypt_data_aes_bytes(context_file, self._read_file(store_name), None)
+        if not decrypt_result['success']:
+            return decrypt_result
+        
+        store_data = _load_store(decrypt_result['decrypted_data'])
+        self._store_cache[store_name] = (context_file, stamp, store_data)
+        return {"success": True, "data": store_data}
+    
+    def _write_store_aes(self, context_file: str, store_name: str, store_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Encrypt and write an AES encrypted file store, keeping the parsed copy cached
+        
+        Args:
+            context_file: Key context file (AES key) for encryption
+            store_name: Name of the encrypted file store
+            store_data: Store contents
+            
+        Returns:
+            Dictionary with encryption result
+        """
+        encrypt_result = self._encrypt_file_atomic(self.encrypt_data_aes_bytes, context_file,
+                                                   _dump_store(store_data), store_name)
+        
+        if encrypt_result['success']:
+            self._store_cache[store_name] = (context_file, self._file_stamp(store_name), store_data)
+        else:
+            self._store_cache.pop(store_name, None)
+        return encrypt_result
+
     def store_key_value_aes(self, context_file: str, store_name: str, key: str, value: Any) -> Dict[str, Any]:
         """
         Store a key-value pair in the AES encrypted file store
@@ -1195,61 +3169,18 @@ class TPM2API:
         Returns:
             Dictionary with storage result
         """
-        try:
-            # Step 1: Decrypt the existing file store
-            if os.path.exists(store_name):
-                # Read encrypted file
-                with open(store_name, 'rb') as f:
-                    encrypted_data = f.read()
-                
-                # Decrypt the data using AES
-                decrypt_result = self.decrypt_data_aes(
-                    context_file, 
-                    base64.b64encode(encrypted_data).decode(), 
-                    TEMP_DECRYPTED_AES_FILE
-                )
-                
-                if not decrypt_result['success']:
-                    self._cleanup_temp_decrypted_file()
-                    return decrypt_result
-                
-                # Parse the decrypted JSON
-                with open(TEMP_DECRYPTED_AES_FILE, 'r') as f:
-                    store_data = json.load(f)
-            else:
-                # Create new empty store
-                store_data = {}
-            
-            # Step 2: Add/modify the key-value pair
+        def put(store_data):
             store_data[key] = value
-            
-            # Step 3: Re-encrypt the updated data using AES
-            json_data = json.dumps(store_data, indent=2)
-            encrypt_result = self.encrypt_data_aes(
-                context_file, 
-                base64.b64encode(json_data.encode()).decode(), 
-                store_name
-            )
-            
-            # Clean up temporary file
-            self._cleanup_temp_decrypted_file()
-            
-            if encrypt_result['success']:
-                return {
-                    "success": True,
-                    "key": key,
-                    "value": value,
-                    "store_name": store_name,
-                    "message": f"Key '{key}' stored successfully using AES",
-                    "action": "key_value_stored_aes"
-                }
-            else:
-                return encrypt_result
-                
-        except Exception as e:
-            # Clean up temporary file on error
-            self._cleanup_temp_decrypted_file()
-            return {"success": False, "error": str(e)}
+            return {
+                "success": True,
+                "key": key,
+                "value": value,
+                "store_name": store_name,
+                "message": f"Key '{key}' stored successfully using AES",
+                "action": "key_value_stored_aes"
+            }, True
+        
+        return self._store_op(context_file, store_name, put, aes=True, create=True)
 
     def retrieve_key_value_aes(self, context_file: str, store_name: str, key: str) -> Dict[str, Any]:
         """
@@ -1263,51 +3194,18 @@ class TPM2API:
         Returns:
             Dictionary with retrieval result
         """
-        try:
-            if not os.path.exists(store_name):
-                return {"success": False, "error": f"AES file store '{store_name}' does not exist"}
-            
-            # Step 1: Read and decrypt the file store
-            with open(store_name, 'rb') as f:
-                encrypted_data = f.read()
-            
-            # Decrypt the data using AES
-            decrypt_result = self.decrypt_data_aes(
-                context_file, 
-                base64.b64encode(encrypted_data).decode(), 
-                TEMP_DECRYPTED_AES_FILE
-            )
-            
-            if not decrypt_result['success']:
-                self._cleanup_temp_decrypted_file()
-                return decrypt_result
-            
-            # Step 2: Parse the decrypted JSON and retrieve the key
-            with open(TEMP_DECRYPTED_AES_FILE, 'r') as f:
-                store_data = json.load(f)
-            
-            # Clean up temporary file
-            self._cleanup_temp_decrypted_file()
-            
-            if key in store_data:
-                return {
-                    "success": True,
-                    "key": key,
-                    "value": store_data[key],
-                    "store_name": store_name,
-                    "action": "key_value_retrieved_aes"
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": f"Key '{key}' not found in AES file store",
-                    "available_keys": list(store_data.keys())
-                }
-                
-        except Exception as e:
-            # Clean up temporary file on error
-            self._cleanup_temp_decrypted_file()
-            return {"success": False, "error": str(e)}
+        def get(store_data):
+            if key not in store_data:
+                return self._missing_store_key(store_data, key, "AES file store"), False
+            return {
+                "success": True,
+                "key": key,
+                "value": store_data[key],
+                "store_name": store_name,
+                "action": "key_value_retrieved_aes"
+            }, False
+        
+        return self._store_op(context_file, store_name, get, aes=True)
 
     def list_file_store_keys_aes(self, context_file: str, store_name: str) -> Dict[str, Any]:
         """
@@ -1320,44 +3218,16 @@ class TPM2API:
         Returns:
             Dictionary with list of keys
         """
-        try:
-            if not os.path.exists(store_name):
-                return {"success": False, "error": f"AES file store '{store_name}' does not exist"}
-            
-            # Step 1: Read and decrypt the file store
-            with open(store_name, 'rb') as f:
-                encrypted_data = f.read()
-            
-            # Decrypt the data using AES
-            decrypt_result = self.decrypt_data_aes(
-                context_file, 
-                base64.b64encode(encrypted_data).decode(), 
-                TEMP_DECRYPTED_AES_FILE
-            )
-            
-            if not decrypt_result['success']:
-                self._cleanup_temp_decrypted_file()
-                return decrypt_result
-            
-            # Step 2: Parse the decrypted JSON and get all keys
-            with open(TEMP_DECRYPTED_AES_FILE, 'r') as f:
-                store_data = json.load(f)
-            
-            # Clean up temporary file
-            self._cleanup_temp_decrypted_file()
-            
+        def list_keys(store_data):
             return {
                 "success": True,
                 "keys": list(store_data.keys()),
                 "total_keys": len(store_data),
                 "store_name": store_name,
                 "action": "keys_listed_aes"
-            }
-                
-        except Exception as e:
-            # Clean up temporary file on error
-            self._cleanup_temp_decrypted_file()
-            return {"success": False, "error": str(e)}
+            }, False
+        
+        return self._store_op(context_file, store_name, list_keys, aes=True)
 
     def delete_key_value_aes(self, context_file: str, store_name: str, key: str) -> Dict[str, Any]:
         """
@@ -1371,134 +3241,100 @@ class TPM2API:
         Returns:
             Dictionary with deletion result
         """
-        try:
-            if not os.path.exists(store_name):
-                return {"success": False, "error": f"AES file store '{store_name}' does not exist"}
-            
-            # Step 1: Read and decrypt the file store
-            with open(store_name, 'rb') as f:
-                encrypted_data = f.read()
-            
-            # Decrypt the data using AES
-            decrypt_result = self.decrypt_data_aes(
-                context_file, 
-                base64.b64encode(encrypted_data).decode(), 
-                TEMP_DECRYPTED_AES_FILE
-            )
-
-            if not decrypt_result['success']:
-                self._cleanup_temp_decrypted_file()
-                return decrypt_result
-            
-            # Step 2: Parse the decrypted JSON and delete the key
-            with open(TEMP_DECRYPTED_AES_FILE, 'r') as f:
-                store_data = json.load(f)
-            
+        def delete(store_data):
             if key not in store_data:
-                # Clean up temporary file
-                self._cleanup_temp_decrypted_file()
-                return {
-                    "success": False,
-                    "error": f"Key '{key}' not found in AES file store",
-                    "available_keys": list(store_data.keys())
-                }
-            
-            # Store the value before deletion for response
-            deleted_value = store_data[key]
-            del store_data[key]
-            
-            # Step 3: Re-encrypt the updated data using AES
-            json_data = json.dumps(store_data, indent=2)
-            encrypt_result = self.encrypt_data_aes(
-                context_file, 
-                base64.b64encode(json_data.encode()).decode(), 
-                store_name
-            )
-            
-            # Clean up temporary file
-            self._cleanup_temp_decrypted_file()
-            
-            if encrypt_result['success']:
-                return {
-                    "success": True,
-                    "key": key,
-                    "deleted_value": deleted_value,
-                    "store_name": store_name,
-                    "message": f"Key '{key}' deleted successfully from AES store",
-                    "action": "key_value_deleted_aes"
-                }
-            else:
-                return encrypt_result
-                
-        except Exception as e:
-            # Clean up temporary file on error
-            self._cleanup_temp_decrypted_file()
-            return {"success": False, "error": str(e)}
+                return self._missing_store_key(store_data, key, "AES file store"), False
+            return {
+                "success": True,
+                "key": key,
+                "deleted_value": store_data.pop(key),
+                "store_name": store_name,
+                "message": f"Key '{key}' deleted successfully from AES store",
+                "action": "key_value_deleted_aes"
+            }, True
+        
+        return self._store_op(context_file, store_name, delete, aes=True)
 
-    def full_reset(self) -> Dict[str, Any]:
+    def full_reset(self, mode: str = "hard") -> Dict[str, Any]:
         """
         Perform a complete TPM reset - clears all contexts, persistent objects, and authorizations
         
+        Args:
+            mode: 'hard' evicts persistent handles and clears the hierarchies;
+                  'soft' only flushes contexts and deletes the context files
+                  kept by make_persistent_soft, leaving NV untouched
+        
         Returns:
             Dictionary with reset result
         """
         try:
+            if mode not in ("hard", "soft"):
+                return {"success": False, "error": f"Invalid reset mode: {mode}"}
+            
             results = {}
             
-            # Step 1: Clear all persistent objects (common handles)
-            print("Clearing persistent objects...")
-            persistent_handles = [
-                0x81010001, 0x81010002, 0x81010003, 0x81010004, 0x81010005,
-                0x81010006, 0x81010007, 0x81010008, 0x81010009, 0x8101000A,
-                0x8101000B, 0x8101000C, 0x8101000D, 0x8101000E, 0x8101000F,
-                0x81010010, 0x81010011, 0x81010012, 0x81010013, 0x81010014
-            ]
+            if mode == "soft":
+                logger.info("Clearing all contexts...")
+                results["flush_contexts"] = self.flush_context("all")
+                
+                removed = []
+                for context_file in sorted(self._soft_persistent_contexts):
+                    try:
+                        os.remove(context_file)
+                        removed.append(context_file)
+                    except FileNotFoundError:
+                        pass
+                self._soft_persistent_contexts.clear()
+                results["removed_contexts"] = removed
+                
+                return {
+                    "success": True,
+                    "message": "TPM soft reset completed",
+                    "results": results,
+                    "action": "tpm_soft_reset"
+                }
             
-            cleared_persistent = []
-            for handle in persistent_handles:
-                try:
-                    cmd = ['tpm2_evictcontrol', '-C', 'o', '-c', str(handle)]
-                    result = self._run_command(cmd)
-                    if result['success']:
-                        cleared_persistent.append(hex(handle))
-                    # Don't fail if handle doesn't exist - that's expected
-                except Exception:
-                    # Ignore errors for non-existent handles
-                    pass
+            # Step 1: Clear all persistent objects, probing the common handles
+            # if the TPM cannot list the populated ones
+            logger.info("Clearing persistent objects...")
+            persistent_handles = self._list_persistent_handles()
+            if persistent_handles is None:
+                persistent_handles = self._COMMON_PERSISTENT_HANDLES
             
-            results["cleared_persistent"] = cleared_persistent
+            results["cleared_persistent"] = self._evict_persistent_handles(persistent_handles)
             
             # Step 2: Clear all contexts
-            print("Clearing all contexts...")
+            logger.info("Clearing all contexts...")
             flush_result = self.flush_context("all")
             results["flush_contexts"] = flush_result
             
-            # Step 3: Clear owner authorization
-            print("Clearing owner authorization...")
-            try:
-                cmd = ['tpm2_clear', '-c', 'o']
-                result = self._run_command(cmd)
-                results["clear_owner"] = result
-            except Exception as e:
-                results["clear_owner"] = {"success": False, "error": str(e)}
-            
-            # Step 4: Clear endorsement authorization
-            print("Clearing endorsement authorization...")
-            try:
-                cmd = ['tpm2_clear', '-c', 'e']
-                result = self._run_command(cmd)
-                results["clear_endorsement"] = result
-            except Exception as e:
-                results["clear_endorsement"] = {"success": False, "error": str(e)}
-            
-            # Step 5: Clear platform authorization
-            print("Clearing platform authorization...")
-            try:
-                cmd = ['tpm2_clear', '-c', 'p']
-                result = self._run_command(cmd)
-                results["clear_platform"] = result
-            except Exception as e:
-                results["clear_platform"] = {"success": False, "error": str(e)}
+            # Step 3: Clear authorizations. A successful platform clear also
+            # resets owner and endorsement, so those are only tried if it fails.
+            logger.info("Clearing platform authorization...")
+            results["clear_platform"] = self._clear_esapi()
+            if results["clear_platform"] is None:
+                results["clear_platform"] = self._run_command(['tpm2_clear', '-c', 'p'])
+            if not results["clear_platform"]["success"]:
+                logger.info("Clearing owner and endorsement authorization...")
+                results["clear_owner"], results["clear_endorsement"] = self._run_commands([
+                    ['tpm2_clear', '-c', 'o'],
+                    ['tpm2_clear', '-c', 'e']
+                ])
+            
+            # Saved contexts under the old owner seed are no longer loadable
+            self._soft_persistent_contexts.clear()
+            self._load_cache.clear()
+            self._primary_cache.clear()
+            self._persistent_handles.clear()
+            self._verify_cache.clear()
+            self._store_cache.clear()
+            self._store_tails.clear()
+            self._dek_cache.clear()
+            self._checked_aes_contexts.clear()
+            with self._esys_lock:
+                self._flush_esapi_handles()
+            self._hot_keys.clear()
+            self.invalidate_cache()
             
             return {
                 "success": True,
@@ -1510,6 +3346,107 @@ class TPM2API:
         except Exception as e:
             return {"success": False, "error": str(e)}
 
+    def _clear_esapi(self) -> Optional[Dict[str, Any]]:
+        """
+        Run TPM2_Clear with platform authorization over ESAPI
+        
+        Returns:
+            Result dictionary (same shape as _run_command), or None if
+            tpm2-pytss is unavailable
+        """
+        with self._tpm_serialized(), self._esapi_session() as ectx:
+            if ectx is None:
+                return None
+            try:
+                ectx.clear(ESYS_TR.PLATFORM)
+                return {"success": True, "output": ""}
+            except Exception as e:
+                return {"success": False, "error": str(e)}
+
+    def _list_persistent_handles(self) -> Optional[List[int]]:
+        """
+        List the persistent handles currently populated in the TPM
+        
+        Queried over the ESAPI connection that _evict_persistent_handles then
+        reuses when tpm2-pytss is installed, otherwise with tpm2_getcap.
+        
+        Returns:
+            List of handles, or None if the capability could not be read
+        """
+        with self._tpm_serialized(), self._esapi_session() as ectx:
+            if ectx is not None:
+                try:
+                    handles = []
+                    more, first = True, TPM2_HC.PERSISTENT_FIRST
+                    while more:
+                        more, data = ectx.get_capability(TPM2_CAP.HANDLES, first, TPM2_MAX.CAP_HANDLES)
+                        found = [int(handle) for handle in data.data.handles]
+                        if not found:
+                            break
+                        handles.extend(found)
+                        first = found[-1] + 1
+                    return handles
+                except Exception as e:
+                    logger.debug("ESAPI handle listing failed, using tpm2_getcap: %s", e)
+        
+        result = self._run_command(['tpm2_getcap', 'handles-persistent'], binary=True)
+        if not result['success']:
+            return None
+        
+        handles = []
+        for line in result['output'].splitlines():
+            line = line.strip()
+            if line.startswith(b'-'):
+                try:
+                    handles.append(int(line[1:].strip(), 16))
+                except ValueError:
+                    return None
+        return handles
+    
+    def _evict_persistent_handles(self, handles: Sequence[int]) -> List[str]:
+        """
+        Evict persistent handles, skipping handles that are not populated
+        
+        Uses one in-process ESAPI connection for all handles when tpm2-pytss
+        is installed, otherwise tpm2_evictcontrol calls dispatched concurrently.
+        
+        Args:
+            handles: Persistent handles to evict
+            
+        Returns:
+            List of evicted handles as hex strings
+        """
+        cleared = []
+        
+        with self._tpm_serialized(), self._esapi_session() as ectx:
+            if ectx is not None:
+                for handle in handles:
+                    try:
+                        obj = ectx.tr_from_tpmpublic(handle)
+                    except Exception:
+                        # Don't fail if handle doesn't exist - that's expected
+                        continue
+                    try:
+                        ectx.evict_control(ESYS_TR.OWNER, obj, handle)
+                        cleared.append(hex(handle))
+                    except Exception:
+                        # Eviction releases the reference; otherwise it is closed here
+                        try:
+                            ectx.tr_close(obj)
+                        except Exception:
+                            pass
+                return cleared
+        
+        # Don't fail if a handle doesn't exist - that's expected
+        results = self._run_commands([
+            [*_CMD_EVICT_OWNER, str(handle)] for handle in handles
+        ])
+        for handle, result in zip(handles, results):
+            if result['success']:
+                cleared.append(hex(handle))
+        
+        return cleared
+
     def list_files(self, directory: str = ".") -> Dict[str, Any]:
         """
         List files in the working directory.
@@ -1636,8 +3573,32 @@ class TPM2API:
                 "error": f"Failed to delete file: {str(e)}"
             }
 
+
+def get_api(tcti_name: Optional[str] = None) -> TPM2API:
+    """
+    Return the TPM2API instance shared by this process for a TCTI
+    
+    The instance (and its connection check and caches) is created on first
+    use, so callers that need an API per request do not pay for it each time.
+    
+    Args:
+        tcti_name: TCTI configuration, resolved as in TPM2API() when None
+    """
+    # lru_cache keys get_api(), get_api(None) and get_api(tcti_name=None)
+    # differently, so the cached call always gets one positional argument
+    return _shared_api(tcti_name)
+
+
+@functools.lru_cache(maxsize=None)
+def _shared_api(tcti_name: Optional[str]) -> TPM2API:
+    """Create the TPM2API instance get_api() returns for a TCTI"""
+    return TPM2API(tcti_name)
+
+
 # Example usage
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    
     # Initialize TPM2 API
     tpm = TPM2API()
     
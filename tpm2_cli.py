@@ -6,7 +6,6 @@ TPM2 Command Line Interface - Simple CLI wrapper for TPM2 operations
 import argparse
 import json
 import sys
-from tpm2_api import TPM2API
 
 def main():
     parser = argparse.ArgumentParser(description="TPM2 Command Line Interface")
@@ -36,6 +35,13 @@ def main():
     persistent_parser.add_argument("--context", "-c", required=True, help="Key context file")
     persistent_parser.add_argument("--handle", default="0x81010001", help="Persistent handle")
     
+    # Provision command
+    provision_parser = subparsers.add_parser("provision",
+                                             help="Create a signing key and make it persistent in one step")
+    provision_parser.add_argument("--hierarchy", default="o", help="TPM hierarchy (o/e/p)")
+    provision_parser.add_argument("--type", "-t", default="rsa", help="Key type (rsa/ecc)")
+    provision_parser.add_argument("--handle", default="0x81010001", help="Persistent handle")
+    
     # Flush context command
     flush_parser = subparsers.add_parser("flush-context", help="Flush TPM contexts")
     flush_parser.add_argument("--type", "-t", default="transient", 
@@ -64,6 +70,8 @@ def main():
     
     # Full reset command
     reset_parser = subparsers.add_parser("full-reset", help="Perform complete TPM reset")
+    reset_parser.add_argument("--mode", choices=["hard", "soft"], default="hard",
+                              help="soft only flushes contexts and drops soft-persisted context files")
     
     args = parser.parse_args()
     
@@ -72,6 +80,10 @@ def main():
         sys.exit(1)
     
     try:
+        # Imported only once a command is known, so --help and usage errors
+        # skip loading tpm2_api and its optional crypto/TPM libraries
+        from tpm2_api import TPM2API
+        
         # Initialize TPM2 API
         tpm = TPM2API()
         
@@ -104,6 +116,14 @@ def main():
                 persistent_handle=handle
             )
             
+        elif args.command == "provision":
+            handle = int(args.handle, 16) if args.handle.startswith("0x") else int(args.handle)
+            result = tpm.provision_signing_key(
+                hierarchy=args.hierarchy,
+                persistent_handle=handle,
+                key_type=args.type
+            )
+            
         elif args.command == "flush-context":
             result = tpm.flush_context(context_type=args.type)
             
@@ -182,7 +202,7 @@ def main():
                 print("Reset cancelled.")
                 sys.exit(0)
             
-            result = tpm.full_reset()
+            result = tpm.full_reset(mode=args.mode)
         
         # Print result
         if result["success"]:
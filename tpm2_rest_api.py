@@ -3,32 +3,176 @@
 TPM2 REST API - FastAPI wrapper for TPM2 operations
 """
 
-from fastapi import FastAPI, HTTPException, UploadFile, File
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File, Form
+from fastapi.responses import FileResponse, JSONResponse, Response
 from pydantic import BaseModel, validator
-from typing import Any, Union
+from functools import wraps
+from typing import Any, List, Union
+import asyncio
+import base64
+import fnmatch
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
 import uvicorn
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; responses are encoded with the json module instead
+    orjson = None
+
+class OrjsonResponse(JSONResponse):
+    """JSONResponse encoded with orjson when it is installed (FastAPI's own ORJSONResponse is deprecated)"""
+    
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            try:
+                return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+            except TypeError:  # e.g. integers beyond 64 bits, which json handles
+                pass
+        return super().render(content)
+
 # Import our TPM2 API
-from tpm2_api import TPM2API
+from tpm2_api import get_api
+
+logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
 app = FastAPI(
     title="TPM2 REST API",
     description="REST API for TPM2 operations supporting both hardware TPM and software TPM emulator",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=OrjsonResponse
 )
 
 # Initialize TPM2 API
 # TCTI can be configured via TPM2_TCTI environment variable
-# If not set, will auto-detect hardware TPM or use SWTPM default
+# If not set, will auto-detect hardware TPM or use SWTPM default.
+# The instance is the process-wide one, shared with other in-process users.
 try:
-    tpm_api = TPM2API()
-    print(f"TPM2 API initialized with TCTI: {tpm_api.tcti_name}")
+    tpm_api = get_api()
+    logger.info("TPM2 API initialized with TCTI: %s", tpm_api.tcti_name)
 except Exception as e:
-    print(f"Warning: TPM2 API initialization failed: {e}")
+    logger.warning("TPM2 API initialization failed: %s", e)
     tpm_api = None
 
+# Blocking TPM2API calls run at once on worker threads; single-connection TPMs
+# are serialized inside TPM2API regardless
+TPM_WORKERS = int(os.environ.get("TPM2_API_WORKERS", "4"))
+# TPM calls waiting for a worker beyond which further ones are refused with 503
+TPM_QUEUE_LIMIT = int(os.environ.get("TPM2_API_QUEUE_LIMIT", "64"))
+
+_tpm_slots = asyncio.Semaphore(TPM_WORKERS)
+_tpm_requests = 0
+
+async def run_tpm(func, *args, **kwargs):
+    """
+    Run a blocking TPM2API call on a worker thread, at most TPM_WORKERS at a time
+    
+    Raises 503 instead of queueing without bound once TPM_QUEUE_LIMIT calls
+    are already waiting for a worker.
+    """
+    global _tpm_requests
+    if _tpm_requests >= TPM_WORKERS + TPM_QUEUE_LIMIT:
+        raise HTTPException(status_code=503, detail="TPM busy, retry later", headers={"Retry-After": "1"})
+    _tpm_requests += 1
+    try:
+        async with _tpm_slots:
+            return await asyncio.to_thread(func, *args, **kwargs)
+    finally:
+        _tpm_requests -= 1
+
+def tpm_endpoint(endpoint):
+    """
+    Turn an endpoint returning a TPM2API result dictionary into the HTTP response
+    
+    Answers 503 while the TPM2 API is unavailable, 400 with the error of an
+    unsuccessful result and 500 for unexpected exceptions. Successful results
+    are sent as JSON; any other response the endpoint returns is passed through.
+    """
+    @wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        if tpm_api is None:
+            raise HTTPException(status_code=503, detail="TPM2 API not available")
+        
+        try:
+            result = await endpoint(*args, **kwargs)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        
+        if not isinstance(result, dict):
+            return result
+        if not result["success"]:
+            raise HTTPException(status_code=400, detail=result["error"])
+        return OrjsonResponse(content=result, status_code=200)
+    
+    return wrapper
+
+# (logger, QueueHandler, QueueListener) for every logger moved behind a queue
+_log_listeners = []
+
+def log_through_queue(*logger_names: str):
+    """
+    Put the handlers of the given loggers behind a QueueListener each
+    
+    Logging calls then only enqueue the record; formatting and the write to
+    stderr happen on the listener's thread instead of the event loop.
+    """
+    for name in logger_names:
+        log = logging.getLogger(name)
+        handlers = [h for h in log.handlers if not isinstance(h, logging.handlers.QueueHandler)]
+        if not handlers:
+            continue
+        log_queue = queue.SimpleQueue()
+        for handler in handlers:
+            log.removeHandler(handler)
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        log.addHandler(queue_handler)
+        listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        _log_listeners.append((log, queue_handler, listener))
+
+@app.on_event("startup")
+def configure_logging():
+    """Show this API's INFO logs and move all log output off the request path"""
+    # No-op when the embedding application configured logging already
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:     %(name)s - %(message)s")
+    log_through_queue("", "uvicorn", "uvicorn.error", "uvicorn.access")
+
+# Key context files prepared at startup so the first request using them is not slow
+WARM_CONTEXTS = [name for name in os.environ.get("TPM2_WARM_CONTEXTS", "primary.ctx,rsa.ctx").split(",") if name]
+
+@app.on_event("startup")
+async def warm_tpm():
+    """Query the TPM and preload the WARM_CONTEXTS keys before serving requests"""
+    if tpm_api is None or not WARM_CONTEXTS:
+        return
+    result = await asyncio.to_thread(tpm_api.warm_up, WARM_CONTEXTS)
+    if result["success"]:
+        logger.info("Warmed key contexts: %s", ", ".join(result["warmed"]) or "none found")
+    else:
+        logger.warning("TPM warm-up failed: %s", result["error"])
+
+@app.on_event("shutdown")
+def release_tpm():
+    """Release hot-key handles and the kept ESAPI connection when the server stops"""
+    if tpm_api is not None:
+        tpm_api.close()
+
+@app.on_event("shutdown")
+def flush_logs():
+    """Write out queued log records and hand the handlers back for the final messages"""
+    while _log_listeners:
+        log, queue_handler, listener = _log_listeners.pop()
+        listener.stop()
+        log.removeHandler(queue_handler)
+        for handler in listener.handlers:
+            log.addHandler(handler)
+
 # Pydantic models for request/response
 class PrimaryKeyRequest(BaseModel):
     hierarchy: str = "o"
@@ -70,8 +214,12 @@ class PersistentRequest(BaseModel):
         else:
             raise ValueError(f"persistent_handle must be an integer or string, got {type(v)}")
 
+class SoftPersistentRequest(BaseModel):
+    context_file: str
+
 class FlushContextRequest(BaseModel):
     context_type: str = "transient"
+    skip_if_clean: bool = False
 
 class SignDataRequest(BaseModel):
     context_file: str
@@ -83,6 +231,20 @@ class VerifySignatureRequest(BaseModel):
     data: str  # base64 encoded data
     signature: str  # base64 encoded signature
 
+class SignBatchItem(BaseModel):
+    context_file: str
+    data: str  # base64 encoded data
+
+class SignBatchRequest(BaseModel):
+    items: List[SignBatchItem]
+
+class SignMerkleRequest(BaseModel):
+    context_file: str
+    data: List[str]  # base64 encoded payloads
+
+class VerifyBatchRequest(BaseModel):
+    items: List[VerifySignatureRequest]
+
 class EncryptDataRequest(BaseModel):
     context_file: str
     data: str  # base64 encoded data
@@ -170,537 +332,388 @@ async def health_check():
         raise HTTPException(status_code=503, detail="TPM2 API not available")
     
     try:
-        info = tpm_api.get_tpm_info()
+        info = await run_tpm(tpm_api.get_tpm_info)
         return {
             "status": "healthy",
             "tpm_info": info
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"TPM2 health check failed: {e}")
 
 # TPM2 operation endpoints
 @app.post("/tpm2/create-primary")
+@tpm_endpoint
 async def create_primary_key(request: PrimaryKeyRequest):
     """Create a primary key in the specified hierarchy"""
-    if tpm_api is None:
-        raise HTTPException(status_code=503, detail="TPM2 API not available")
-    
-    try:
-        result = tpm_api.create_primary_key(
-            hierarchy=request.hierarchy,
-            context_file=request.context_file
-        )
-        
-        if result["success"]:
-            return JSONResponse(content=result, status_code=200)
-        else:
-            raise HTTPException(status_code=400, detail=result["error"])
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_tpm(
+        tpm_api.create_primary_key,
+        hierarchy=request.hierarchy,
+        context_file=request.context_file
+    )
 
 @app.post("/tpm2/create-key")
+@tpm_endpoint
 async def create_key(request: CreateKeyRequest):
     """Create a key under the specified parent"""
-    if tpm_api is None:
-        raise HTTPException(status_code=503, detail="TPM2 API not available")
-    
-    try:
-        result = tpm_api.create_key(
-            parent_context=request.parent_context,
-            key_type=request.key_type,
-            public_file=request.public_file,
-            private_file=request.private_file
-        )
-        
-        if result["success"]:
-            return JSONResponse(content=result, status_code=200)
-        else:
-            raise HTTPException(status_code=400, detail=result["error"])
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_tpm(
+        tpm_api.create_key,
+        parent_context=request.parent_context,
+        key_type=request.key_type,
+        public_file=request.public_file,
+        private_file=request.private_file
+    )
 
 @app.post("/tpm2/load-key")
+@tpm_endpoint
 async def load_key(request: LoadKeyRequest):
     """Load a key into the TPM"""
-    if tpm_api is None:
-        raise HTTPException(status_code=503, detail="TPM2 API not available")
-    
-    try:
-        result = tpm_api.load_key(
-            parent_context=request.parent_context,
-            public_file=request.public_file,
-            private_file=request.private_file,
-            context_file=request.context_file
-        )
-        
-        if result["success"]:
-            return JSONResponse(content=result, status_code=200)
-        else:
-            raise HTTPException(status_code=400, detail=result["error"])
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_tpm(
+        tpm_api.load_key,
+        parent_context=request.parent_context,
+        public_file=request.public_file,
+        private_file=request.private_file,
+        context_file=request.context_file
+    )
 
 @app.post("/tpm2/make-persistent")
+@tpm_endpoint
 async def make_persistent(request: PersistentRequest):
     """Make a loaded key persistent"""
-    if tpm_api is None:
-        raise HTTPException(status_code=503, detail="TPM2 API not available")
-    
-    try:
-        result = tpm_api.make_persistent(
-            context_file=request.context_file,
-            persistent_handle=request.persistent_handle
-        )
-        
-        if result["success"]:
-            return JSONResponse(content=result, status_code=200)
-        else:
-            raise HTTPException(status_code=400, detail=result["error"])
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_tpm(
+        tpm_api.make_persistent,
+        context_file=request.context_file,
+        persistent_handle=request.persistent_handle
+    )
+
+@app.post("/tpm2/make-persistent-soft")
+@tpm_endpoint
+async def make_persistent_soft(request: SoftPersistentRequest):
+    """Keep a loaded key through its saved context file instead of a persistent handle
+
+    full-reset with mode=soft deletes the context files kept this way.
+    """
+    return await run_tpm(tpm_api.make_persistent_soft, context_file=request.context_file)
 
 @app.post("/tpm2/flush-context")
+@tpm_endpoint
 async def flush_context(request: FlushContextRequest):
     """Flush TPM contexts"""
-    if tpm_api is None:
-        raise HTTPException(status_code=503, detail="TPM2 API not available")
-    
-    try:
-        result = tpm_api.flush_context(context_type=request.context_type)
-        
-        if result["success"]:
-            return JSONResponse(content=result, status_code=200)
-        else:
-            raise HTTPException(status_code=400, detail=result["error"])
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_tpm(
+        tpm_api.flush_context,
+        context_type=request.context_type,
+        skip_if_clean=request.skip_if_clean
+    )
 
 @app.get("/tpm2/info")
+@tpm_endpoint
 async def get_tpm_info():
     """Get TPM information"""
-    if tpm_api is None:
-        raise HTTPException(status_code=503, detail="TPM2 API not available")
-    
-    try:
-        result = tpm_api.get_tpm_info()
-        
-        if result["success"]:
-            return JSONResponse(content=result, status_code=200)
-        else:
-            raise HTTPException(status_code=400, detail=result["error"])
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_tpm(tpm_api.get_tpm_info)
 
 @app.post("/tpm2/sign")
+@tpm_endpoint
 async def sign_data(request: SignDataRequest):
     """Sign data using a loaded key"""
-    if tpm_api is None:
-        raise HTTPException(status_code=503, detail="TPM2 API not available")
-    
-    try:
-        result = tpm_api.sign_data(
-            context_file=request.context_file,
-            data=request.data,
-            signature_file=request.signature_file
-        )
-        
-        if result["success"]:
-            return JSONResponse(content=result, status_code=200)
-        else:
-            raise HTTPException(status_code=400, detail=result["error"])
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_tpm(
+        tpm_api.sign_data,
+        context_file=request.context_file,
+        data=request.data,
+        signature_file=request.signature_file
+    )
 
 @app.post("/tpm2/verify")
+@tpm_endpoint
 async def verify_signature(request: VerifySignatureRequest):
     """Verify a signature"""
-    if tpm_api is None:
-        raise HTTPException(status_code=503, detail="TPM2 API not available")
+    return await run_tpm(
+        tpm_api.verify_signature,
+        context_file=request.context_file,
+        data=request.data,
+        signature=request.signature
+    )
+
+@app.post("/tpm2/sign-batch")
+@tpm_endpoint
+async def sign_batch(request: SignBatchRequest):
+    """Sign several payloads in one request (results in request order)"""
+    return await run_tpm(
+        tpm_api.sign_data_batch, [item.dict() for item in request.items]
+    )
+
+@app.post("/tpm2/sign-merkle")
+@tpm_endpoint
+async def sign_merkle(request: SignMerkleRequest):
+    """Sign several payloads with a single TPM signature over their Merkle root"""
+    return await run_tpm(tpm_api.sign_data_merkle, request.context_file, request.data)
+
+@app.post("/tpm2/verify-batch")
+@tpm_endpoint
+async def verify_batch(request: VerifyBatchRequest):
+    """Verify several signatures in one request (results in request order)"""
+    return await run_tpm(
+        tpm_api.verify_signature_batch, [item.dict() for item in request.items]
+    )
+
+@app.post("/tpm2/sign-file")
+@tpm_endpoint
+async def sign_file(
+    context_file: str = Form(...),
+    data: UploadFile = File(...),
+    signature_file: str = Form("signature.sig")
+):
+    """Sign an uploaded file as-is (no base64 request body)"""
+    result = await run_tpm(
+        tpm_api.sign_data_bytes,
+        context_file=context_file,
+        data=await data.read(),
+        signature_file=signature_file
+    )
     
-    try:
-        result = tpm_api.verify_signature(
-            context_file=request.context_file,
-            data=request.data,
-            signature=request.signature
-        )
-        
-        if result["success"]:
-            return JSONResponse(content=result, status_code=200)
-        else:
-            raise HTTPException(status_code=400, detail=result["error"])
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-
+    if result["success"]:
+        result["signature"] = base64.b64encode(result["signature"]).decode()
+    return result
+
+@app.post("/tpm2/verify-file")
+@tpm_endpoint
+async def verify_file(
+    context_file: str = Form(...),
+    data: UploadFile = File(...),
+    signature: UploadFile = File(...)
+):
+    """Verify the signature of an uploaded file as-is (no base64 request body)"""
+    return await run_tpm(
+        tpm_api.verify_signature_bytes,
+        context_file=context_file,
+        data=await data.read(),
+        signature=await signature.read()
+    )
+
+# The raw endpoints answer with the result itself and write no output files
+@app.post("/tpm2/sign-raw")
+@tpm_endpoint
+async def sign_raw(request: Request, context_file: str):
+    """Sign the raw request body (application/octet-stream); responds with the raw signature"""
+    result = await run_tpm(
+        tpm_api.sign_data_bytes,
+        context_file=context_file,
+        data=await request.body(),
+        signature_file=None
+    )
+    
+    if result["success"]:
+        return Response(content=result["signature"], media_type="application/octet-stream")
+    return result
+
+@app.post("/tpm2/encrypt-raw")
+@tpm_endpoint
+async def encrypt_raw(request: Request, context_file: str):
+    """Encrypt the raw request body with a loaded RSA key; responds with the raw ciphertext"""
+    result = await run_tpm(
+        tpm_api.encrypt_data_bytes,
+        context_file=context_file,
+        data=await request.body(),
+        encrypted_file=None
+    )
+    
+    if result["success"]:
+        return Response(content=result["encrypted_data"], media_type="application/octet-stream")
+    return result
+
+@app.post("/tpm2/decrypt-raw")
+@tpm_endpoint
+async def decrypt_raw(request: Request, context_file: str):
+    """Decrypt the raw request body with a loaded RSA key; responds with the raw plaintext"""
+    result = await run_tpm(
+        tpm_api.decrypt_data_bytes,
+        context_file=context_file,
+        encrypted_data=await request.body(),
+        decrypted_file=None
+    )
+    
+    if result["success"]:
+        return Response(content=result["decrypted_data"], media_type="application/octet-stream")
+    return result
 
 @app.post("/tpm2/encrypt")
+@tpm_endpoint
 async def encrypt_data(request: EncryptDataRequest):
     """Encrypt data using a loaded RSA key"""
-    if tpm_api is None:
-        raise HTTPException(status_code=503, detail="TPM2 API not available")
-    
-    try:
-        result = tpm_api.encrypt_data(
-            context_file=request.context_file,
-            data=request.data,
-            encrypted_file=request.encrypted_file
-        )
-        
-        if result["success"]:
-            return JSONResponse(content=result, status_code=200)
-        else:
-            raise HTTPException(status_code=400, detail=result["error"])
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_tpm(
+        tpm_api.encrypt_data,
+        context_file=request.context_file,
+        data=request.data,
+        encrypted_file=request.encrypted_file
+    )
 
 @app.post("/tpm2/decrypt")
+@tpm_endpoint
 async def decrypt_data(request: DecryptDataRequest):
     """Decrypt data using a loaded RSA key"""
-    if tpm_api is None:
-        raise HTTPException(status_code=503, detail="TPM2 API not available")
-    
-    try:
-        result = tpm_api.decrypt_data(
-            context_file=request.context_file,
-            encrypted_data=request.encrypted_data,
-            decrypted_file=request.decrypted_file
-        )
-        
-        if result["success"]:
-            return JSONResponse(content=result, status_code=200)
-        else:
-            raise HTTPException(status_code=400, detail=result["error"])
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_tpm(
+        tpm_api.decrypt_data,
+        context_file=request.context_file,
+        encrypted_data=request.encrypted_data,
+        decrypted_file=request.decrypted_file
+    )
 
 @app.post("/tpm2/full-reset")
-async def full_reset():
-    """Perform a complete TPM reset - clears all contexts, persistent objects, and authorizations"""
-    if tpm_api is None:
-        raise HTTPException(status_code=503, detail="TPM2 API not available")
-    
-    try:
-        result = tpm_api.full_reset()
-        
-        if result["success"]:
-            return JSONResponse(content=result, status_code=200)
-        else:
-            raise HTTPException(status_code=400, detail=result["error"])
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+@tpm_endpoint
+async def full_reset(mode: str = "hard"):
+    """Perform a complete TPM reset - clears all contexts, persistent objects, and authorizations
+
+    Pass mode=soft to only flush contexts and drop soft-persisted context files.
+    """
+    return await run_tpm(tpm_api.full_reset, mode=mode)
 
 # Convenience endpoint for the complete workflow
 @app.post("/tpm2/workflow/complete")
+@tpm_endpoint
 async def complete_workflow():
     """Execute the complete TPM2 workflow: create primary -> create key -> load -> make persistent"""
-    if tpm_api is None:
-        raise HTTPException(status_code=503, detail="TPM2 API not available")
-    
-    try:
-        results = {}
-        
-        # Step 1: Create primary key
-        print("Creating primary key...")
-        result = tpm_api.create_primary_key()
-        results["create_primary"] = result
-        if not result["success"]:
-            raise HTTPException(status_code=400, detail=f"Primary key creation failed: {result['error']}")
-        
-        # Step 2: Create RSA key
-        print("Creating RSA key...")
-        result = tpm_api.create_key("primary.ctx", "rsa", "rsa.pub", "rsa.priv")
-        results["create_key"] = result
-        if not result["success"]:
-            raise HTTPException(status_code=400, detail=f"Key creation failed: {result['error']}")
-        
-        # Step 3: Load key
-        print("Loading key...")
-        result = tpm_api.load_key("primary.ctx", "rsa.pub", "rsa.priv", "rsa.ctx")
-        results["load_key"] = result
-        if not result["success"]:
-            raise HTTPException(status_code=400, detail=f"Key loading failed: {result['error']}")
-        
-        # Step 4: Make persistent
-        print("Making key persistent...")
-        result = tpm_api.make_persistent("rsa.ctx")
-        results["make_persistent"] = result
-        if not result["success"]:
-            raise HTTPException(status_code=400, detail=f"Making persistent failed: {result['error']}")
-        
-        return JSONResponse(content={
-            "success": True,
-            "message": "Complete workflow executed successfully",
-            "results": results
-        }, status_code=200)
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    # The steps depend on each other's files, so they run back to back in one
+    # worker call rather than one thread hop (and pool slot) per step
+    return await run_tpm(tpm_api.complete_workflow)
 
 # Encrypted File Store endpoints
 @app.post("/tpm2/file-store/create")
+@tpm_endpoint
 async def create_file_store(request: CreateFileStoreRequest):
     """Create a new encrypted file store"""
-    if tpm_api is None:
-        raise HTTPException(status_code=503, detail="TPM2 API not available")
-    
-    try:
-        result = tpm_api.create_encrypted_file_store(
-            context_file=request.context_file,
-            store_name=request.store_name
-        )
-        
-        if result["success"]:
-            return JSONResponse(content=result, status_code=200)
-        else:
-            raise HTTPException(status_code=400, detail=result["error"])
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_tpm(
+        tpm_api.create_encrypted_file_store,
+        context_file=request.context_file,
+        store_name=request.store_name
+    )
 
 @app.post("/tpm2/file-store/store")
+@tpm_endpoint
 async def store_key_value(request: StoreKeyValueRequest):
     """Store a key-value pair in the encrypted file store"""
-    if tpm_api is None:
-        raise HTTPException(status_code=503, detail="TPM2 API not available")
-    
-    try:
-        result = tpm_api.store_key_value(
-            context_file=request.context_file,
-            store_name=request.store_name,
-            key=request.key,
-            value=request.value
-        )
-        
-        if result["success"]:
-            return JSONResponse(content=result, status_code=200)
-        else:
-            raise HTTPException(status_code=400, detail=result["error"])
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_tpm(
+        tpm_api.store_key_value,
+        context_file=request.context_file,
+        store_name=request.store_name,
+        key=request.key,
+        value=request.value
+    )
 
 @app.post("/tpm2/file-store/retrieve")
+@tpm_endpoint
 async def retrieve_key_value(request: RetrieveKeyValueRequest):
     """Retrieve a key-value pair from the encrypted file store"""
-    if tpm_api is None:
-        raise HTTPException(status_code=503, detail="TPM2 API not available")
-    
-    try:
-        result = tpm_api.retrieve_key_value(
-            context_file=request.context_file,
-            store_name=request.store_name,
-            key=request.key
-        )
-        
-        if result["success"]:
-            return JSONResponse(content=result, status_code=200)
-        else:
-            raise HTTPException(status_code=400, detail=result["error"])
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_tpm(
+        tpm_api.retrieve_key_value,
+        context_file=request.context_file,
+        store_name=request.store_name,
+        key=request.key
+    )
 
 @app.post("/tpm2/file-store/list-keys")
+@tpm_endpoint
 async def list_file_store_keys(request: ListFileStoreKeysRequest):
     """List all keys in the encrypted file store"""
-    if tpm_api is None:
-        raise HTTPException(status_code=503, detail="TPM2 API not available")
-    
-    try:
-        result = tpm_api.list_file_store_keys(
-            context_file=request.context_file,
-            store_name=request.store_name
-        )
-        
-        if result["success"]:
-            return JSONResponse(content=result, status_code=200)
-        else:
-            raise HTTPException(status_code=400, detail=result["error"])
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_tpm(
+        tpm_api.list_file_store_keys,
+        context_file=request.context_file,
+        store_name=request.store_name
+    )
 
 @app.post("/tpm2/file-store/delete")
+@tpm_endpoint
 async def delete_key_value(request: DeleteKeyValueRequest):
     """Delete a key-value pair from the encrypted file store"""
-    if tpm_api is None:
-        raise HTTPException(status_code=503, detail="TPM2 API not available")
-    
-    try:
-        result = tpm_api.delete_key_value(
-            context_file=request.context_file,
-            store_name=request.store_name,
-            key=request.key
-        )
-        
-        if result["success"]:
-            return JSONResponse(content=result, status_code=200)
-        else:
-            raise HTTPException(status_code=400, detail=result["error"])
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_tpm(
+        tpm_api.delete_key_value,
+        context_file=request.context_file,
+        store_name=request.store_name,
+        key=request.key
+    )
 
 # AES Encryption/Decryption endpoints
 @app.post("/tpm2/encrypt-aes")
+@tpm_endpoint
 async def encrypt_data_aes(request: EncryptDataAESRequest):
     """Encrypt data using a loaded AES key"""
-    if tpm_api is None:
-        raise HTTPException(status_code=503, detail="TPM2 API not available")
-    
-    try:
-        result = tpm_api.encrypt_data_aes(
-            context_file=request.context_file,
-            data=request.data,
-            encrypted_file=request.encrypted_file
-        )
-        
-        if result["success"]:
-            return JSONResponse(content=result, status_code=200)
-        else:
-            raise HTTPException(status_code=400, detail=result["error"])
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_tpm(
+        tpm_api.encrypt_data_aes,
+        context_file=request.context_file,
+        data=request.data,
+        encrypted_file=request.encrypted_file
+    )
 
 @app.post("/tpm2/decrypt-aes")
+@tpm_endpoint
 async def decrypt_data_aes(request: DecryptDataAESRequest):
     """Decrypt data using a loaded AES key"""
-    if tpm_api is None:
-        raise HTTPException(status_code=503, detail="TPM2 API not available")
-    
-    try:
-        result = tpm_api.decrypt_data_aes(
-            context_file=request.context_file,
-            encrypted_data=request.encrypted_data,
-            decrypted_file=request.decrypted_file
-        )
-        
-        if result["success"]:
-            return JSONResponse(content=result, status_code=200)
-        else:
-            raise HTTPException(status_code=400, detail=result["error"])
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_tpm(
+        tpm_api.decrypt_data_aes,
+        context_file=request.context_file,
+        encrypted_data=request.encrypted_data,
+        decrypted_file=request.decrypted_file
+    )
 
 # AES Encrypted File Store endpoints
 @app.post("/tpm2/file-store-aes/create")
+@tpm_endpoint
 async def create_file_store_aes(request: CreateFileStoreAESRequest):
     """Create a new AES encrypted file store"""
-    if tpm_api is None:
-        raise HTTPException(status_code=503, detail="TPM2 API not available")
-    
-    try:
-        result = tpm_api.create_encrypted_file_store_aes(
-            context_file=request.context_file,
-            store_name=request.store_name
-        )
-        
-        if result["success"]:
-            return JSONResponse(content=result, status_code=200)
-        else:
-            raise HTTPException(status_code=400, detail=result["error"])
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_tpm(
+        tpm_api.create_encrypted_file_store_aes,
+        context_file=request.context_file,
+        store_name=request.store_name
+    )
 
 @app.post("/tpm2/file-store-aes/store")
+@tpm_endpoint
 async def store_key_value_aes(request: StoreKeyValueAESRequest):
     """Store a key-value pair in the AES encrypted file store"""
-    if tpm_api is None:
-        raise HTTPException(status_code=503, detail="TPM2 API not available")
-    
-    try:
-        result = tpm_api.store_key_value_aes(
-            context_file=request.context_file,
-            store_name=request.store_name,
-            key=request.key,
-            value=request.value
-        )
-        
-        if result["success"]:
-            return JSONResponse(content=result, status_code=200)
-        else:
-            raise HTTPException(status_code=400, detail=result["error"])
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_tpm(
+        tpm_api.store_key_value_aes,
+        context_file=request.context_file,
+        store_name=request.store_name,
+        key=request.key,
+        value=request.value
+    )
 
 @app.post("/tpm2/file-store-aes/retrieve")
+@tpm_endpoint
 async def retrieve_key_value_aes(request: RetrieveKeyValueAESRequest):
     """Retrieve a key-value pair from the AES encrypted file store"""
-    if tpm_api is None:
-        raise HTTPException(status_code=503, detail="TPM2 API not available")
-    
-    try:
-        result = tpm_api.retrieve_key_value_aes(
-            context_file=request.context_file,
-            store_name=request.store_name,
-            key=request.key
-        )
-        
-        if result["success"]:
-            return JSONResponse(content=result, status_code=200)
-        else:
-            raise HTTPException(status_code=400, detail=result["error"])
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_tpm(
+        tpm_api.retrieve_key_value_aes,
+        context_file=request.context_file,
+        store_name=request.store_name,
+        key=request.key
+    )
 
 @app.post("/tpm2/file-store-aes/list-keys")
+@tpm_endpoint
 async def list_file_store_keys_aes(request: ListFileStoreKeysAESRequest):
     """List all keys in the AES encrypted file store"""
-    if tpm_api is None:
-        raise HTTPException(status_code=503, detail="TPM2 API not available")
-    
-    try:
-        result = tpm_api.list_file_store_keys_aes(
-            context_file=request.context_file,
-            store_name=request.store_name
-        )
-        
-        if result["success"]:
-            return JSONResponse(content=result, status_code=200)
-        else:
-            raise HTTPException(status_code=400, detail=result["error"])
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_tpm(
+        tpm_api.list_file_store_keys_aes,
+        context_file=request.context_file,
+        store_name=request.store_name
+    )
 
 @app.post("/tpm2/file-store-aes/delete")
+@tpm_endpoint
 async def delete_key_value_aes(request: DeleteKeyValueAESRequest):
     """Delete a key-value pair from the AES encrypted file store"""
-    if tpm_api is None:
-        raise HTTPException(status_code=503, detail="TPM2 API not available")
-    
-    try:
-        result = tpm_api.delete_key_value_aes(
-            context_file=request.context_file,
-            store_name=request.store_name,
-            key=request.key
-        )
-        
-        if result["success"]:
-            return JSONResponse(content=result, status_code=200)
-        else:
-            raise HTTPException(status_code=400, detail=result["error"])
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_tpm(
+        tpm_api.delete_key_value_aes,
+        context_file=request.context_file,
+        store_name=request.store_name,
+        key=request.key
+    )
+
+def _save_uploads(*uploads: tuple):
+    """Copy (UploadFile, path) pairs to disk in chunks instead of reading them into memory"""
+    for upload, path in uploads:
+        with open(path, "wb") as f:
+            shutil.copyfileobj(upload.file, f, 1 << 16)
 
 # File upload endpoint for key files
 @app.post("/tpm2/upload-key")
@@ -714,11 +727,8 @@ async def upload_key(
         public_path = f"uploaded_{public_file.filename}"
         private_path = f"uploaded_{private_file.filename}"
         
-        with open(public_path, "wb") as f:
-            f.write(await public_file.read())
-        
-        with open(private_path, "wb") as f:
-            f.write(await private_file.read())
+        # Both files in one worker call rather than a thread hop each
+        await asyncio.to_thread(_save_uploads, (public_file, public_path), (private_file, private_path))
         
         return {
             "success": True,
@@ -730,29 +740,56 @@ async def upload_key(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# File names /tpm2/artifact/ serves: signatures and ciphertexts, never
+# plaintext outputs, wrapped data keys or key blobs
+ARTIFACT_PATTERNS = [pattern for pattern in os.environ.get("TPM2_ARTIFACT_PATTERNS", "*.sig,encrypted*").split(",")
+                     if pattern]
+
+@app.get("/tpm2/artifact/{file_path:path}")
+async def get_artifact(file_path: str):
+    """Download a signature or encrypted blob from the working directory as raw bytes"""
+    # Same restriction as list-files/delete-file: relative paths inside the working directory only
+    if os.path.isabs(file_path) or ".." in file_path:
+        raise HTTPException(status_code=400, detail=f"Invalid file path: {file_path}")
+    
+    # Symlinks are resolved, so the file itself must be an artifact inside the working directory
+    real_path = os.path.realpath(file_path)
+    working_dir = os.path.realpath(os.getcwd())
+    names = (os.path.basename(file_path), os.path.basename(real_path))
+    if os.path.commonpath([working_dir, real_path]) != working_dir or not all(
+            any(fnmatch.fnmatch(name, pattern) for pattern in ARTIFACT_PATTERNS) for name in names):
+        raise HTTPException(status_code=403, detail=f"File '{file_path}' is not a downloadable artifact")
+    
+    normalized_path = os.path.normpath(file_path)
+    if not os.path.isfile(normalized_path):
+        raise HTTPException(status_code=404, detail=f"File '{normalized_path}' does not exist")
+    
+    # Streamed from the file, without reading it into memory or base64/JSON encoding
+    return FileResponse(normalized_path, media_type="application/octet-stream")
+
 @app.get("/tpm2/list-files")
 async def list_files_get(directory: str = "."):
     """List files in the working directory (GET endpoint for easy testing)"""
     if tpm_api is None:
-        return JSONResponse(
+        return OrjsonResponse(
             content={"success": False, "error": "TPM2 API not available"},
             status_code=503
         )
     
     try:
-        result = tpm_api.list_files(directory=directory)
+        result = await asyncio.to_thread(tpm_api.list_files, directory=directory)
         
         if result["success"]:
-            return JSONResponse(content=result, status_code=200)
+            return OrjsonResponse(content=result, status_code=200)
         else:
-            return JSONResponse(
+            return OrjsonResponse(
                 content={"success": False, "error": result.get("error", "Unknown error")},
                 status_code=400
             )
             
     except Exception as e:
         import traceback
-        return JSONResponse(
+        return OrjsonResponse(
             content={"success": False, "error": f"{str(e)}\n{traceback.format_exc()}"},
             status_code=500
         )
@@ -761,55 +798,52 @@ async def list_files_get(directory: str = "."):
 async def list_files(request: ListFilesRequest = ListFilesRequest()):
     """List files in the working directory"""
     if tpm_api is None:
-        return JSONResponse(
+        return OrjsonResponse(
             content={"success": False, "error": "TPM2 API not available"},
             status_code=503
         )
     
     try:
-        result = tpm_api.list_files(directory=request.directory)
+        result = await asyncio.to_thread(tpm_api.list_files, directory=request.directory)
         
         if result["success"]:
-            return JSONResponse(content=result, status_code=200)
+            return OrjsonResponse(content=result, status_code=200)
         else:
             # Return error in JSON format instead of raising HTTPException
             # This allows _make_request to parse the error properly
-            return JSONResponse(
+            return OrjsonResponse(
                 content={"success": False, "error": result.get("error", "Unknown error")},
                 status_code=400
             )
             
     except Exception as e:
         import traceback
-        return JSONResponse(
+        return OrjsonResponse(
             content={"success": False, "error": f"{str(e)}\n{traceback.format_exc()}"},
             status_code=500
         )
 
 @app.post("/tpm2/delete-file")
+@tpm_endpoint
 async def delete_file(request: DeleteFileRequest):
     """Delete a file from the working directory"""
-    if tpm_api is None:
-        raise HTTPException(status_code=503, detail="TPM2 API not available")
-    
-    try:
-        result = tpm_api.delete_file(file_path=request.file_path)
-        
-        if result["success"]:
-            return JSONResponse(content=result, status_code=200)
-        else:
-            raise HTTPException(status_code=400, detail=result["error"])
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await asyncio.to_thread(tpm_api.delete_file, file_path=request.file_path)
 
 if __name__ == "__main__":
-    # Run the FastAPI server
+    # Run the FastAPI server. uvicorn uses uvloop and httptools when they are
+    # installed (uvicorn[standard]); the reloading file watcher is for development
+    # only and runs a single process.
     uvicorn.run(
         "tpm2_rest_api:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        reload=os.environ.get("TPM2_API_RELOAD", "").lower() in ("1", "true", "yes"),
+        workers=int(os.environ.get("TPM2_API_PROCESSES", "1")),
+        # Per-request access lines are for development; TPM2_API_ACCESS_LOG=1 keeps them
+        access_log=os.environ.get("TPM2_API_ACCESS_LOG", os.environ.get("TPM2_API_RELOAD", "")).lower()
+                   in ("1", "true", "yes"),
+        loop="auto",
+        http="auto",
         log_level="info"
     ) 
 